@@ -1,11 +1,24 @@
 from __future__ import annotations
-import json
+import json, os
 from typing import Dict, Any, List
 import pandas as pd
 from pydantic import BaseModel, ValidationError
 
 from educhat_client import EduChatClient
-from prompts import AGGREGATE_SYSTEM, AGGREGATE_USER_TMPL
+from prompt_compact import fill, render
+from prompts import AGGREGATE_SYSTEM, AGGREGATE_USER_TMPL, AGGREGATE_TEXT_SYSTEM, AGGREGATE_TEXT_USER_TMPL, WEIGHTS_CONTEXT_TMPL
+
+# 汇总方式：llm（默认）由模型完成整份汇总；local 在本地计算总分/等级/格式检查，文字部分由评分表生成，不再调用模型；
+# hybrid 分数同 local，仅简评/易错点/亮点/学生画像交给模型（提示词只含评分表与该生语法问题）
+AGGREGATE_MODE = os.getenv("AGGREGATE_MODE", "llm").strip().lower()
+# 语法表“得分”的满分（天学网作文默认 15 分）
+GRAMMAR_FULL_SCORE = float(os.getenv("GRAMMAR_FULL_SCORE", "15"))
+# 汇总提示词只带入语法表中评价所需的列（姓名、学号、原文等不再重复发送）
+GRAMMAR_PROMPT_COLUMNS = ("得分", "语法错误", "单句点评", "更多表达")
+# rubrics.yaml 未配置 grade_map 时使用的等级区间
+DEFAULT_GRADE_MAP = {"A": [90, 100], "B+": [85, 89], "B": [75, 84], "C": [60, 74], "D": [0, 59]}
+# hybrid 模式下由模型生成的文字字段
+TEXT_FIELDS = ("简评", "易错点", "亮点", "学生画像")
 
 class SummaryOut(BaseModel):
     格式检查: list[dict] | None = None
@@ -15,16 +28,191 @@ class SummaryOut(BaseModel):
     学生画像: Dict[str, Any]
     前几次作文评价: List[Dict[str, Any]] = []
 
-async def aggregate_all(client: EduChatClient, grammar_df: pd.DataFrame, content_json: Dict[str, Any], structure_json: Dict[str, Any], weights: Dict[str,int], grade_map: Dict[str, List[int]]) -> SummaryOut:
-    user = AGGREGATE_USER_TMPL.format(
-        grammar_table=grammar_df.to_dict(orient="records"),
+def _num(val, default: float = 0.0) -> float:
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return default
+
+
+def _table(section_json: Dict[str, Any], key: str) -> List[Dict[str, Any]]:
+    return [r for r in (section_json.get(key) or []) if isinstance(r, dict)]
+
+
+def _section_ratio(section_json: Dict[str, Any], key: str) -> float:
+    """(总分 - 格式扣分) / 满分合计，满分缺失时按 100 分计"""
+    full = sum(_num(r.get("满分")) for r in _table(section_json, key)) or 100.0
+    score = _num(section_json.get("总分")) - abs(_num(section_json.get("format_deductions")))
+    return min(max(score / full, 0.0), 1.0)
+
+
+def grammar_ratio(grammar_df: pd.DataFrame | None, full: float = GRAMMAR_FULL_SCORE) -> float | None:
+    """该生语法表“得分”占满分的比例；无有效得分时返回 None（不计入综合分）"""
+    if grammar_df is None or "得分" not in grammar_df.columns or full <= 0:
+        return None
+    scores = pd.to_numeric(grammar_df["得分"], errors="coerce").dropna()
+    return min(max(float(scores.mean()) / full, 0.0), 1.0) if not scores.empty else None
+
+
+def grade_for(total: int, grade_map: Dict[str, List[int]] | None) -> str:
+    """按等级区间 [下限, 上限] 取等级；落在区间空隙时取下限不高于总分的最高等级"""
+    bands = [(g, _num(b[0]), _num(b[-1])) for g, b in (grade_map or DEFAULT_GRADE_MAP).items()
+             if isinstance(b, (list, tuple)) and b]
+    for g, lo, hi in bands:
+        if lo <= total <= hi:
+            return g
+    below = [(lo, g) for g, lo, _ in bands if lo <= total]
+    return max(below)[1] if below else (min(bands, key=lambda b: b[1])[0] if bands else "")
+
+
+def weighted_total(grammar_df: pd.DataFrame | None, content_json: Dict[str, Any], structure_json: Dict[str, Any],
+                   weights: Dict[str, int]) -> int:
+    """综合分 = 语法*Wg + (内容-内容格式扣分)*Wc + (结构-结构格式扣分)*Ws，按权重归一化到 100 分；缺少语法得分时只按内容/结构归一化"""
+    parts = {
+        "grammar": grammar_ratio(grammar_df),
+        "content": _section_ratio(content_json, "content_table"),
+        "structure": _section_ratio(structure_json, "structure_table"),
+    }
+    used = {k: _num(weights.get(k)) for k, r in parts.items() if r is not None}
+    wsum = sum(used.values())
+    if wsum <= 0:
+        return 0
+    return int(round(100 * sum(parts[k] * w for k, w in used.items()) / wsum))
+
+
+def merge_format_checks(content_json: Dict[str, Any], structure_json: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """合并内容/结构的格式缺失项，同一缺失项只保留一次（取较大扣分）"""
+    merged: Dict[str, Dict[str, Any]] = {}
+    for item in _table(content_json, "format_check") + _table(structure_json, "format_check"):
+        name = str(item.get("缺失项", "")).strip()
+        if not name:
+            continue
+        deduct = int(abs(_num(item.get("扣分"))))
+        if name not in merged or deduct > merged[name]["扣分"]:
+            merged[name] = {"缺失项": name, "扣分": deduct}
+    return list(merged.values())
+
+
+def _rated_rows(content_json: Dict[str, Any], structure_json: Dict[str, Any]) -> List[tuple]:
+    """[(得分率, 行)]，按得分率从低到高排列"""
+    rows = _table(content_json, "content_table") + _table(structure_json, "structure_table")
+    rated = [(_num(r.get("得分")) / _num(r.get("满分"), 1.0) if _num(r.get("满分")) > 0 else 0.0, r) for r in rows]
+    return sorted(rated, key=lambda x: x[0])
+
+
+def vocabulary_level(total: int) -> str:
+    return "A2" if total < 60 else "B1" if total < 75 else "B2" if total < 90 else "C1"
+
+
+def local_text_fields(grammar_df: pd.DataFrame | None, content_json: Dict[str, Any], structure_json: Dict[str, Any],
+                      total: int, grade: str) -> Dict[str, Any]:
+    """不调用模型，由评分表的扣分原因/建议与语法问题生成简评、易错点、亮点与学生画像"""
+    rated = _rated_rows(content_json, structure_json)
+    mistakes = [f"{r.get('维度', '')}：{r.get('扣分原因')}" for ratio, r in rated if ratio < 1 and str(r.get("扣分原因", "")).strip()][:3]
+    if len(mistakes) < 2 and grammar_df is not None and "语法错误" in grammar_df.columns:
+        for text in grammar_df["语法错误"].dropna().astype(str):
+            mistakes += [ln.strip() for ln in text.splitlines() if ln.strip()][:2 - len(mistakes)]
+    highlights = [f"{r.get('维度', '')}表现较好（{int(_num(r.get('得分')))}/{int(_num(r.get('满分')))}）"
+                  for ratio, r in reversed(rated) if ratio >= 0.8][:3]
+    advice = [str(r.get("建议")).strip() for _, r in rated if str(r.get("建议", "")).strip()][:4]
+    brief = (f"内容 {int(_num(content_json.get('总分')))} 分，结构 {int(_num(structure_json.get('总分')))} 分，"
+             f"综合 {total} 分（{grade}）。" + (f"主要问题：{mistakes[0]}" if mistakes else ""))[:120]
+    return {
+        "简评": brief,
+        "易错点": mistakes,
+        "亮点": highlights,
+        "学生画像": {"词汇水平": vocabulary_level(total), "写作风格": "", "建议方向": advice},
+    }
+
+
+def _grammar_issues(grammar_df: pd.DataFrame | None) -> List[Dict[str, Any]]:
+    """该生语法问题（仅语法错误/单句点评两列），代替整张语法表进入提示词"""
+    if grammar_df is None or grammar_df.empty:
+        return []
+    cols = [c for c in ("语法错误", "单句点评") if c in grammar_df.columns]
+    return grammar_df[cols].dropna(how="all").to_dict(orient="records") if cols else []
+
+
+async def aggregate_local(client: EduChatClient | None, grammar_df: pd.DataFrame, content_json: Dict[str, Any],
+                          structure_json: Dict[str, Any], weights: Dict[str, int], grade_map: Dict[str, List[int]],
+                          use_llm_text: bool = False, exam_context: str = "") -> SummaryOut:
+    """本地确定性汇总：总分、等级与格式检查由公式计算；use_llm_text 时仅文字字段调用模型，失败则回退到本地生成"""
+    total = weighted_total(grammar_df, content_json, structure_json, weights)
+    grade = grade_for(total, grade_map)
+    text = local_text_fields(grammar_df, content_json, structure_json, total, grade)
+    summary = SummaryOut(
+        格式检查=merge_format_checks(content_json, structure_json),
+        本次评价={"总分": total, "等级": grade, "简评": text["简评"]},
+        易错点=text["易错点"],
+        亮点=text["亮点"],
+        学生画像=text["学生画像"],
+    )
+    if use_llm_text and client is not None:
+        user = render(
+            AGGREGATE_TEXT_USER_TMPL, system=AGGREGATE_TEXT_SYSTEM, trim=("grammar_issues",),
+            exam_context=_context(exam_context, weights, grade_map),
+            total=total, grade=grade,
+            grammar_issues=_grammar_issues(grammar_df),
+            content_table=_table(content_json, "content_table"),
+            structure_table=_table(structure_json, "structure_table"),
+        )
+        try:
+            data = json.loads(await client.acomplete(AGGREGATE_TEXT_SYSTEM, user))
+            if not isinstance(data, dict):
+                raise ValueError(f"应为 JSON 对象，实际为 {type(data).__name__}")
+        except Exception as e:
+            print(f"⚠️ 文字评价生成失败，改用本地生成：{e}")
+        else:
+            summary = with_text_fields(summary, data)
+    return summary
+
+
+def with_text_fields(summary: SummaryOut, data: Dict[str, Any]) -> SummaryOut:
+    """
+    用模型给出的文字字段（简评/易错点/亮点/学生画像）替换本地生成的版本。
+    逐项按 SummaryOut 校验，缺失或类型不符（如易错点不是字符串列表）的字段保留本地生成的内容。
+    """
+    for k in TEXT_FIELDS:
+        val = data.get(k)
+        if not val:
+            continue
+        if k == "简评":
+            if not isinstance(val, str):
+                print(f"⚠️ 模型返回的{k}格式不符，保留本地生成")
+                continue
+            update = {"本次评价": {**summary.本次评价, "简评": val}}
+        else:
+            update = {k: val}
+        try:
+            summary = SummaryOut.model_validate({**summary.model_dump(), **update})
+        except ValidationError:
+            print(f"⚠️ 模型返回的{k}格式不符，保留本地生成")
+    return summary
+
+
+def _context(exam_context: str, weights: Dict[str, int], grade_map: Dict[str, List[int]]) -> str:
+    """汇总提示词的前缀：沿用评分时的考试上下文，未提供时只带权重与等级"""
+    return exam_context or fill(WEIGHTS_CONTEXT_TMPL, weights=weights, grade_map=grade_map)
+
+
+async def aggregate_all(client: EduChatClient, grammar_df: pd.DataFrame, content_json: Dict[str, Any], structure_json: Dict[str, Any], weights: Dict[str,int], grade_map: Dict[str, List[int]],
+                        exam_context: str = "") -> SummaryOut:
+    if AGGREGATE_MODE in ("local", "hybrid"):
+        return await aggregate_local(client, grammar_df, content_json, structure_json, weights, grade_map,
+                                     use_llm_text=(AGGREGATE_MODE == "hybrid"), exam_context=exam_context)
+    user = render(
+        AGGREGATE_USER_TMPL, system=AGGREGATE_SYSTEM,
+        columns={"grammar_table": GRAMMAR_PROMPT_COLUMNS}, trim=("grammar_table",),
+        exam_context=_context(exam_context, weights, grade_map),
+        grammar_table=grammar_df,
         content_table=content_json,
         structure_table=structure_json,
-        weights=weights,
-        grade_map=grade_map
     )
     resp = await client.acomplete(AGGREGATE_SYSTEM, user)
-    data = json.loads(resp)
+    return coerce_summary(json.loads(resp))
+
+
+def coerce_summary(data: Dict[str, Any]) -> SummaryOut:
     try:
         return SummaryOut.model_validate(data)
     except ValidationError:
@@ -35,3 +223,22 @@ async def aggregate_all(client: EduChatClient, grammar_df: pd.DataFrame, content
             学生画像=data.get("学生画像", {}),
             前几次作文评价=data.get("前几次作文评价", []),
         )
+
+
+async def aggregate_combined(client: EduChatClient, grammar_df: pd.DataFrame, content_json: Dict[str, Any], structure_json: Dict[str, Any],
+                             weights: Dict[str, int], grade_map: Dict[str, List[int]], summary_json: Any,
+                             exam_context: str = "") -> SummaryOut:
+    """
+    合并批改模式：直接使用模型随评分表一并返回的汇总；汇总缺失或未通过 SummaryOut 校验时单独补问（按 AGGREGATE_MODE）。
+    AGGREGATE_MODE 为 local/hybrid 时总分、等级与格式检查仍由本地计算，只取模型给出的文字字段（逐项校验）。
+    """
+    if not isinstance(summary_json, dict) or not isinstance(summary_json.get("本次评价"), dict):
+        return await aggregate_all(client, grammar_df, content_json, structure_json, weights, grade_map, exam_context)
+    if AGGREGATE_MODE not in ("local", "hybrid"):
+        try:
+            return SummaryOut.model_validate(summary_json)
+        except ValidationError as e:
+            print(f"⚠️ 合并结果中的汇总格式不符，单独补问：{e.error_count()} 处错误")
+            return await aggregate_all(client, grammar_df, content_json, structure_json, weights, grade_map, exam_context)
+    summary = await aggregate_local(None, grammar_df, content_json, structure_json, weights, grade_map)
+    return with_text_fields(summary, {**summary_json, "简评": summary_json["本次评价"].get("简评")})
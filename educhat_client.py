@@ -1,8 +1,13 @@
 from __future__ import annotations
-import os, json, re
-from typing import Any
+import os, json, re, math, time, asyncio, threading
+import concurrent.futures
+from collections import deque
+from email.utils import parsedate_to_datetime
+from typing import Any, Callable
 from dotenv import load_dotenv
 
+from llm_cache import ResponseCache, cache_key, LLM_CACHE_ENABLED
+
 # 加载 .env（若存在）
 load_dotenv()
 
@@ -18,6 +23,36 @@ TIMEOUT = float(os.getenv("TIMEOUT", "120"))
 RETRIES = int(os.getenv("RETRIES", "3"))
 RETRY_BACKOFF = float(os.getenv("RETRY_BACKOFF", "1.2"))
 
+# 流式输出（SSE）：逐段解析 JSON，可提前推送已完成的评分表行；两段输出之间超过 STREAM_IDLE_TIMEOUT 秒即视为卡住并重试
+LLM_STREAM = os.getenv("LLM_STREAM", "0").lower() in ("1", "true", "yes")
+STREAM_IDLE_TIMEOUT = float(os.getenv("STREAM_IDLE_TIMEOUT", "30"))
+# 输出因达到 max_tokens 被截断时，重试并把 max_tokens 翻倍，最多到 MAX_TOKENS_LIMIT
+MAX_TOKENS_LIMIT = int(os.getenv("MAX_TOKENS_LIMIT", str(max(MAX_TOKENS, 4096))))
+
+# 合并相同的在途请求（提示词一致时只发出一次，其余调用方等待同一结果）
+LLM_COALESCE = os.getenv("LLM_COALESCE", "1").lower() in ("1", "true", "yes")
+
+# 对冲请求：调用超过近期延迟的 HEDGE_PERCENTILE 分位仍未返回时再发一份，先返回者胜出；
+# 对冲次数不超过已完成的 HTTP 请求数 × HEDGE_BUDGET，样本不足 HEDGE_MIN_SAMPLES 时不对冲
+LLM_HEDGE = os.getenv("LLM_HEDGE", "0").lower() in ("1", "true", "yes")
+HEDGE_PERCENTILE = float(os.getenv("HEDGE_PERCENTILE", "95"))
+HEDGE_BUDGET = float(os.getenv("HEDGE_BUDGET", "0.05"))
+HEDGE_MIN_SAMPLES = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+HEDGE_MIN_DELAY = float(os.getenv("HEDGE_MIN_DELAY", "2"))
+HEDGE_WINDOW = int(os.getenv("HEDGE_WINDOW", "200"))
+
+# 连接池（长连接复用，避免每次请求重新握手）
+HTTP_MAX_CONNECTIONS = int(os.getenv("HTTP_MAX_CONNECTIONS", "32"))
+HTTP_MAX_KEEPALIVE = int(os.getenv("HTTP_MAX_KEEPALIVE", "16"))
+HTTP_KEEPALIVE_EXPIRY = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "60"))
+HTTP2 = os.getenv("HTTP2", "0").lower() in ("1", "true", "yes")
+
+# 进程级限流（0 表示不限；429 的 Retry-After 始终生效）
+RATE_LIMIT_RPM = float(os.getenv("RATE_LIMIT_RPM", "0"))
+RATE_LIMIT_TPM = float(os.getenv("RATE_LIMIT_TPM", "0"))
+RATE_LIMIT_BURST_S = float(os.getenv("RATE_LIMIT_BURST_S", "5"))  # 桶容量：最多攒下几秒的配额（冷启动/空闲后的突发上限）
+CHARS_PER_TOKEN = float(os.getenv("CHARS_PER_TOKEN", "2.5"))  # 中英混排的粗略估计
+
 # 关键配置校验
 if not OPENAI_API_KEY:
     raise RuntimeError("未配置 API Key。请在 .env 中设置 OPENAI_API_KEY=你的Key（或 DEEPSEEK_API_KEY）。")
@@ -33,10 +68,492 @@ def _extract_json(text: str) -> str:
 class EduChatHTTPError(RuntimeError):
     ...
 
-async def http_complete(system: str, user: str) -> str:
+class EduChatTruncated(EduChatHTTPError):
+    """输出达到 max_tokens 被截断（finish_reason == "length"），以加大的 max_tokens 重试"""
+
+class EduChatOutputLimit(RuntimeError):
+    """max_tokens 已达 MAX_TOKENS_LIMIT 仍被截断：相同请求重试不会有不同结果，不再重试"""
+
+class JsonStreamParser:
+    """逐段喂入模型输出，识别其中已经完整的值并回调 on_value(path, value)：
+
+    - 顶层对象的字段：path 为 (键,)；
+    - 数组中的对象元素（如评分表的一行）：path 为 (…键, 下标)，例如 ("content_table", 0)。
+
+    JSON 之前的说明文字或代码块标记会被跳过；只做括号与字符串的状态跟踪，完整的值再交给 json.loads。
+    """
+
+    def __init__(self, on_value: Callable[[tuple, Any], None] | None = None):
+        self.on_value = on_value
+        self.text = ""
+        self.values = 0
+        self.complete = False
+        self._pos = 0
+        self._stack: list[dict] = []
+        self._in_str = self._esc = False
+        self._str_start = 0
+        self._last_str = ""
+
+    def feed(self, chunk: str) -> int:
+        """喂入一段输出，返回本段新识别出的值个数"""
+        self.text += chunk
+        text, found = self.text, 0
+        for i in range(self._pos, len(text)):
+            ch = text[i]
+            if self.complete or (not self._stack and ch not in "{["):
+                continue
+            if self._in_str:
+                if self._esc:
+                    self._esc = False
+                elif ch == "\\":
+                    self._esc = True
+                elif ch == '"':
+                    self._in_str = False
+                    self._last_str = text[self._str_start:i + 1]
+            elif ch == '"':
+                self._in_str, self._str_start = True, i
+            elif ch in "{[":
+                path = ()
+                if self._stack:
+                    top = self._stack[-1]
+                    path = top["path"] + ((top["key"],) if top["kind"] == "{" else (top["index"],))
+                self._stack.append({"kind": ch, "path": path, "key": None, "index": 0, "start": i + 1})
+            elif ch == ":" and self._stack[-1]["kind"] == "{":
+                top = self._stack[-1]
+                try:
+                    top["key"] = json.loads(self._last_str)
+                except ValueError:
+                    top["key"] = None
+                top["start"] = i + 1
+            elif ch in ",}]":
+                found += self._close_item(text, i)
+                if ch != ",":
+                    self._stack.pop()
+                    self.complete = not self._stack
+        self._pos = len(text)
+        return found
+
+    def _close_item(self, text: str, end: int) -> int:
+        top = self._stack[-1]
+        raw = text[top["start"]:end].strip()
+        top["start"] = end + 1
+        if not raw:
+            return 0
+        if top["kind"] == "{":
+            path, emit = top["path"] + (top["key"],), not top["path"] and top["key"] is not None
+        else:
+            path, emit = top["path"] + (top["index"],), raw.startswith("{")
+            top["index"] += 1
+        if not emit:
+            return 0
+        try:
+            value = json.loads(raw)
+        except ValueError:
+            return 0
+        self.values += 1
+        if self.on_value is not None:
+            self.on_value(path, value)
+        return 1
+
+def estimate_tokens(*texts: str) -> int:
+    return int(sum(len(t) for t in texts) / CHARS_PER_TOKEN) + 1
+
+_DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+
+def _parse_duration(val: str | None) -> float | None:
+    """解析 Retry-After / x-ratelimit-reset-* 的取值：秒数、HTTP 日期或 "1m30s"/"200ms" 形式。"""
+    if not val:
+        return None
+    val = val.strip()
+    try:
+        return max(0.0, float(val))
+    except ValueError:
+        pass
+    parts = _DURATION_RE.findall(val)
+    if parts:
+        unit = {"ms": 0.001, "s": 1, "m": 60, "h": 3600}
+        return sum(float(n) * unit[u] for n, u in parts)
+    try:
+        return max(0.0, parsedate_to_datetime(val).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+class RateLimiter:
+    """按请求数/分钟与 token 数/分钟双令牌桶平滑放行，并根据服务端限流头整体暂停。
+
+    进程内共享（跨事件循环/线程），令牌按时间连续补充，请求均匀地贴近配额上限发出，
+    而不是集中突发后一起退避。桶容量只有 burst_s 秒的配额，且启动时即为这一容量，
+    冷启动或空闲之后不会一次放出整分钟的请求。
+    """
+
+    def __init__(self, rpm: float = RATE_LIMIT_RPM, tpm: float = RATE_LIMIT_TPM,
+                 burst_s: float = RATE_LIMIT_BURST_S):
+        self.rpm = rpm
+        self.tpm = tpm
+        self.req_cap = max(1.0, rpm * burst_s / 60) if rpm > 0 else 0.0
+        self.tok_cap = max(1.0, tpm * burst_s / 60) if tpm > 0 else 0.0
+        self._req = self.req_cap
+        self._tok = self.tok_cap
+        self._last = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = threading.Lock()
+        self.throttled = 0
+
+    def _refill(self, now: float) -> None:
+        dt = now - self._last
+        self._last = now
+        if self.rpm > 0: self._req = min(self.req_cap, self._req + dt * self.rpm / 60)
+        if self.tpm > 0: self._tok = min(self.tok_cap, self._tok + dt * self.tpm / 60)
+
+    def _try_take(self, tokens: int) -> float:
+        """成功则扣减并返回 0，否则返回需要等待的秒数。"""
+        now = time.monotonic()
+        self._refill(now)
+        if self._paused_until > now:
+            return self._paused_until - now
+        wait = 0.0
+        if self.rpm > 0 and self._req < 1:
+            wait = max(wait, (1 - self._req) * 60 / self.rpm)
+        # 单次估算超过桶容量时，桶满即放行并按实际估算扣减（余额为负即欠账，之后的请求等待补足）
+        need = min(tokens, self.tok_cap)
+        if self.tpm > 0 and self._tok < need:
+            wait = max(wait, (need - self._tok) * 60 / self.tpm)
+        if wait > 0:
+            return wait
+        if self.rpm > 0: self._req -= 1
+        if self.tpm > 0: self._tok -= tokens
+        return 0.0
+
+    async def acquire(self, tokens: int) -> None:
+        while True:
+            with self._lock:
+                wait = self._try_take(tokens)
+                if wait > 0:
+                    self.throttled += 1
+            if wait <= 0:
+                return
+            await asyncio.sleep(wait)
+
+    def settle(self, estimated: int, actual: int) -> None:
+        """用响应 usage 校正预估的 token 消耗。"""
+        if self.tpm <= 0 or actual <= 0:
+            return
+        with self._lock:
+            self._tok = min(self.tok_cap, self._tok + estimated - actual)
+
+    def update_from_headers(self, headers, status_code: int = 200) -> None:
+        """读取 Retry-After 与 x-ratelimit-* 头：配额耗尽或 429 时所有调用方一起暂停到重置时刻。"""
+        pause = _parse_duration(headers.get("retry-after"))
+        if pause is None and status_code == 429:
+            pause = 1.0
+        for kind in ("requests", "tokens"):
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if remaining is None:
+                continue
+            try:
+                remaining = float(remaining)
+            except ValueError:
+                continue
+            with self._lock:
+                if kind == "requests" and self.rpm > 0: self._req = min(self._req, remaining)
+                if kind == "tokens" and self.tpm > 0: self._tok = min(self._tok, remaining)
+            if remaining <= 0:
+                reset = _parse_duration(headers.get(f"x-ratelimit-reset-{kind}"))
+                if reset is not None:
+                    pause = max(pause or 0.0, reset)
+        if pause:
+            with self._lock:
+                self._paused_until = max(self._paused_until, time.monotonic() + pause)
+
+rate_limiter = RateLimiter()
+
+class _LeaderCancelled(Exception):
+    """发出请求的调用方被取消，等待者需自行重新发起"""
+
+class SingleFlight:
+    """进程内合并相同 key 的在途请求：同一时刻只有第一个调用方真正执行，其余调用方等待它的结果或异常。
+
+    用 concurrent.futures.Future 登记在途请求，批改服务中不同线程/事件循环的客户端也能互相合并。
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._inflight: dict[str, concurrent.futures.Future] = {}
+        self.coalesced = 0
+
+    async def do(self, key: str, fn, on_coalesced: Callable[[], None] | None = None):
+        """执行 fn() 或等待相同 key 的在途调用；等待者拿到他人的结果（或异常）时计一次合并并回调 on_coalesced"""
+        while True:
+            with self._lock:
+                fut = self._inflight.get(key)
+                leader = fut is None
+                if leader:
+                    fut = self._inflight[key] = concurrent.futures.Future()
+            if leader:
+                break
+            try:
+                # shield：等待者被取消时不能连带取消共享的 Future
+                result = await asyncio.shield(asyncio.wrap_future(fut))
+            except _LeaderCancelled:
+                # 发起者被取消：重新竞争，可能由本调用方自己发出请求，此时不计为合并
+                continue
+            except Exception:
+                self._joined(on_coalesced)
+                raise
+            self._joined(on_coalesced)
+            return result
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            fut.set_exception(_LeaderCancelled())
+            raise
+        except BaseException as e:
+            # 其余异常（含 KeyboardInterrupt / SystemExit 等）原样交给等待者
+            fut.set_exception(e)
+            raise
+        else:
+            fut.set_result(result)
+            return result
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+    def _joined(self, on_coalesced: Callable[[], None] | None) -> None:
+        with self._lock:
+            self.coalesced += 1
+        if on_coalesced is not None:
+            on_coalesced()
+
+single_flight = SingleFlight()
+
+class Hedger:
+    """对冲请求：一次调用超过近期延迟的分位数仍未返回时，再发一份相同请求，先成功者胜出，另一份取消。
+
+    进程内共享：延迟样本与对冲预算跨客户端/线程统计，额外开销始终有上限。
+    样本与请求数都由 observe 记录，即 http_complete 的 on_latency 回调：每次完成的 HTTP 往返计一次，
+    耗时不含限流等待与重试间隔；预算为累计对冲次数 ≤ 累计 HTTP 请求数 × budget，与 UsageStats 的 hedge_rate 口径一致。
+    """
+
+    def __init__(self, percentile: float = HEDGE_PERCENTILE, budget: float = HEDGE_BUDGET,
+                 min_samples: int = HEDGE_MIN_SAMPLES, min_delay: float = HEDGE_MIN_DELAY,
+                 window: int = HEDGE_WINDOW):
+        self.percentile = percentile
+        self.budget = budget
+        self.min_samples = min_samples
+        self.min_delay = min_delay
+        self._samples: deque = deque(maxlen=window)
+        self._lock = threading.Lock()
+        self.requests = 0
+        self.hedged = 0
+        self.wins = 0
+
+    def observe(self, seconds: float) -> None:
+        """记录一次完成的 HTTP 往返"""
+        with self._lock:
+            self._samples.append(seconds)
+            self.requests += 1
+
+    def delay(self) -> float | None:
+        """发出对冲前的等待秒数；样本不足时返回 None（不对冲）"""
+        with self._lock:
+            if len(self._samples) < max(1, self.min_samples):
+                return None
+            ordered = sorted(self._samples)
+        k = min(len(ordered) - 1, max(0, math.ceil(self.percentile / 100 * len(ordered)) - 1))
+        return max(self.min_delay, ordered[k])
+
+    def _take_budget(self) -> bool:
+        with self._lock:
+            if self.hedged + 1 > self.budget * self.requests:
+                return False
+            self.hedged += 1
+            return True
+
+    async def run(self, attempt: Callable[[bool, Callable[[], None]], Any], usage: "UsageStats | None" = None):
+        """
+        attempt(primary, on_send) 返回一次请求的协程：请求通过限流真正发出时回调 on_send，HTTP 往返完成时回调 observe；
+        primary=False 为对冲的那一份。对冲计时从原请求发出时开始，与延迟样本的口径一致。
+        """
+        delay = self.delay()
+        sent = asyncio.Event()
+        primary = asyncio.ensure_future(attempt(True, sent.set))
+        backup = None
+        try:
+            if delay is None:
+                return await primary
+            waiting = asyncio.ensure_future(sent.wait())
+            await asyncio.wait({primary, waiting}, return_when=asyncio.FIRST_COMPLETED)
+            waiting.cancel()
+            done, _ = await asyncio.wait({primary}, timeout=delay)
+            if done or not self._take_budget():
+                return await primary
+            if usage is not None:
+                usage.record_hedged()
+            backup = asyncio.ensure_future(attempt(False, lambda: None))
+            pending = {primary, backup}
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.exception() is None:
+                        if task is backup:
+                            with self._lock:
+                                self.wins += 1
+                            if usage is not None:
+                                usage.record_hedge_win()
+                        return task.result()
+            # 两份都失败：抛出原请求的异常
+            return primary.result()
+        finally:
+            for task in (primary, backup):
+                if task is not None and not task.done():
+                    task.cancel()
+
+hedger = Hedger()
+
+class UsageStats:
+    """累计响应中的 usage：输入/输出 tokens，以及服务端前缀缓存命中的输入 tokens
+    （DeepSeek 为 prompt_cache_hit_tokens，OpenAI 为 prompt_tokens_details.cached_tokens）。
+    每个 EduChatClient 一份；本地磁盘缓存（可能由多个客户端共用）的命中也按客户端记在这里。"""
+
+    FIELDS = ("requests", "prompt_tokens", "completion_tokens", "cached_tokens",
+              "truncated", "streams", "first_token_s", "first_value_s", "coalesced",
+              "hedged", "hedge_wins", "cache_hits", "cache_misses")
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counts = dict.fromkeys(self.FIELDS, 0)
+
+    def record(self, usage: dict | None) -> None:
+        usage = usage or {}
+        cached = usage.get("prompt_cache_hit_tokens")
+        if cached is None:
+            cached = (usage.get("prompt_tokens_details") or {}).get("cached_tokens")
+        with self._lock:
+            self._counts["requests"] += 1
+            self._counts["prompt_tokens"] += int(usage.get("prompt_tokens") or 0)
+            self._counts["completion_tokens"] += int(usage.get("completion_tokens") or 0)
+            self._counts["cached_tokens"] += int(cached or 0)
+
+    def record_hedged(self) -> None:
+        with self._lock:
+            self._counts["hedged"] += 1
+
+    def record_hedge_win(self) -> None:
+        with self._lock:
+            self._counts["hedge_wins"] += 1
+
+    def record_coalesced(self) -> None:
+        with self._lock:
+            self._counts["coalesced"] += 1
+
+    def record_cache(self, hit: bool) -> None:
+        with self._lock:
+            self._counts["cache_hits" if hit else "cache_misses"] += 1
+
+    def record_truncated(self) -> None:
+        with self._lock:
+            self._counts["truncated"] += 1
+
+    def record_stream(self, first_token_s: float | None, first_value_s: float | None) -> None:
+        """流式调用：收到第一段输出与解析出第一个完整字段/行所用的秒数（无输出时记为整次耗时）"""
+        with self._lock:
+            self._counts["streams"] += 1
+            self._counts["first_token_s"] += first_token_s or 0.0
+            self._counts["first_value_s"] += first_value_s or 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            return dict(self._counts)
+
+    def stats(self, since: dict | None = None) -> dict:
+        """自 since（snapshot 的返回值）以来的增量，附带前缀缓存命中率"""
+        now = self.snapshot()
+        out = {k: now[k] - (since or {}).get(k, 0) for k in self.FIELDS}
+        out["cache_hit_rate"] = out["cached_tokens"] / out["prompt_tokens"] if out["prompt_tokens"] else 0.0
+        out["avg_first_token_s"] = out["first_token_s"] / out["streams"] if out["streams"] else 0.0
+        out["avg_first_value_s"] = out["first_value_s"] / out["streams"] if out["streams"] else 0.0
+        out["hedge_rate"] = out["hedged"] / out["requests"] if out["requests"] else 0.0
+        lookups = out["cache_hits"] + out["cache_misses"]
+        out["local_cache_hit_rate"] = out["cache_hits"] / lookups if lookups else 0.0
+        return out
+
+def _http2_available() -> bool:
+    try:
+        import h2  # noqa: F401
+        return True
+    except ImportError:
+        return False
+
+def make_http_client(max_connections: int = HTTP_MAX_CONNECTIONS,
+                     max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                     keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+                     http2: bool = HTTP2):
+    import httpx
+    if http2 and not _http2_available():
+        print("⚠️ 未安装 h2，HTTP/2 不可用，回退到 HTTP/1.1")
+        http2 = False
+    limits = httpx.Limits(
+        max_connections=max_connections,
+        max_keepalive_connections=max_keepalive,
+        keepalive_expiry=keepalive_expiry,
+    )
+    return httpx.AsyncClient(timeout=TIMEOUT, limits=limits, http2=http2)
+
+def _sse_chunk(line: str) -> dict | None:
+    """SSE 的一行："data: {...}" 返回解析后的块，"data: [DONE]" 返回空字典，其余（注释/空行）返回 None"""
+    if not line.startswith("data:"):
+        return None
+    data = line[5:].strip()
+    if data == "[DONE]":
+        return {}
+    try:
+        return json.loads(data)
+    except ValueError:
+        return None
+
+async def _read_stream(r, parser: JsonStreamParser, usage: UsageStats | None, started: float) -> tuple[str, str, dict]:
+    """逐块读取 SSE 响应，返回 (完整输出, finish_reason, usage)"""
+    finish, usage_data = "", {}
+    first_token = first_value = None
+    async for line in r.aiter_lines():
+        chunk = _sse_chunk(line)
+        if chunk is None:
+            continue
+        if not chunk:
+            break
+        usage_data = chunk.get("usage") or usage_data
+        for choice in chunk.get("choices") or []:
+            delta = (choice.get("delta") or {}).get("content") or ""
+            if delta:
+                first_token = first_token or time.monotonic() - started
+                if parser.feed(delta) and first_value is None:
+                    first_value = time.monotonic() - started
+            finish = choice.get("finish_reason") or finish
+        if finish == "length":
+            # 截断已成定局，不再等待剩余的块
+            break
+    if usage is not None:
+        elapsed = time.monotonic() - started
+        usage.record_stream(first_token or elapsed, first_value or elapsed)
+    return parser.text, finish, usage_data
+
+async def http_complete(system: str, user: str, client=None, usage: UsageStats | None = None,
+                        stream: bool | None = None, on_partial: Callable[[tuple, Any], None] | None = None,
+                        on_send: Callable[[], None] | None = None,
+                        on_latency: Callable[[float], None] | None = None) -> str:
+    """client 为共享的 httpx.AsyncClient；为 None 时临时创建（单次调用，无连接复用）。
+    usage 不为 None 时记录响应中的 token 用量与前缀缓存命中。
+    on_send 在每次请求通过限流、即将发出时回调；on_latency 在每次收到完整响应时回调该次 HTTP 往返的秒数
+    （不含限流等待与重试间隔）。
+    stream=True（默认取 LLM_STREAM）时以 SSE 流式读取，已完成的顶层字段与评分表行逐个回调 on_partial(path, value)。
+    输出被 max_tokens 截断时抛出 EduChatTruncated 并以翻倍的 max_tokens 重试；
+    max_tokens 已达 MAX_TOKENS_LIMIT 时抛出 EduChatOutputLimit，不再重试。"""
     import httpx
     from tenacity import retry, stop_after_attempt, wait_exponential, retry_if_exception_type
 
+    stream = LLM_STREAM if stream is None else stream
+    max_tokens = MAX_TOKENS
+
     @retry(
         reraise=True,
         stop=stop_after_attempt(RETRIES),
@@ -44,6 +561,7 @@ async def http_complete(system: str, user: str) -> str:
         retry=retry_if_exception_type((httpx.HTTPError, EduChatHTTPError)),
     )
     async def _call():
+        nonlocal max_tokens
         url = f"{OPENAI_BASE_URL.rstrip('/')}/chat/completions"
         headers = {"Authorization": f"Bearer {OPENAI_API_KEY}"}
         if OPENAI_ORG:
@@ -53,24 +571,140 @@ async def http_complete(system: str, user: str) -> str:
         payload: dict[str, Any] = {
             "model": MODEL_NAME,
             "temperature": TEMPERATURE,
-            "max_tokens": MAX_TOKENS,
+            "max_tokens": max_tokens,
             "messages": [
                 {"role": "system", "content": system},
                 {"role": "user", "content": user},
             ],
             "response_format": {"type": "json_object"},
         }
-        async with httpx.AsyncClient(timeout=TIMEOUT) as client:
-            r = await client.post(url, headers=headers, json=payload)
-            if r.status_code == 429:
-                raise EduChatHTTPError("Rate limited")
-            r.raise_for_status()
-            data = r.json()
-            return _extract_json(data["choices"][0]["message"]["content"])
+        if stream:
+            payload["stream"] = True
+            payload["stream_options"] = {"include_usage": True}
+        estimated = estimate_tokens(system, user) + max_tokens
+        await rate_limiter.acquire(estimated)
+        if on_send is not None:
+            on_send()
+        started = time.monotonic()
+        c = client if client is not None else httpx.AsyncClient(timeout=TIMEOUT)
+        try:
+            if stream:
+                # 读超时按两段输出之间的间隔计：卡住的流在 STREAM_IDLE_TIMEOUT 内即可重试
+                timeout = httpx.Timeout(TIMEOUT, read=min(TIMEOUT, STREAM_IDLE_TIMEOUT))
+                async with c.stream("POST", url, headers=headers, json=payload, timeout=timeout) as r:
+                    rate_limiter.update_from_headers(r.headers, r.status_code)
+                    if r.status_code == 429:
+                        raise EduChatHTTPError("Rate limited")
+                    if r.is_error:
+                        await r.aread()
+                    r.raise_for_status()
+                    text, finish, usage_data = await _read_stream(r, JsonStreamParser(on_partial), usage, started)
+            else:
+                r = await c.post(url, headers=headers, json=payload)
+                rate_limiter.update_from_headers(r.headers, r.status_code)
+                if r.status_code == 429:
+                    raise EduChatHTTPError("Rate limited")
+                r.raise_for_status()
+                data = r.json()
+                choice = data["choices"][0]
+                text, finish, usage_data = choice["message"]["content"], choice.get("finish_reason") or "", data.get("usage") or {}
+        finally:
+            if client is None:
+                await c.aclose()
+        rate_limiter.settle(estimated, int(usage_data.get("total_tokens") or 0))
+        if on_latency is not None:
+            on_latency(time.monotonic() - started)
+        if usage is not None:
+            usage.record(usage_data)
+        if finish == "length":
+            if usage is not None:
+                usage.record_truncated()
+            if max_tokens >= MAX_TOKENS_LIMIT:
+                raise EduChatOutputLimit(f"输出达到 max_tokens 上限 {max_tokens}（MAX_TOKENS_LIMIT）仍被截断")
+            truncated_at, max_tokens = max_tokens, min(MAX_TOKENS_LIMIT, max_tokens * 2)
+            raise EduChatTruncated(f"输出达到 max_tokens={truncated_at} 被截断")
+        return _extract_json(text)
 
     return await _call()
 
 class EduChatClient:
-    async def acomplete(self, system: str, user: str) -> str:
-        # 仅使用 HTTP（DeepSeek/OpenAI 兼容）
-        return await http_complete(system, user)
\ No newline at end of file
+    """持有一个长连接池，供同一批改任务的所有请求共享。
+
+    用法：``async with EduChatClient() as client: ...``，或在结束时 ``await client.aclose()``。
+    相同请求（模型/温度/提示词一致）优先读取磁盘缓存，``use_cache=False`` 可绕过。
+    """
+
+    def __init__(self, max_connections: int = HTTP_MAX_CONNECTIONS,
+                 max_keepalive: int = HTTP_MAX_KEEPALIVE,
+                 keepalive_expiry: float = HTTP_KEEPALIVE_EXPIRY,
+                 http2: bool = HTTP2,
+                 cache: ResponseCache | None = None,
+                 use_cache: bool = LLM_CACHE_ENABLED):
+        self._pool_conf = dict(max_connections=max_connections, max_keepalive=max_keepalive,
+                               keepalive_expiry=keepalive_expiry, http2=http2)
+        self._http = None
+        self.use_cache = use_cache
+        self.cache = cache if cache is not None else (ResponseCache() if use_cache else None)
+        self.usage = UsageStats()
+
+    @property
+    def http(self):
+        # 延迟创建：连接池需绑定到实际运行的事件循环
+        if self._http is None or self._http.is_closed:
+            self._http = make_http_client(**self._pool_conf)
+        return self._http
+
+    async def aclose(self) -> None:
+        if self._http is not None and not self._http.is_closed:
+            await self._http.aclose()
+        self._http = None
+
+    async def __aenter__(self) -> "EduChatClient":
+        return self
+
+    async def __aexit__(self, *exc) -> None:
+        await self.aclose()
+
+    def usage_stats(self, since: dict | None = None) -> dict:
+        return self.usage.stats(since)
+
+    def cache_stats(self) -> dict:
+        return self.cache.stats() if self.cache is not None else {"hits": 0, "misses": 0, "hit_rate": 0.0}
+
+    async def acomplete(self, system: str, user: str, use_cache: bool | None = None,
+                        on_partial: Callable[[tuple, Any], None] | None = None) -> str:
+        """on_partial 仅在流式模式（LLM_STREAM）下被调用，参见 http_complete；命中缓存或合并到他人请求时不回调"""
+        use_cache = self.use_cache if use_cache is None else use_cache
+        key = None
+        if use_cache and self.cache is not None:
+            key = cache_key(MODEL_NAME, TEMPERATURE, MAX_TOKENS, system, user)
+            # SQLite 读写放到线程中执行，不阻塞事件循环上其他学生的批改
+            hit = await asyncio.to_thread(self.cache.get, key)
+            self.usage.record_cache(hit is not None)
+            if hit is not None:
+                return hit
+
+        async def call() -> str:
+            # 仅使用 HTTP（DeepSeek/OpenAI 兼容）
+            if LLM_HEDGE:
+                # 已生成的评分表行只由原请求回调，避免对冲的那一份重复推送
+                resp = await hedger.run(lambda primary, on_send: http_complete(
+                    system, user, client=self.http, usage=self.usage, on_partial=on_partial if primary else None,
+                    on_send=on_send, on_latency=hedger.observe), self.usage)
+            else:
+                resp = await http_complete(system, user, client=self.http, usage=self.usage, on_partial=on_partial)
+            if key is not None:
+                # 只缓存可解析的 JSON，避免把截断/异常输出固化下来
+                try:
+                    json.loads(resp)
+                except ValueError:
+                    pass
+                else:
+                    await asyncio.to_thread(self.cache.put, key, resp)
+            return resp
+
+        if not LLM_COALESCE:
+            return await call()
+        # 磁盘缓存未命中（或未启用）时，相同提示词的并发调用只发出一次；等待者不收到 on_partial 回调
+        flight_key = key or cache_key(MODEL_NAME, TEMPERATURE, MAX_TOKENS, system, user)
+        return await single_flight.do(flight_key, call, self.usage.record_coalesced)
@@ -1,33 +1,26 @@
 import re
 import os
+import argparse
+import multiprocessing
+from collections import deque
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
 from pathlib import Path
-from typing import Dict, List, Tuple
+from typing import Callable, Dict, Iterable, Iterator, List, NamedTuple, Tuple
 import pdfplumber
 from openpyxl import Workbook
 
+from settings import Workspace
+
 
 ROOT = Path(__file__).resolve().parent.parent  # 项目根目录
-PDF_PATH = Path("./in/1.pdf")
-
-# 获取考试名称和老师账号，设置考试特定的输出路径
-exam_name = os.environ.get('EXAM_NAME', '').strip()
-teacher_username = os.environ.get('TEACHER_USERNAME', '').strip()
-
-if exam_name:
-    # 创建安全的文件夹名称（移除非法字符）
-    safe_exam_name = "".join(ch for ch in exam_name if ch not in '\\/:*?"<>|').strip()
-    if not safe_exam_name:
-        safe_exam_name = "未命名考试"
-    
-    # 如果有老师账号，添加到文件夹名称
-    if teacher_username:
-        safe_teacher_name = "".join(ch for ch in teacher_username if ch not in '\\/:*?"<>|').strip()
-        if safe_teacher_name:
-            safe_exam_name = f"{safe_exam_name}_{safe_teacher_name}"
-    
-    OUTPUT_XLSX = Path("outputs") / safe_exam_name / "output.xlsx"
-else:
-    OUTPUT_XLSX = Path("outputs") / "output.xlsx"
+
+# 并行提取：进程数与每个任务处理的页数
+EXTRACT_WORKERS = int(os.environ.get("EXTRACT_WORKERS", "1"))
+EXTRACT_CHUNK_PAGES = int(os.environ.get("EXTRACT_CHUNK_PAGES", "25"))
+# 多个 PDF 时同时提取的文件数（每个文件一个进程，默认不超过 4 个）
+EXTRACT_FILE_WORKERS = int(os.environ.get("EXTRACT_FILE_WORKERS", str(min(4, os.cpu_count() or 1))))
+# 文本提取后端：pdfplumber（默认）或 pypdfium2（原生实现，速度更快）
+EXTRACT_BACKEND = os.environ.get("EXTRACT_BACKEND", "pdfplumber").strip().lower()
 
 
 HeaderRegex = re.compile(
@@ -49,61 +42,78 @@ def normalize_text(text: str) -> str:
     return "\n".join(lines).strip()
 
 
-def split_sections(page_text: str) -> Dict[str, str]:
-    """
-    从单页文本中按段落切分：我的原文 / 语法错误 / 单句点评 / 更多表达
-    允许段落缺失，返回字典。
-    """
-    # 若有页尾标记，截断到标记之前
-    m = PageMarkerRegex.search(page_text)
-    if m:
-        page_text = page_text[:m.start()].strip()
-
-    # 段落标题索引
-    # 标题可能独占一行，使用分组查找起止位置
-    titles = {
-        "mine": "我的原文",
-        "errors": "语法错误",
-        "comments": "单句点评",
-        "more": "更多表达",
-    }
+SECTION_TITLES = {
+    "我的原文": "mine",
+    "语法错误": "errors",
+    "单句点评": "comments",
+    "更多表达": "more",
+}
 
-    # 找到每个标题的起始位置
-    positions: Dict[str, int] = {}
-    for key, title in titles.items():
-        m = re.search(rf"(^|\n){re.escape(title)}(\s*|\n)", page_text)
-        if m:
-            positions[key] = m.start()
-    # 根据出现顺序切分
-    ordered = sorted([(key, pos) for key, pos in positions.items()], key=lambda x: x[1])
+# 单次扫描即可找出页尾标记、得分与行首的段落标题
+PageTokenRegex = re.compile(
+    r"(?P<marker>" + PageMarkerRegex.pattern + r")"
+    r"|得分：(?P<score>\d+)"
+    r"|(?:(?<=\n)|^)(?P<title>" + "|".join(map(re.escape, SECTION_TITLES)) + r")"
+)
 
-    sections = {"mine": "", "errors": "", "comments": "", "more": ""}
-    if not ordered:
-        return sections
 
-    # 依序取片段
-    for i, (key, start_pos) in enumerate(ordered):
-        end_pos = len(page_text) if i == len(ordered) - 1 else ordered[i + 1][1]
-        # 切掉标题本身行
-        block = page_text[start_pos:end_pos].strip()
-        # 去除首个标题文字与紧随其后的换行
-        block = re.sub(rf"^{re.escape(titles[key])}\s*\n?", "", block)
-        sections[key] += (block.strip() + ("\n" if block.strip() else ""))
+class PageScan(NamedTuple):
+    info: Dict[str, str]
+    score: int
+    sections: Dict[str, str]
 
-    # 清理末尾多余换行
-    for k in sections.keys():
-        sections[k] = sections[k].strip()
 
-    return sections
+def _head_block(page_text: str) -> str:
+    # 前 3 行（定位第 3 个换行符，无需切分整页）
+    cut = -1
+    for _ in range(3):
+        cut = page_text.find("\n", cut + 1)
+        if cut < 0:
+            return page_text
+    return page_text[:cut]
 
 
-def parse_header(page_text: str) -> Tuple[Dict[str, str], int]:
+def scan_page(page_text: str) -> PageScan:
     """
-    解析页首的基本信息与得分。
-    返回 (info_dict, score_int or -1)
+    一次扫描解析单页：页首基本信息、得分（无则 -1），
+    以及「我的原文 / 语法错误 / 单句点评 / 更多表达」四个段落（允许缺失）。
+    结果与 parse_header + split_sections 的原有规则一致：
+    - 页尾标记之后的内容不参与分段，截断后的文本首尾空白不计；
+    - 每个标题只取第一次出现在行首的位置，段落内容为标题之后到下一个标题之前的文本。
     """
-    # 取首 3 行用于匹配头部（更稳健）
-    head_block = "\n".join(page_text.split("\n")[:3])
+    marker_at = -1
+    score_val = -1
+    first: Dict[str, int] = {}
+    for m in PageTokenRegex.finditer(page_text):
+        kind = m.lastgroup
+        if kind == "marker":
+            if marker_at < 0:
+                marker_at = m.start()
+        elif kind == "score":
+            if score_val < 0:
+                score_val = int(m.group("score"))
+        elif m.group("title") not in first:
+            first[m.group("title")] = m.start()
+
+    # 分段区间：若有页尾标记，截断到标记之前并去掉首尾空白
+    start, end = 0, len(page_text)
+    if marker_at >= 0:
+        region = page_text[:marker_at]
+        start = len(region) - len(region.lstrip())
+        end = len(region.rstrip())
+        if start > 0 and page_text[start - 1] != "\n":
+            # 去空白后位于开头的标题，等同于行首
+            for title in SECTION_TITLES:
+                if page_text.startswith(title, start):
+                    first[title] = start
+        first = {t: pos for t, pos in first.items() if pos < end}
+
+    sections = {"mine": "", "errors": "", "comments": "", "more": ""}
+    ordered = sorted(first.items(), key=lambda x: x[1])
+    for i, (title, pos) in enumerate(ordered):
+        block_end = end if i == len(ordered) - 1 else ordered[i + 1][1]
+        sections[SECTION_TITLES[title]] = page_text[pos + len(title):block_end].strip()
+
     info = {
         "school": "",
         "class": "",
@@ -111,34 +121,43 @@ def parse_header(page_text: str) -> Tuple[Dict[str, str], int]:
         "id": "",
         "time": "",
     }
-    score_val = -1
-
-    m = HeaderRegex.search(head_block)
+    m = HeaderRegex.search(_head_block(page_text))
     if m:
         info.update(m.groupdict())
 
-    # 得分可能在较靠前位置
-    m2 = ScoreRegex.search(page_text)
-    if m2:
-        try:
-            score_val = int(m2.group("score"))
-        except Exception:
-            score_val = -1
+    return PageScan(info, score_val, sections)
 
-    return info, score_val
+
+def split_sections(page_text: str) -> Dict[str, str]:
+    """
+    从单页文本中按段落切分：我的原文 / 语法错误 / 单句点评 / 更多表达
+    允许段落缺失，返回字典。
+    """
+    return scan_page(page_text).sections
 
 
-def aggregate_student_data(pages: List[str]) -> List[Dict[str, str]]:
+def parse_header(page_text: str) -> Tuple[Dict[str, str], int]:
     """
-    将多页数据按学生聚合。
-    key = (school, class, name, id, time)
-    sections 累加。
+    解析页首的基本信息与得分。
+    返回 (info_dict, score_int or -1)
+    """
+    scan = scan_page(page_text)
+    return scan.info, scan.score
+
+
+def iter_student_rows(pages: Iterable[str]) -> Iterator[Dict[str, str]]:
+    """
+    逐学生产出聚合结果（pages 可为逐页产出的生成器，只遍历一次）。
+    页首信息 key 变化即认为上一位学生的页面已结束，立即产出其记录的副本，
+    下游无需等待整份 PDF 解析完毕。
+    若同一学生的页面不连续，再次出现时继续累加，并再次产出更新后的完整记录。
     """
     agg: Dict[Tuple[str, str, str, str, str], Dict[str, str]] = {}
+    current = None
 
     for page_text in pages:
         norm = normalize_text(page_text)
-        info, score = parse_header(norm)
+        info, score, secs = scan_page(norm)
         # 若无法识别学生基本信息，跳过该页
         key = (info["school"], info["class"], info["name"], info["id"], info["time"])
         if all(key) is False:
@@ -149,7 +168,10 @@ def aggregate_student_data(pages: List[str]) -> List[Dict[str, str]]:
                 # 无法确定归属，跳过
                 continue
 
-        secs = split_sections(norm)
+        if key != current:
+            if current is not None:
+                yield dict(agg[current])
+            current = key
 
         if key not in agg:
             agg[key] = {
@@ -178,34 +200,50 @@ def aggregate_student_data(pages: List[str]) -> List[Dict[str, str]]:
                 else:
                     agg[key][field] = part
 
+    if current is not None:
+        yield dict(agg[current])
+
+
+def student_key(row: Dict[str, str]) -> Tuple[str, str, str, str, str]:
+    return (row["school"], row["class"], row["name"], row["id"], row["time"])
+
+
+def aggregate_student_data(pages: Iterable[str]) -> List[Dict[str, str]]:
+    """
+    将多页数据按学生聚合（pages 可为逐页产出的生成器，只遍历一次）。
+    key = (school, class, name, id, time)
+    sections 累加。
+    """
+    # 同一学生可能被多次产出（页面不连续），保留最后一次的完整记录
+    latest: Dict[Tuple[str, str, str, str, str], Dict[str, str]] = {}
+    for row in iter_student_rows(pages):
+        latest[student_key(row)] = row
+
     # 转为列表并排序（按姓名、学号）
-    rows = list(agg.values())
+    rows = list(latest.values())
     rows.sort(key=lambda r: (r["class"], r["name"], r["id"]))
     return rows
 
 
-def write_excel(rows: List[Dict[str, str]], path: Path) -> None:
-    wb = Workbook()
-    ws = wb.active
-    ws.title = "grammar_table"
+GRAMMAR_HEADERS = [
+    "序号",
+    "学校",
+    "班级",
+    "姓名",
+    "学号",
+    "作答时间",
+    "得分",
+    "我的原文",
+    "语法错误",
+    "单句点评",
+    "更多表达",
+]
 
-    headers = [
-        "序号",
-        "学校",
-        "班级",
-        "姓名",
-        "学号",
-        "作答时间",
-        "得分",
-        "我的原文",
-        "语法错误",
-        "单句点评",
-        "更多表达",
-    ]
-    ws.append(headers)
 
+def table_rows(rows: List[Dict[str, str]]) -> Iterator[list]:
+    """按 GRAMMAR_HEADERS 的列顺序产出每位学生的一行（序号从 1 开始）"""
     for idx, r in enumerate(rows, start=1):
-        ws.append([
+        yield [
             idx,
             r.get("school", ""),
             r.get("class", ""),
@@ -217,7 +255,17 @@ def write_excel(rows: List[Dict[str, str]], path: Path) -> None:
             r.get("errors", ""),
             r.get("comments", ""),
             r.get("more", ""),
-        ])
+        ]
+
+
+def write_excel(rows: List[Dict[str, str]], path: Path) -> None:
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "grammar_table"
+
+    ws.append(GRAMMAR_HEADERS)
+    for values in table_rows(rows):
+        ws.append(values)
 
     # 可选：自动列宽（简单估计）
     for col in ws.columns:
@@ -235,28 +283,282 @@ def write_excel(rows: List[Dict[str, str]], path: Path) -> None:
     wb.save(path)
 
 
-def main():
-    if not PDF_PATH.exists():
-        print(f"未找到 PDF 文件：{PDF_PATH}")
+class Extractor(NamedTuple):
+    """文本提取后端：count_pages(pdf_path) 与 iter_pages(pdf_path, start, end)"""
+    count_pages: Callable[[str], int]
+    iter_pages: Callable[[str, int, "int | None"], Iterator[str]]
+
+
+def _plumber_count(pdf_path: str) -> int:
+    with pdfplumber.open(pdf_path) as pdf:
+        return len(pdf.pages)
+
+
+def _plumber_iter(pdf_path: str, start: int = 0, end: int | None = None) -> Iterator[str]:
+    with pdfplumber.open(pdf_path) as pdf:
+        for page in pdf.pages[start:end]:
+            yield page.extract_text() or ""
+            # 释放该页缓存的布局对象，避免随页数累积
+            page.close()
+
+
+def _import_pdfium():
+    try:
+        import pypdfium2
+    except ImportError:
+        raise RuntimeError("EXTRACT_BACKEND=pypdfium2 需要安装 pypdfium2：pip install pypdfium2")
+    return pypdfium2
+
+
+def _pdfium_count(pdf_path: str) -> int:
+    doc = _import_pdfium().PdfDocument(pdf_path)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+
+def _pdfium_iter(pdf_path: str, start: int = 0, end: int | None = None) -> Iterator[str]:
+    doc = _import_pdfium().PdfDocument(pdf_path)
+    try:
+        for i in range(start, len(doc) if end is None else min(end, len(doc))):
+            page = doc[i]
+            textpage = page.get_textpage()
+            raw = textpage.get_text_bounded()
+            textpage.close()
+            page.close()
+            # 与 pdfplumber 输出对齐：统一换行、去掉行尾空白
+            raw = raw.replace("\r\n", "\n").replace("\r", "\n")
+            yield "\n".join(l.rstrip() for l in raw.split("\n")).strip("\n")
+    finally:
+        doc.close()
+
+
+EXTRACTORS: Dict[str, Extractor] = {
+    "pdfplumber": Extractor(_plumber_count, _plumber_iter),
+    "pypdfium2": Extractor(_pdfium_count, _pdfium_iter),
+}
+
+
+def get_extractor(backend: str | None = None) -> Extractor:
+    name = (backend or EXTRACT_BACKEND).strip().lower()
+    if name not in EXTRACTORS:
+        raise ValueError(f"未知的提取后端：{name}（可选：{', '.join(EXTRACTORS)}）")
+    return EXTRACTORS[name]
+
+
+def _iter_page_range(pdf_path: str, start: int = 0, end: int | None = None, backend: str | None = None) -> Iterator[str]:
+    for txt in get_extractor(backend).iter_pages(pdf_path, start, end):
+        if not txt.strip():
+            # 若为扫描版或文本为空，提示并继续
+            txt = ""
+        yield txt
+
+
+def _extract_page_range(args: Tuple[str, int, int, str]) -> List[str]:
+    """子进程任务：自行打开 PDF，提取 [start, end) 页的文本后关闭。"""
+    return list(_iter_page_range(*args))
+
+
+def _spawn_pool(workers: int) -> ProcessPoolExecutor:
+    """以 spawn 方式启动子进程：常驻服务是多线程进程，fork 可能继承其他线程持有的锁而死锁"""
+    return ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context("spawn"))
+
+
+def _ordered_map(pool: ProcessPoolExecutor, fn: Callable, items: Iterable, window: int) -> Iterator:
+    """按输入顺序产出 fn(item)；已提交但尚未取走的任务不超过 window 个，消费方较慢时结果不会在内存中堆积"""
+    pending = deque()
+    for item in items:
+        pending.append(pool.submit(fn, item))
+        if len(pending) >= window:
+            yield pending.popleft().result()
+    while pending:
+        yield pending.popleft().result()
+
+
+def count_pages(pdf_path: Path, backend: str | None = None) -> int:
+    return get_extractor(backend).count_pages(str(pdf_path))
+
+
+def iter_page_texts(pdf_path: Path, workers: int = 1, chunk_pages: int = EXTRACT_CHUNK_PAGES,
+                    backend: str | None = None) -> Iterator[str]:
+    """
+    按页序逐页产出文本，每页提取后立即释放其缓存，内存占用不随 PDF 总页数增长。
+    workers > 1 时按 chunk_pages 切分页码区间，交给进程池并行提取，结果仍按原页序返回；
+    同时在途的区间不超过 workers 的两倍。
+    backend 为 None 时使用 EXTRACT_BACKEND 环境变量指定的后端。
+    """
+    backend = backend or EXTRACT_BACKEND
+    if workers <= 1:
+        yield from _iter_page_range(str(pdf_path), 0, None, backend)
+        return
+
+    total = count_pages(pdf_path, backend)
+    chunk_pages = max(1, chunk_pages)
+    ranges = ((str(pdf_path), start, min(start + chunk_pages, total), backend) for start in range(0, total, chunk_pages))
+    with _spawn_pool(workers) as pool:
+        for texts in _ordered_map(pool, _extract_page_range, ranges, 2 * workers):
+            yield from texts
+
+
+def resolve_pdf_sources(spec: str | Iterable[str | Path] | None = None, ws: Workspace | None = None) -> List[Path]:
+    """
+    解析待提取的 PDF 列表。spec 为逗号分隔的字符串或路径列表，每项可以是 PDF 文件或目录
+    （取目录下全部 .pdf，按文件名排序）；未指定时使用工作区的 pdf_input（PDF_INPUT），
+    再退回工作区输入目录下的 1.pdf 与 pdfs/。不存在的路径忽略，同一文件只保留一次。
+    """
+    if spec is None:
+        ws = ws or Workspace.from_env()
+        spec = ws.pdf_input or [ws.pdf_path, ws.pdf_dir]
+    entries = [p.strip() for p in spec.split(",")] if isinstance(spec, str) else list(spec)
+    sources: List[Path] = []
+    seen = set()
+    for entry in entries:
+        if not entry:
+            continue
+        path = Path(entry)
+        if path.is_dir():
+            found = sorted(p for p in path.iterdir() if p.is_file() and p.suffix.lower() == ".pdf")
+        else:
+            found = [path] if path.is_file() else []
+        for p in found:
+            real = os.path.realpath(p)
+            if real not in seen:
+                seen.add(real)
+                sources.append(p)
+    return sources
+
+
+def identity_key(row: Dict[str, str]) -> Tuple[str, str, str, str]:
+    """跨文件去重使用的学生标识：(school, class, name, id)"""
+    return (row["school"], row["class"], row["name"], row["id"])
+
+
+def merge_source_rows(results: Iterable[Tuple[Path, List[Dict[str, str]]]]) -> List[Dict[str, str]]:
+    """
+    合并多个 PDF 的学生记录：按 (school, class, name, id) 去重，先出现的文件优先；
+    每行的 source 记录来源文件名，仅用于日志与去重提示，不写入面向学生的 grammar_table。
+    同一文件内的记录不做去重（与单文件提取一致）。
+    """
+    merged: List[Dict[str, str]] = []
+    seen: Dict[Tuple[str, str, str, str], str] = {}
+    duplicates = 0
+    for path, rows in results:
+        added = {}
+        for r in rows:
+            key = identity_key(r)
+            if key in seen:
+                duplicates += 1
+                print(f"⚠️ 重复学生 {r['name']}（{r['id']}）：{path.name} 中的记录已忽略，保留 {seen[key]}")
+                continue
+            r["source"] = path.name
+            merged.append(r)
+            added[key] = path.name
+        seen.update(added)
+    if duplicates:
+        print(f"⚠️ 共忽略 {duplicates} 条重复学生记录")
+    # 与 aggregate_student_data 相同的排序
+    merged.sort(key=lambda r: (r["class"], r["name"], r["id"]))
+    return merged
+
+
+def _extract_file(args: Tuple[str, str]) -> List[Dict[str, str]]:
+    """子进程任务：提取单个 PDF 并按学生聚合。"""
+    pdf_path, backend = args
+    return aggregate_student_data(iter_page_texts(Path(pdf_path), backend=backend))
+
+
+def iter_pdf_students(workers: int | None = None, backend: str | None = None,
+                      sources: str | Iterable[str | Path] | None = None,
+                      ws: Workspace | None = None) -> Iterator[Dict[str, str]]:
+    """
+    extract_rows 的流式版本：每位学生的页面一结束即产出其记录（见 iter_student_rows）。
+    多个 PDF 按顺序逐个解析，与先出现文件中重复的学生不再产出。
+    """
+    ws = ws or Workspace.from_env()
+    pdfs = resolve_pdf_sources(sources, ws)
+    if not pdfs:
+        print(f"未找到 PDF 文件：{ws.pdf_path}")
         return
 
-    pages_text: List[str] = []
-    with pdfplumber.open(PDF_PATH) as pdf:
-        for i, page in enumerate(pdf.pages, start=1):
-            txt = page.extract_text() or ""
-            if not txt.strip():
-                # 若为扫描版或文本为空，提示并继续
-                txt = ""
-            pages_text.append(txt)
+    workers = EXTRACT_WORKERS if workers is None else workers
+    seen = set()
+    for pdf_path in pdfs:
+        added = set()
+        for row in iter_student_rows(iter_page_texts(pdf_path, workers=workers, backend=backend)):
+            key = identity_key(row)
+            if key in seen:
+                continue
+            row["source"] = pdf_path.name
+            added.add(key)
+            yield row
+        seen |= added
+
+
+def extract_rows(workers: int | None = None, backend: str | None = None,
+                 sources: str | Iterable[str | Path] | None = None,
+                 ws: Workspace | None = None) -> List[Dict[str, str]]:
+    """
+    从 PDF 提取并按学生聚合，返回内存中的行记录（不写 Excel）；没有 PDF 时返回空列表。
+    单个 PDF 按页并行（workers）；多个 PDF 时每个文件一个进程并行提取，再合并去重。
+    """
+    ws = ws or Workspace.from_env()
+    pdfs = resolve_pdf_sources(sources, ws)
+    if not pdfs:
+        print(f"未找到 PDF 文件：{ws.pdf_path}")
+        return []
+
+    backend = backend or EXTRACT_BACKEND
+    if len(pdfs) == 1:
+        workers = EXTRACT_WORKERS if workers is None else workers
+        # 逐页流式聚合，不保留全部页面文本
+        return merge_source_rows([(pdfs[0], aggregate_student_data(iter_page_texts(pdfs[0], workers=workers, backend=backend)))])
+
+    file_workers = max(1, min(EXTRACT_FILE_WORKERS, len(pdfs)))
+    print(f"正在提取 {len(pdfs)} 个 PDF（并行进程数：{file_workers}）...")
+    tasks = [(str(p), backend) for p in pdfs]
+    results: List[List[Dict[str, str]]] = [[] for _ in tasks]
+    if file_workers == 1:
+        results = [_extract_file(t) for t in tasks]
+    else:
+        # 同时提交的文件数不超过进程数，一个完成再提交下一个；结果按文件顺序合并
+        with _spawn_pool(file_workers) as pool:
+            queued = iter(enumerate(tasks))
+            running = {}
+            for i, t in queued:
+                running[pool.submit(_extract_file, t)] = i
+                if len(running) < file_workers:
+                    continue
+                done, _ = wait(running, return_when=FIRST_COMPLETED)
+                for fut in done:
+                    results[running.pop(fut)] = fut.result()
+            for fut in list(running):
+                results[running.pop(fut)] = fut.result()
+    for pdf_path, rows in zip(pdfs, results):
+        print(f"  {pdf_path.name}：{len(rows)} 位同学")
+    return merge_source_rows(zip(pdfs, results))
+
+
+def main(workers: int | None = None, backend: str | None = None,
+         sources: str | Iterable[str | Path] | None = None, ws: Workspace | None = None):
+    ws = ws or Workspace.from_env()
+    if not resolve_pdf_sources(sources, ws):
+        print(f"未找到 PDF 文件：{ws.pdf_path}")
+        return
 
-    rows = aggregate_student_data(pages_text)
+    rows = extract_rows(workers, backend, sources, ws)
     if not rows:
         print("未解析到有效学生数据，请确认PDF格式是否与示例一致。")
         return
 
-    write_excel(rows, OUTPUT_XLSX)
-    print(f"已生成：{OUTPUT_XLSX}，共 {len(rows)} 位同学。")
+    write_excel(rows, ws.output_xlsx)
+    print(f"已生成：{ws.output_xlsx}，共 {len(rows)} 位同学。")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="从 PDF 提取学生作文数据到 Excel")
+    parser.add_argument("--workers", type=int, default=EXTRACT_WORKERS, help="并行提取的进程数（默认 1，即串行）")
+    parser.add_argument("--backend", choices=sorted(EXTRACTORS), default=None, help="文本提取后端（默认取 EXTRACT_BACKEND）")
+    parser.add_argument("pdfs", nargs="*", help="PDF 文件或目录（默认取 PDF_INPUT，或输入目录下的 1.pdf 与 pdfs/）")
+    cli = parser.parse_args()
+    main(workers=cli.workers, backend=cli.backend, sources=cli.pdfs or None)
\ No newline at end of file
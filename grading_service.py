@@ -0,0 +1,200 @@
+"""
+常驻批改服务：在 start_server.py 进程内维护任务队列与预热的批改线程，
+替代每次请求都启动一个新的 ``python main.py``。
+
+每个批改线程持有自己的事件循环与 EduChatClient（连接池跨任务复用），
+所有线程共享同一个 LLM 响应缓存。每个任务在提交时获得独立的工作区（settings.Workspace），
+不再通过进程环境变量切换考试，GRADING_WORKERS > 1 时不同考试可并行批改。
+"""
+from __future__ import annotations
+import io, os, sys, time, uuid, queue, asyncio, importlib, threading, traceback, contextvars
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+from educhat_client import EduChatClient
+from llm_cache import ResponseCache, LLM_CACHE_ENABLED
+from settings import Workspace
+
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "1"))
+JOB_HISTORY = int(os.getenv("JOB_HISTORY", "200"))   # 保留的已结束任务数
+JOB_LOG_LINES = int(os.getenv("JOB_LOG_LINES", "5000"))
+
+# 任务可单独指定的配置项（提交时的 env 参数）；考试名称与老师账号另作为工作区字段
+JOB_ENV_KEYS = ("EXAM_NAME", "TEACHER_USERNAME", "TASK_TYPE", "SUBGENRE", "FORCE_REGRADE")
+JOB_OPTION_KEYS = ("TASK_TYPE", "SUBGENRE", "FORCE_REGRADE")
+
+
+class _JobStdout(io.TextIOBase):
+    """按上下文把 print 输出分流到当前任务日志，同时照常写到原 stdout。
+
+    任务绑定保存在 ContextVar 中：每个批改线程各自独立，而该任务通过 asyncio.to_thread
+    派生的线程（如流式模式下的 PDF 解析）会继承绑定，输出同样计入任务日志。
+    """
+
+    def __init__(self, target):
+        self._target = target
+        self._job: contextvars.ContextVar = contextvars.ContextVar("grading_job", default=None)
+
+    def bind(self, job: "Job | None"):
+        self._job.set(job)
+
+    def write(self, s: str) -> int:
+        job = self._job.get()
+        if job is not None:
+            job.append_log(s)
+        return self._target.write(s)
+
+    def flush(self):
+        self._target.flush()
+
+
+@dataclass
+class Job:
+    id: str
+    exam_name: str
+    teacher_username: str = ""
+    env: dict = field(default_factory=dict)
+    workspace: Workspace | None = None
+    status: str = "queued"  # queued / running / succeeded / failed
+    created_at: float = field(default_factory=time.time)
+    started_at: float | None = None
+    finished_at: float | None = None
+    error: str = ""
+    reports: int = 0
+    skipped: int = 0
+    failed: int = 0
+    log: list = field(default_factory=list)
+
+    def append_log(self, s: str):
+        for line in s.splitlines():
+            if not line.strip():
+                continue
+            # 由日志前缀累计进度，轮询时无需解析全文
+            if line.startswith("✅ 报告生成"): self.reports += 1
+            elif line.startswith("⏭️ 输入未变化"): self.skipped += 1
+            elif line.startswith("❌ 学生"): self.failed += 1
+            self.log.append(line)
+        if len(self.log) > JOB_LOG_LINES:
+            del self.log[:len(self.log) - JOB_LOG_LINES]
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("succeeded", "failed")
+
+    def to_dict(self, log_tail: int = 20) -> dict:
+        return {
+            "jobId": self.id,
+            "examName": self.exam_name,
+            "teacherUsername": self.teacher_username,
+            "status": self.status,
+            "createdAt": self.created_at,
+            "startedAt": self.started_at,
+            "finishedAt": self.finished_at,
+            "progress": {"reports": self.reports, "skipped": self.skipped, "failed": self.failed},
+            "error": self.error,
+            "log": self.log[-log_tail:] if log_tail else list(self.log),
+        }
+
+
+class JobConflict(RuntimeError):
+    """同一考试已有排队或运行中的任务"""
+
+    def __init__(self, job: Job):
+        super().__init__(f"考试「{job.exam_name}」已有进行中的批改任务 {job.id}")
+        self.job = job
+
+
+class GradingService:
+    def __init__(self, workers: int = GRADING_WORKERS):
+        self.workers = max(1, workers)
+        self._queue: "queue.Queue[Job]" = queue.Queue()
+        self._jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._cache = ResponseCache() if LLM_CACHE_ENABLED else None
+        self._stdout: _JobStdout | None = None
+        self._started = False
+
+    def start(self):
+        if self._started:
+            return
+        self._started = True
+        self._stdout = _JobStdout(sys.stdout)
+        sys.stdout = self._stdout
+        # 预先导入批改模块（pandas/pydantic/httpx），首个任务无需再付导入开销
+        importlib.import_module("main")
+        for i in range(self.workers):
+            threading.Thread(target=self._worker, name=f"grading-worker-{i}", daemon=True).start()
+
+    def submit(self, exam_name: str, teacher_username: str = "", env: dict | None = None) -> Job:
+        """
+        提交批改任务。同一考试（及老师账号）已有排队或运行中的任务时抛出 JobConflict：
+        两个任务会同时写 out/<考试> 与 outputs/<考试> 下的同一批文件。
+        """
+        job = Job(id=uuid.uuid4().hex[:12], exam_name=exam_name, teacher_username=teacher_username,
+                  env={k: str(v) for k, v in (env or {}).items() if k in JOB_ENV_KEYS})
+        workspace = Workspace(
+            exam_name=job.exam_name,
+            teacher_username=job.teacher_username,
+            options={k: job.env.get(k) for k in JOB_OPTION_KEYS},
+        )
+        with self._lock:
+            active = next((j for j in self._jobs.values()
+                           if not j.finished and j.workspace.folder == workspace.folder), None)
+            if active is not None:
+                raise JobConflict(active)
+            job.workspace = workspace
+            self._jobs[job.id] = job
+            self._trim()
+        # 提交时即复制当前上传的输入文件（每个任务一份），之后的上传不影响排队中的任务
+        try:
+            job.workspace = workspace.snapshot_inputs(job.id)
+        except Exception as e:
+            job.status, job.error, job.finished_at = "failed", f"{type(e).__name__}: {e}", time.time()
+            raise
+        self._queue.put(job)
+        return job
+
+    def get(self, job_id: str) -> Job | None:
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def list(self) -> list:
+        with self._lock:
+            return list(self._jobs.values())
+
+    def _trim(self):
+        finished = [jid for jid, j in self._jobs.items() if j.finished]
+        for jid in finished[:max(0, len(finished) - JOB_HISTORY)]:
+            del self._jobs[jid]
+
+    def _worker(self):
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        client = EduChatClient(cache=self._cache, use_cache=self._cache is not None)
+        while True:
+            job = self._queue.get()
+            try:
+                self._run(job, client, loop)
+            finally:
+                self._queue.task_done()
+
+    def _run(self, job: Job, client: EduChatClient, loop: asyncio.AbstractEventLoop):
+        self._stdout.bind(job)
+        job.status, job.started_at = "running", time.time()
+        try:
+            importlib.import_module("main").main(client=client, loop=loop, ws=job.workspace)
+            job.status = "succeeded"
+        except (Exception, SystemExit) as e:  # main() 在前置检查失败时会调用 exit()
+            job.status = "failed"
+            job.error = f"{type(e).__name__}: {e}"
+            job.append_log(traceback.format_exc())
+        finally:
+            # KeyboardInterrupt 等照常向上抛出，任务本身仍标记为失败
+            if job.status == "running":
+                job.status = "failed"
+            job.finished_at = time.time()
+            job.workspace.drop_snapshot()
+            self._stdout.bind(None)
+
+
+service = GradingService()
@@ -0,0 +1,88 @@
+from __future__ import annotations
+import os, json, time, sqlite3, hashlib, threading
+
+# 磁盘缓存配置（SQLite 单文件，按请求内容寻址）
+LLM_CACHE_ENABLED = os.getenv("LLM_CACHE", "1").lower() not in ("0", "false", "no", "off")
+LLM_CACHE_PATH = os.getenv("LLM_CACHE_PATH", "./cache/llm_cache.sqlite")
+LLM_CACHE_MAX_MB = float(os.getenv("LLM_CACHE_MAX_MB", "256"))
+LLM_CACHE_MAX_AGE_DAYS = float(os.getenv("LLM_CACHE_MAX_AGE_DAYS", "30"))
+
+# 每写入多少条执行一次淘汰检查
+_EVICT_EVERY = 64
+
+def cache_key(model: str, temperature: float, max_tokens: int, system: str, user: str) -> str:
+    raw = json.dumps([model, temperature, max_tokens, system, user], ensure_ascii=False)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    """LLM 响应的持久化缓存，支持按容量/时长淘汰与命中统计。"""
+
+    def __init__(self, path: str = LLM_CACHE_PATH, max_mb: float = LLM_CACHE_MAX_MB,
+                 max_age_days: float = LLM_CACHE_MAX_AGE_DAYS):
+        self.path = path
+        self.max_bytes = int(max_mb * 1024 * 1024)
+        self.max_age = max_age_days * 86400
+        self.hits = 0
+        self.misses = 0
+        self._writes = 0
+        self._lock = threading.Lock()
+        d = os.path.dirname(path)
+        if d: os.makedirs(d, exist_ok=True)
+        self._db = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            " key TEXT PRIMARY KEY, value TEXT NOT NULL, size INTEGER NOT NULL,"
+            " created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+
+    def get(self, key: str) -> str | None:
+        now = time.time()
+        with self._lock:
+            row = self._db.execute("SELECT value, created_at FROM responses WHERE key=?", (key,)).fetchone()
+            if row is None or (self.max_age > 0 and now - row[1] > self.max_age):
+                self.misses += 1
+                return None
+            self._db.execute("UPDATE responses SET accessed_at=? WHERE key=?", (now, key))
+            self.hits += 1
+            return row[0]
+
+    def put(self, key: str, value: str) -> None:
+        now = time.time()
+        with self._lock:
+            self._db.execute(
+                "INSERT OR REPLACE INTO responses (key, value, size, created_at, accessed_at) VALUES (?,?,?,?,?)",
+                (key, value, len(value.encode("utf-8")), now, now),
+            )
+            self._writes += 1
+            if self._writes % _EVICT_EVERY == 0:
+                self._evict(now)
+
+    def evict(self) -> None:
+        with self._lock:
+            self._evict(time.time())
+
+    def _evict(self, now: float) -> None:
+        # 先删过期项，再按最近访问时间从旧到新删除，直到总容量回到上限内
+        if self.max_age > 0:
+            self._db.execute("DELETE FROM responses WHERE created_at < ?", (now - self.max_age,))
+        if self.max_bytes <= 0:
+            return
+        total = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM responses").fetchone()[0]
+        if total <= self.max_bytes:
+            return
+        over = total - self.max_bytes
+        freed, stale = 0, []
+        for key, size in self._db.execute("SELECT key, size FROM responses ORDER BY accessed_at"):
+            stale.append((key,)); freed += size
+            if freed >= over: break
+        self._db.executemany("DELETE FROM responses WHERE key=?", stale)
+
+    def stats(self) -> dict:
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses,
+                "hit_rate": round(self.hits / total, 4) if total else 0.0}
+
+    def close(self) -> None:
+        with self._lock:
+            self._db.close()
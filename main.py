@@ -1,13 +1,20 @@
-import asyncio, os
+import asyncio, os, json, hashlib, time
+from collections import deque
 import pandas as pd
 import yaml
 
-from settings import paths, sheets, modelconf
-from educhat_client import EduChatClient
-from aggregator import aggregate_all
+from settings import Paths, Workspace, sheets, modelconf
+from educhat_client import LLM_STREAM, EduChatClient
+from aggregator import AGGREGATE_MODE, GRAMMAR_FULL_SCORE, GRAMMAR_PROMPT_COLUMNS, aggregate_all, aggregate_combined
 from report_builder import write_excel, write_markdown
-from prompts import CONTENT_TABLE_SYSTEM, CONTENT_TABLE_USER_TMPL, STRUCTURE_TABLE_SYSTEM, STRUCTURE_TABLE_USER_TMPL
-from pydantic import BaseModel
+from prompts import CONTENT_TABLE_SYSTEM, CONTENT_TABLE_USER_TMPL, STRUCTURE_TABLE_SYSTEM, STRUCTURE_TABLE_USER_TMPL, AGGREGATE_SYSTEM, AGGREGATE_USER_TMPL, AGGREGATE_TEXT_SYSTEM, AGGREGATE_TEXT_USER_TMPL, COMBINED_SYSTEM, COMBINED_USER_TMPL, EXAM_CONTEXT_TMPL, PROMPT_VERSION
+from pipeline import PIPELINE_MODE, StudentStream, build_sheets, write_workbook
+from student_index import Student, StudentIndex, students
+from prompt_compact import fill, render, track_run
+from pydantic import BaseModel, ValidationError
+
+# 批改方式：split（默认）内容/结构/汇总分别调用；combined 一次调用同时返回三部分，缺失的部分再单独补问
+GRADING_MODE = os.getenv("GRADING_MODE", "split").strip().lower()
 
 def load_rubrics_yaml(path:str):
     if not os.path.exists(path): return None
@@ -35,6 +42,99 @@ def stringify_rubric(items):
 class Row(BaseModel):
     维度:str; 满分:int; 得分:int; 扣分原因:str; 建议:str
 
+class CT(BaseModel):
+    content_table:list[Row]; 总分:int; 等级:str
+
+class ST(BaseModel):
+    structure_table:list[Row]; 总分:int; 等级:str
+
+def normalize_rows(items) -> list[Row]:
+    try:
+        return [Row.model_validate(r) for r in items]
+    except ValidationError:
+        return [Row(维度=r.get("维度","-"), 满分=int(r.get("满分",0)), 得分=int(r.get("得分",0)), 扣分原因=str(r.get("扣分原因","")), 建议=str(r.get("建议",""))) for r in items]
+
+PARTIAL_TABLES = {"content_table": "内容评分表", "structure_table": "结构评分表"}
+
+PARTIAL_ROWS_NAME = ".partial_rows.json"
+PARTIAL_ROWS_KEEP = int(os.getenv("PARTIAL_ROWS_KEEP", "20"))  # 进度页展示的最近评分表行数
+
+class PartialRowFeed:
+    """
+    流式模式下已生成的评分表行：保留最近 PARTIAL_ROWS_KEEP 行，写到考试输出目录下的 .partial_rows.json，
+    进度页轮询的 /api/progress 读取该文件展示；运行结束时删除，避免下次运行显示过期内容。
+    """
+
+    def __init__(self, output_dir: str):
+        self.path = os.path.join(output_dir, PARTIAL_ROWS_NAME)
+        self.rows: deque = deque(maxlen=max(1, PARTIAL_ROWS_KEEP))
+        self.close()
+
+    def add(self, row: dict):
+        self.rows.append(row)
+        # 先写临时文件再替换，进度接口不会读到半个 JSON
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(list(self.rows), f, ensure_ascii=False)
+        os.replace(tmp, self.path)
+
+    def close(self):
+        for path in (self.path, self.path + ".tmp"):
+            if os.path.exists(path):
+                os.remove(path)
+
+def partial_rows(s_name: str, feed: PartialRowFeed | None = None):
+    """流式模式（LLM_STREAM）下把已生成的评分表行即时打印到任务日志，并交给 feed 供进度页展示"""
+    def on_partial(path: tuple, value):
+        if len(path) >= 2 and isinstance(path[-1], int) and path[-2] in PARTIAL_TABLES and isinstance(value, dict):
+            row = {"student": s_name, "table": PARTIAL_TABLES[path[-2]], "维度": str(value.get("维度", "")),
+                   "得分": value.get("得分", ""), "满分": value.get("满分", "")}
+            print(f"📝 {s_name} {row['table']}：{row['维度']} {row['得分']}/{row['满分']}")
+            if feed is not None:
+                feed.add(row)
+    return on_partial
+
+def section_ok(section, table_key: str) -> bool:
+    """合并批改结果中的内容/结构部分是否完整可用（评分表非空、行与总分可规范化）"""
+    if not isinstance(section, dict) or not section.get(table_key) or not isinstance(section[table_key], list):
+        return False
+    try:
+        normalize_rows(section[table_key]); int(section.get("总分"))
+        return True
+    except (TypeError, ValueError, AttributeError):
+        return False
+
+MANIFEST_NAME = ".grading_manifest.json"
+
+def load_manifest(output_dir: str) -> dict:
+    """读取考试输出目录下的逐学生断点清单；不存在或损坏时返回空清单"""
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    if not os.path.exists(path): return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+        return data if isinstance(data, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+def save_manifest(output_dir: str, manifest: dict):
+    # 先写临时文件再替换，避免中途退出留下半个 JSON
+    path = os.path.join(output_dir, MANIFEST_NAME)
+    tmp = path + ".tmp"
+    with open(tmp, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, ensure_ascii=False, indent=1)
+    os.replace(tmp, path)
+
+def student_fingerprint(*parts) -> str:
+    """对影响批改结果的全部输入（作文、教师评语、细则、提示词版本等）做哈希"""
+    raw = json.dumps([PROMPT_VERSION, *parts], ensure_ascii=False, default=str)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+def already_graded(manifest: dict, student_key: str, fp: str, md_path: str) -> bool:
+    """输入指纹与上次一致且报告仍在时跳过该学生"""
+    done = manifest.get(student_key) or {}
+    return done.get("fingerprint") == fp and os.path.exists(md_path)
+
 def clear_output_directory():
     """清除out文件夹及其内容"""
     import shutil
@@ -60,40 +160,27 @@ def clear_outputs_directory():
     else:
         print(f"outputs目录不存在，无需清除: {outputs_dir}")
 
-def main():
+def main(client: EduChatClient | None = None, loop: asyncio.AbstractEventLoop | None = None, ws: Workspace | None = None):
+    """
+    client/loop 由常驻批改服务传入以复用连接池与缓存；ws 为该任务的工作区。
+    命令行运行时均为 None，工作区取自 EXAM_NAME 等环境变量。
+    """
     global os
-    # 获取考试名称和老师账号
-    exam_name = os.environ.get('EXAM_NAME', '').strip()
-    teacher_username = os.environ.get('TEACHER_USERNAME', '').strip()
-    
-    # 如果指定了考试名称，创建对应的输出目录结构
+    started = time.perf_counter()
+    # 工作区：考试对应的输入与输出路径，以及体裁等任务级配置
+    ws = ws or Workspace.from_env()
+    exam_name = ws.exam_name
+    exam_output_dir = str(ws.out_dir)
+    exam_outputs_dir = str(ws.outputs_dir)
+    # 确保目录存在
+    os.makedirs(exam_output_dir, exist_ok=True)
+    os.makedirs(exam_outputs_dir, exist_ok=True)
     if exam_name:
-        # 创建安全的文件夹名称（移除非法字符）
-        safe_exam_name = "".join(ch for ch in exam_name if ch not in '\\/:*?"<>|').strip()
-        if not safe_exam_name:
-            safe_exam_name = "未命名考试"
-        
-        # 如果有老师账号，添加到文件夹名称
-        if teacher_username:
-            safe_teacher_name = "".join(ch for ch in teacher_username if ch not in '\\/:*?"<>|').strip()
-            if safe_teacher_name:
-                safe_exam_name = f"{safe_exam_name}_{safe_teacher_name}"
-        
-        # 创建考试特定的输出目录
-        exam_output_dir = os.path.join("out", safe_exam_name)
-        exam_outputs_dir = os.path.join("outputs", safe_exam_name)
-        
-        # 确保目录存在
-        os.makedirs(exam_output_dir, exist_ok=True)
-        os.makedirs(exam_outputs_dir, exist_ok=True)
-        
         print(f"考试名称: {exam_name}")
-        print(f"老师账号: {teacher_username or '未指定'}")
+        print(f"老师账号: {ws.teacher_username or '未指定'}")
         print(f"输出目录: {exam_output_dir}")
         print(f"处理目录: {exam_outputs_dir}")
     else:
-        exam_output_dir = "out"
-        exam_outputs_dir = "outputs"
         print("未指定考试名称，使用默认输出目录")
     
     # 检查服务器连接状态
@@ -108,57 +195,71 @@ def main():
         print("请确保服务器正在运行在端口3000上")
         exit(1)
     
-    # 步骤1：设置环境变量，让处理模块使用正确的路径
-    os.environ['EXAM_NAME'] = exam_name
-    if teacher_username:
-        os.environ['TEACHER_USERNAME'] = teacher_username
-    
-    # 检查中间文件状态，决定需要执行哪些处理步骤
-    intermediate_excel_path = os.path.join(exam_outputs_dir, "output.xlsx")
-    processed_excel_path = os.path.join(exam_outputs_dir, "output_processed.xlsx")
+    # 步骤1：检查中间文件状态，决定需要执行哪些处理步骤（各处理模块显式接收工作区）
+    intermediate_excel_path = str(ws.output_xlsx)
+    processed_excel_path = str(ws.processed_xlsx)
     
-    # 检查是否需要执行PDF提取
-    if not os.path.exists(intermediate_excel_path):
-        print("正在从PDF提取数据...")
-        from extract_to_excel import main as extract_main
-        extract_main()
-        print("PDF数据提取完成")
+    sheet_frames = None
+    student_stream = None
+    if PIPELINE_MODE == "stream":
+        # 流式流水线：边解析 PDF 边批改，工作表在解析结束后一次性写出
+        print("正在以流式流水线处理数据（解析PDF的同时开始批改）...")
+        student_stream = StudentStream(ws)
+        sheet_frames = {}
+    elif PIPELINE_MODE == "memory":
+        # 内存流水线：三个预处理阶段之间不落盘，最后只写一次 output_processed.xlsx
+        print("正在以内存流水线处理数据（PDF提取 → Excel处理 → 学生互评和教师评价）...")
+        sheet_frames = build_sheets(ws)
+        if not sheet_frames:
+            raise RuntimeError("未解析到有效学生数据，请确认PDF格式是否与示例一致。")
+        write_workbook(sheet_frames, processed_excel_path)
+        print(f"✅ 已生成：{processed_excel_path}")
     else:
-        print("检测到中间Excel文件，跳过PDF提取")
+        # 检查是否需要执行PDF提取
+        if not os.path.exists(intermediate_excel_path):
+            print("正在从PDF提取数据...")
+            from extract_to_excel import main as extract_main
+            extract_main(ws=ws)
+            print("PDF数据提取完成")
+        else:
+            print("检测到中间Excel文件，跳过PDF提取")
     
-    # 检查是否需要执行Excel处理
-    if not os.path.exists(processed_excel_path):
-        print("正在处理Excel数据...")
-        from process_excel import main as process_main
-        process_main()
-        print("Excel数据处理完成")
-    else:
-        print("检测到已处理的Excel文件，跳过Excel处理")
+        # 检查是否需要执行Excel处理
+        if not os.path.exists(processed_excel_path):
+            print("正在处理Excel数据...")
+            from process_excel import main as process_main
+            process_main(ws)
+            print("Excel数据处理完成")
+        else:
+            print("检测到已处理的Excel文件，跳过Excel处理")
     
-    # 总是执行学生互评处理（因为这是最后一步，需要确保数据完整）
-    print("正在处理学生互评和教师评价数据...")
-    from student_teacher_review import process_student_peer_review
-    process_student_peer_review()
-    print("学生互评和教师评价数据处理完成")
+        # 总是执行学生互评处理（因为这是最后一步，需要确保数据完整）
+        print("正在处理学生互评和教师评价数据...")
+        from student_teacher_review import process_student_peer_review
+        process_student_peer_review(ws)
+        print("学生互评和教师评价数据处理完成")
     
-    # 步骤2：更新全局路径设置，使用考试特定的输出目录
-    from settings import paths
+    # 步骤2：本任务的路径设置，使用考试特定的输出目录（不修改全局 paths，便于多个考试并行）
+    paths = Paths(ws)
     paths.update_paths(exam_output_dir)
     print(f"✅ 已更新输出路径：{paths.OUTPUT_DIR}")
+    partial_feed = PartialRowFeed(paths.OUTPUT_DIR) if LLM_STREAM else None
     
     # 步骤3：继续原有的main函数逻辑
     input_excel = processed_excel_path
-    if not os.path.exists(input_excel):
-        raise FileNotFoundError(f"INPUT_EXCEL not found: {input_excel}")
-
-    xl = pd.ExcelFile(input_excel)
+    if sheet_frames is None:
+        if not os.path.exists(input_excel):
+            raise FileNotFoundError(f"INPUT_EXCEL not found: {input_excel}")
+        # 每个工作表只解析一次
+        with pd.ExcelFile(input_excel) as xl:
+            sheet_frames = {name: xl.parse(sheet_name=name) for name in xl.sheet_names}
     def read_sheet(name: str) -> pd.DataFrame:
-        if name in xl.sheet_names: return xl.parse(sheet_name=name)
-        for s in xl.sheet_names:
-            if name.lower() in s.lower(): return xl.parse(sheet_name=s)
+        if name in sheet_frames: return sheet_frames[name].copy()
+        for s in sheet_frames:
+            if name.lower() in s.lower(): return sheet_frames[s].copy()
         # 如果找不到匹配的工作表，尝试使用第一个工作表
-        if xl.sheet_names:
-            return xl.parse(sheet_name=xl.sheet_names[0])
+        if sheet_frames:
+            return next(iter(sheet_frames.values())).copy()
         return pd.DataFrame()
 
     grammar_df = read_sheet(sheets.GRAMMAR_TABLE)
@@ -172,6 +273,9 @@ def main():
     rubric_structure_df = read_sheet(sheets.RUBRIC_STRUCTURE)
 
     # 为语法表新增「原文与姓名」列（尽可能自动识别列名）
+    def _with_text_and_name(df: pd.DataFrame) -> pd.DataFrame:
+        df["原文与姓名"] = df["我的原文"].astype(str).str.strip() + " —— " + df["姓名"].astype(str).str.strip()
+        return df
     def _pick_col(df: pd.DataFrame, candidates: list[str]) -> str | None:
         for c in candidates:
             if c in df.columns: return c
@@ -184,45 +288,20 @@ def main():
         if text_col is None and student_df is not None and not student_df.empty:
             text_col = _pick_col(student_df, ["原文","text","内容","ocr_text","作文原文"])
         if ("姓名" in grammar_df.columns) and ("我的原文" in grammar_df.columns):
-            grammar_df["原文与姓名"] = grammar_df["我的原文"].astype(str).str.strip() + " —— " + grammar_df["姓名"].astype(str).str.strip()
+            grammar_df = _with_text_and_name(grammar_df)
         elif name_col and text_col:
             try:
                 grammar_df["原文与姓名"] = grammar_df[text_col].astype(str).str.strip() + " —— " + grammar_df[name_col].astype(str).str.strip()
             except Exception:
                 grammar_df["原文与姓名"] = grammar_df.astype(str).agg(" ".join, axis=1)
 
-    # 改为逐行处理，每个学生单独生成 Markdown
-    def _get_student_name(row: pd.Series) -> str:
-        # 精确匹配
-        for c in ["姓名","学生姓名","name","Name"]:
-            if c in row.index and pd.notna(row[c]) and str(row[c]).strip():
-                return str(row[c]).strip()
-        # 模糊匹配包含"姓名"
-        for c in row.index:
-            sc = str(c)
-            if ("姓名" in sc) and pd.notna(row[c]) and str(row[c]).strip():
-                return str(row[c]).strip()
-        return "未命名学生"
-
-    # 预取教师评语按姓名映射
-    teacher_map = {}
-    if teacher_df is not None and not teacher_df.empty:
-        for _, tr in teacher_df.iterrows():
-            # 教师表优先取"姓名"
-            tname = str(tr["姓名"]).strip() if ("姓名" in tr.index and pd.notna(tr["姓名"])) else _get_student_name(tr)
-            teacher_map.setdefault(tname, [])
-            # 选取教师文本列
-            t_text = ""
-            for c in ["评语","老师评语","teacher_text","text","内容","ocr_text"]:
-                if c in tr.index and pd.notna(tr[c]):
-                    t_text = str(tr[c]); break
-            if t_text:
-                teacher_map[tname].append(t_text)
+    # 学生索引：列名只识别一次，语法表按学号（缺失时按姓名）分组，教师评语预先按学生合并
+    student_index = StudentIndex(grammar_df, teacher_df)
 
     y = load_rubrics_yaml(paths.RUBRICS_YAML) or {}
     platform = y.get("meta",{}).get("platform","天学网")
     grade = y.get("meta",{}).get("grade","高中三年级")
-    task_type = os.environ.get("TASK_TYPE", y.get("meta",{}).get("task_type","议论文"))
+    task_type = ws.option("TASK_TYPE", y.get("meta",{}).get("task_type","议论文"))
     if isinstance(task_type, list): task_type = task_type[0]
 
     penalties = y.get("penalties",{})
@@ -238,7 +317,7 @@ def main():
     structure_text = stringify_rubric(structure_items)
 
     # 子体裁与格式配置（需先于 prompts 构造）
-    subgenre = os.environ.get("SUBGENRE","").strip()
+    subgenre = ws.option("SUBGENRE","").strip()
     genre_all = y.get("genre_overrides",{}).get(task_type) or {}
     sub_conf = {}
     if subgenre and isinstance(genre_all.get("subgenres"), dict):
@@ -256,150 +335,274 @@ def main():
         "reference_substitution": y.get("lexical_cohesion",{}).get("reference_substitution",[]),
         "parallelism_examples": y.get("lexical_cohesion",{}).get("parallelism_examples",[])
     }
-    # 结构 prompt 模板按学生填充在循环中
+    # 考试上下文：同一场考试内逐字节相同，作为全部提示词的公共前缀（便于命中服务端前缀缓存）
+    exam_context = fill(
+        EXAM_CONTEXT_TMPL,
+        subgenre_hint=("/"+subgenre if subgenre else ""),
+        platform=platform, grade=grade, task_type=task_type,
+        content_rubric_text=content_text,
+        structure_rubric_text=structure_text,
+        connectives=connectives,
+        cohesion_extra=cohesion_extra,
+        required_fields=required_fields,
+        format_penalties=format_penalties,
+        format_tips=format_tips,
+        grade_map=grade_map, anchors=anchors, penalties=penalties, weights=weights,
+    )
 
-    client = EduChatClient()
+    owns_client = client is None
+    if owns_client:
+        client = EduChatClient()
 
     async def run():
         # 逐行处理学生
-        import json
-        from pydantic import ValidationError
         from report_builder import write_excel, write_markdown
 
-        # 初始化变量以避免作用域问题
-        ct = None
-        st = None
-        summary = None
-        content_json = None
-        structure_json = None
-
         # 若学生表为空，直接保留原有行为
-        if student_df is None or student_df.empty:
+        if student_stream is None and (student_df is None or student_df.empty):
             student_text = load_text_sheet(student_df) if student_df is not None and not student_df.empty else ""
             teacher_text = load_text_sheet(teacher_df) if teacher_df is not None and not teacher_df.empty else ""
-            content_user = CONTENT_TABLE_USER_TMPL.format(
-                subgenre_hint=("/"+subgenre if subgenre else ""),
-                required_fields=required_fields,
-                format_penalties=format_penalties,
-                platform=platform, grade=grade, task_type=task_type,
-                rubric_text=content_text,
-                grade_map=grade_map, anchors=anchors, penalties=penalties,
+            content_user = render(
+                CONTENT_TABLE_USER_TMPL, system=CONTENT_TABLE_SYSTEM, trim=("exam_context",), essential=("student_text",),
+                exam_context=exam_context,
                 student_text=student_text
             )
-            structure_user = STRUCTURE_TABLE_USER_TMPL.format(
-                subgenre_hint=("/"+subgenre if subgenre else ""),
-                required_fields=required_fields,
-                format_penalties=format_penalties,
-                format_tips=format_tips,
-                platform=platform, grade=grade, task_type=task_type,
-                rubric_text=structure_text,
-                connectives=connectives,
-                cohesion_extra=cohesion_extra,
+            structure_user = render(
+                STRUCTURE_TABLE_USER_TMPL, system=STRUCTURE_TABLE_SYSTEM, trim=("teacher_text", "exam_context"),
+                essential=("student_text",),
+                exam_context=exam_context,
                 teacher_text=teacher_text,
                 student_text=student_text
             )
-            resp1 = await client.acomplete(CONTENT_TABLE_SYSTEM, content_user)
+            resp1, resp2 = await asyncio.gather(
+                client.acomplete(CONTENT_TABLE_SYSTEM, content_user),
+                client.acomplete(STRUCTURE_TABLE_SYSTEM, structure_user),
+            )
             content_json = json.loads(resp1)
-            resp2 = await client.acomplete(STRUCTURE_TABLE_SYSTEM, structure_user)
             structure_json = json.loads(resp2)
-            try:
-                content_rows = [Row.model_validate(r) for r in content_json.get("content_table",[])]
-            except ValidationError:
-                content_rows = [Row(维度=r.get("维度","-"), 满分=int(r.get("满分",0)), 得分=int(r.get("得分",0)), 扣分原因=str(r.get("扣分原因","")), 建议=str(r.get("建议",""))) for r in content_json.get("content_table",[])]
-            try:
-                structure_rows = [Row.model_validate(r) for r in structure_json.get("structure_table",[])]
-            except ValidationError:
-                structure_rows = [Row(维度=r.get("维度","-"), 满分=int(r.get("满分",0)), 得分=int(r.get("得分",0)), 扣分原因=str(r.get("扣分原因","")), 建议=str(r.get("建议",""))) for r in structure_json.get("structure_table",[])]
-            summary = await aggregate_all(client, grammar_df, content_json, structure_json, weights, grade_map)
-            class CT(BaseModel):
-                content_table:list[Row]; 总分:int; 等级:str
-            class ST(BaseModel):
-                structure_table:list[Row]; 总分:int; 等级:str
-            ct = CT(content_table=content_rows, 总分=int(content_json.get("总分",0)), 等级=str(content_json.get("等级","")))
-            st = ST(structure_table=structure_rows, 总分=int(structure_json.get("总分",0)), 等级=str(structure_json.get("等级","")))
+            summary = await aggregate_all(client, grammar_df, content_json, structure_json, weights, grade_map, exam_context)
+            ct = CT(content_table=normalize_rows(content_json.get("content_table",[])), 总分=int(content_json.get("总分",0)), 等级=str(content_json.get("等级","")))
+            st = ST(structure_table=normalize_rows(structure_json.get("structure_table",[])), 总分=int(structure_json.get("总分",0)), 等级=str(structure_json.get("等级","")))
             write_excel(paths.OUTPUT_EXCEL, grammar_df, ct, st, summary.model_dump(), content_format=content_json, structure_format=structure_json)
             write_markdown(paths.OUTPUT_REPORT_MD, grammar_df, ct, st, summary.model_dump(), content_format=content_json, structure_format=structure_json)
             print(f"✅ Done. Excel: {paths.OUTPUT_EXCEL}  Markdown: {paths.OUTPUT_REPORT_MD}")
             return
 
         # 正常逐学生输出（以 grammar_table 每一行作为学生）
-        source_df = grammar_df if grammar_df is not None and not grammar_df.empty else student_df
-        for idx, row in source_df.iterrows():
-            # 姓名读取：精确"姓名"优先，随后模糊匹配
-            s_name = str(row["姓名"]).strip() if ("姓名" in row.index and pd.notna(row["姓名"]) and str(row["姓名"]).strip()) else _get_student_name(row)
-            # 原文读取：精确"我的原文"，其次任何包含"原文"的列
-            if ("我的原文" in row.index) and pd.notna(row["我的原文"]) and str(row["我的原文"]).strip():
-                s_text = str(row["我的原文"]).strip()
-            else:
-                s_text = ""
-                for c in row.index:
-                    if ("原文" in str(c)) and pd.notna(row[c]) and str(row[c]).strip():
-                        s_text = str(row[c]).strip()
-                        break
-                if not s_text:
-                    for c in ["text","内容","ocr_text","作文原文"]:
-                        if c in row.index and pd.notna(row[c]) and str(row[c]).strip():
-                            s_text = str(row[c]).strip(); break
-            # 匹配教师评语
-            t_text = "\n".join([t for t in teacher_map.get(s_name, []) if t]) if teacher_map else ""
+        # 多名学生并发批改，同时在途的学生数受 GRADING_CONCURRENCY 限制
+        sem = asyncio.Semaphore(max(1, modelconf.GRADING_CONCURRENCY))
+        # 断点清单：输入未变且报告已生成的学生直接跳过（FORCE_REGRADE=1 时全部重批）
+        force_regrade = ws.option("FORCE_REGRADE", "").strip().lower() in ("1", "true", "yes")
+        manifest = {} if force_regrade else load_manifest(paths.OUTPUT_DIR)
+        static_fp = student_fingerprint(CONTENT_TABLE_SYSTEM, STRUCTURE_TABLE_SYSTEM, AGGREGATE_SYSTEM, AGGREGATE_USER_TMPL,
+                                        weights, grade_map, modelconf.MODEL_NAME)
+        if AGGREGATE_MODE != "llm":
+            # 切换汇总方式后需重新汇总；默认 llm 时保持原有指纹，已完成的学生不受影响
+            static_fp = student_fingerprint(static_fp, AGGREGATE_MODE, AGGREGATE_TEXT_SYSTEM, AGGREGATE_TEXT_USER_TMPL, GRAMMAR_FULL_SCORE)
+        if GRADING_MODE == "combined":
+            static_fp = student_fingerprint(static_fp, GRADING_MODE, COMBINED_SYSTEM)
+
+        async def grade_combined(combined_user: str, gdf: pd.DataFrame, content_prompt, structure_prompt, on_partial=None):
+            """一次调用取得内容/结构/汇总；逐部分校验，只对缺失或无效的部分单独补问"""
+            data = {}
+            try:
+                data = json.loads(await client.acomplete(COMBINED_SYSTEM, combined_user, on_partial=on_partial))
+            except Exception as e:
+                print(f"⚠️ 合并批改调用失败，改为分项调用：{e}")
+            data = data if isinstance(data, dict) else {}
+            content_json = data.get("content") if section_ok(data.get("content"), "content_table") else None
+            structure_json = data.get("structure") if section_ok(data.get("structure"), "structure_table") else None
+            retry = []
+            if content_json is None:
+                retry.append(client.acomplete(CONTENT_TABLE_SYSTEM, content_prompt(), on_partial=on_partial))
+            if structure_json is None:
+                retry.append(client.acomplete(STRUCTURE_TABLE_SYSTEM, structure_prompt(), on_partial=on_partial))
+            if retry:
+                print(f"🔁 合并结果缺少 {len(retry)} 个评分表，单独补问")
+                answers = iter([json.loads(r) for r in await asyncio.gather(*retry)])
+                content_json = content_json if content_json is not None else next(answers)
+                structure_json = structure_json if structure_json is not None else next(answers)
+            summary = await aggregate_combined(client, gdf, content_json, structure_json, weights, grade_map, data.get("summary"), exam_context)
+            return content_json, structure_json, summary
+
+        async def grade_student(student: Student, gdf: pd.DataFrame):
+            s_name, s_text, s_id = student.name, student.text, student.sid
+            t_text = student_index.teacher_text(student)
             # 清理文件名非法字符
             safe_name = "".join(ch for ch in s_name if ch not in '\\/:*?"<>|').strip() or "未命名学生"
-            content_user = CONTENT_TABLE_USER_TMPL.format(
-                subgenre_hint=("/"+subgenre if subgenre else ""),
-                required_fields=required_fields,
-                format_penalties=format_penalties,
-                platform=platform, grade=grade, task_type=task_type,
-                rubric_text=content_text,
-                grade_map=grade_map, anchors=anchors, penalties=penalties,
-                student_text=s_text
-            )
-            structure_user = STRUCTURE_TABLE_USER_TMPL.format(
-                subgenre_hint=("/"+subgenre if subgenre else ""),
-                required_fields=required_fields,
-                format_penalties=format_penalties,
-                format_tips=format_tips,
-                platform=platform, grade=grade, task_type=task_type,
-                rubric_text=structure_text,
-                connectives=connectives,
-                cohesion_extra=cohesion_extra,
-                teacher_text=t_text,
-                student_text=s_text
-            )
-            # 调模型
-            resp1 = await client.acomplete(CONTENT_TABLE_SYSTEM, content_user)
-            content_json = json.loads(resp1)
-            resp2 = await client.acomplete(STRUCTURE_TABLE_SYSTEM, structure_user)
-            structure_json = json.loads(resp2)
-            # 规范化
-            try:
-                content_rows = [Row.model_validate(r) for r in content_json.get("content_table",[])]
-            except ValidationError:
-                content_rows = [Row(维度=r.get("维度","-"), 满分=int(r.get("满分",0)), 得分=int(r.get("得分",0)), 扣分原因=str(r.get("扣分原因","")), 建议=str(r.get("建议",""))) for r in content_json.get("content_table",[])]
+            student_key = f"{s_id}|{s_name}"
+            def content_prompt():
+                return render(
+                    CONTENT_TABLE_USER_TMPL, system=CONTENT_TABLE_SYSTEM, trim=("exam_context",),
+                    essential=("student_text",), label=s_name,
+                    exam_context=exam_context,
+                    student_text=s_text
+                )
+            def structure_prompt():
+                return render(
+                    STRUCTURE_TABLE_USER_TMPL, system=STRUCTURE_TABLE_SYSTEM, trim=("teacher_text", "exam_context"),
+                    essential=("student_text",), label=s_name,
+                    exam_context=exam_context,
+                    teacher_text=t_text,
+                    student_text=s_text
+                )
+            if GRADING_MODE == "combined":
+                # 场景、细则与作文只发送一次；分项提示词仅在需要补问时渲染
+                combined_user = render(
+                    COMBINED_USER_TMPL, system=COMBINED_SYSTEM,
+                    columns={"grammar_table": GRAMMAR_PROMPT_COLUMNS}, trim=("grammar_table", "teacher_text", "exam_context"),
+                    essential=("student_text",), label=s_name,
+                    exam_context=exam_context,
+                    grammar_table=gdf,
+                    teacher_text=t_text,
+                    student_text=s_text
+                )
+                prompt_parts = (combined_user,)
+            else:
+                content_user, structure_user = content_prompt(), structure_prompt()
+                prompt_parts = (content_user, structure_user)
+            md_path = os.path.join(paths.OUTPUT_DIR, f"{safe_name}.md")
+            # 渲染后的提示词已包含作文、教师评语与评分细则
+            fp = student_fingerprint(static_fp, *prompt_parts)
+            if already_graded(manifest, student_key, fp, md_path):
+                return "skipped", student_key, fp, md_path
             try:
-                structure_rows = [Row.model_validate(r) for r in structure_json.get("structure_table",[])]
-            except ValidationError:
-                structure_rows = [Row(维度=r.get("维度","-"), 满分=int(r.get("满分",0)), 得分=int(r.get("得分",0)), 扣分原因=str(r.get("扣分原因","")), 建议=str(r.get("建议",""))) for r in structure_json.get("structure_table",[])]
-            # 汇总（可按需过滤该学生的语法子集；若无法匹配姓名则使用全表）
-            gdf = grammar_df
-            if name_col and grammar_df is not None and (name_col in grammar_df.columns):
-                _filtered = grammar_df[grammar_df[name_col].astype(str).str.strip() == s_name]
-                gdf = _filtered if not _filtered.empty else grammar_df
-            summary = await aggregate_all(client, gdf, content_json, structure_json, weights, grade_map)
+                async with sem:
+                    if GRADING_MODE == "combined":
+                        content_json, structure_json, summary = await grade_combined(combined_user, gdf, content_prompt, structure_prompt, partial_rows(s_name, partial_feed))
+                    else:
+                        # 内容与结构评分互不依赖，并发调用；两者完成后立即汇总
+                        resp1, resp2 = await asyncio.gather(
+                            client.acomplete(CONTENT_TABLE_SYSTEM, content_user, on_partial=partial_rows(s_name, partial_feed)),
+                            client.acomplete(STRUCTURE_TABLE_SYSTEM, structure_user, on_partial=partial_rows(s_name, partial_feed)),
+                        )
+                        content_json = json.loads(resp1)
+                        structure_json = json.loads(resp2)
+                        # 汇总使用该学生的语法子集（由索引取得；无法匹配时为全表）
+                        summary = await aggregate_all(client, gdf, content_json, structure_json, weights, grade_map, exam_context)
+                # 规范化
+                ct = CT(content_table=normalize_rows(content_json.get("content_table",[])), 总分=int(content_json.get("总分",0)), 等级=str(content_json.get("等级","")))
+                st = ST(structure_table=normalize_rows(structure_json.get("structure_table",[])), 总分=int(structure_json.get("总分",0)), 等级=str(structure_json.get("等级","")))
+            except Exception as e:
+                # 单个学生失败不影响其他学生
+                print(f"❌ 学生 {s_name} 批改失败：{e}")
+                return None
             # 导出每人 Markdown 到 ./out/学生姓名.md
-            class CT(BaseModel):
-                content_table:list[Row]; 总分:int; 等级:str
-            class ST(BaseModel):
-                structure_table:list[Row]; 总分:int; 等级:str
-            ct = CT(content_table=content_rows, 总分=int(content_json.get("总分",0)), 等级=str(content_json.get("等级","")))
-            st = ST(structure_table=structure_rows, 总分=int(structure_json.get("总分",0)), 等级=str(structure_json.get("等级","")))
-            md_path = os.path.join(paths.OUTPUT_DIR, f"{safe_name}.md")
+            return "graded", student_key, fp, (md_path, gdf, ct, st, summary, content_json, structure_json)
+
+        async def feed_stream(task_q: asyncio.Queue):
+            # PDF 解析在线程中进行，每解析完一名学生立即创建其批改任务
+            running_loop = asyncio.get_running_loop()
+            frame_q: asyncio.Queue = asyncio.Queue()
+            def produce():
+                try:
+                    for frame in student_stream:
+                        running_loop.call_soon_threadsafe(frame_q.put_nowait, frame)
+                finally:
+                    running_loop.call_soon_threadsafe(frame_q.put_nowait, None)
+            # to_thread 复制当前上下文：解析线程中的输出同样计入所属任务的日志
+            extracting = asyncio.create_task(asyncio.to_thread(produce))
+            by_student: dict = {}
+            try:
+                while (frame := await frame_q.get()) is not None:
+                    frame = _with_text_and_name(frame)
+                    student = students(frame)[0]
+                    # 同一学生的页面不连续时会再次产出合并后的完整记录：取消尚未完成的旧任务，以新记录为准
+                    earlier = by_student.get(student.key)
+                    if earlier is not None and not earlier.done():
+                        earlier.cancel()
+                        print(f"🔁 {student.name} 的页面不连续，改用合并后的完整记录批改")
+                    task = by_student[student.key] = asyncio.create_task(grade_student(student, frame))
+                    task_q.put_nowait(task)
+                await extracting
+                # 全部学生解析完毕：一次性写出工作表供 Node 端读取
+                frames = student_stream.sheets()
+                if not frames:
+                    raise RuntimeError("未解析到有效学生数据，请确认PDF格式是否与示例一致。")
+                write_workbook(frames, processed_excel_path)
+                print(f"✅ 已生成：{processed_excel_path}")
+            finally:
+                task_q.put_nowait(None)
+
+        task_q: asyncio.Queue = asyncio.Queue()
+        feeder = None
+        if student_stream is not None:
+            feeder = asyncio.create_task(feed_stream(task_q))
+        else:
+            source_df = grammar_df if grammar_df is not None and not grammar_df.empty else student_df
+            for student in students(source_df):
+                task_q.put_nowait(asyncio.create_task(grade_student(student, student_index.grammar_rows(student))))
+            task_q.put_nowait(None)
+        # 按学生顺序依次落盘：前面的学生完成即写出，无需等待全部结束
+        failed = skipped = graded = 0
+        while (task := await task_q.get()) is not None:
+            await asyncio.wait({task})
+            if task.cancelled():
+                # 已被同一学生合并后的完整记录取代
+                continue
+            result = task.result()
+            if result is None:
+                failed += 1
+                continue
+            status, student_key, fp, payload = result
+            if status == "skipped":
+                skipped += 1
+                print(f"⏭️ 输入未变化，跳过：{payload}")
+                continue
+            md_path, gdf, ct, st, summary, content_json, structure_json = payload
             write_markdown(md_path, gdf, ct, st, summary.model_dump(), content_format=content_json, structure_format=structure_json)
+            manifest[student_key] = {"fingerprint": fp, "report": os.path.basename(md_path)}
+            save_manifest(paths.OUTPUT_DIR, manifest)
             print(f"✅ 报告生成：{md_path}")
+            graded += 1
+            if graded == 1:
+                print(f"⏱️ 首份报告用时 {time.perf_counter() - started:.1f} 秒")
+        if feeder is not None:
+            # 传递 PDF 解析阶段的异常
+            await feeder
+        if skipped:
+            print(f"⏭️ 共 {skipped} 名学生沿用上次结果")
+        if failed:
+            print(f"⚠️ 共 {failed} 名学生批改失败，其余报告已生成")
 
         # 保留汇总 Excel（选用全体语法表与最后一次评分作占位）
         
 
-    asyncio.run(run())
+    # 本次运行的统计：提示词统计随上下文传给各批改任务，用量取本客户端的增量（批改服务中每个工作线程一个客户端）
+    run_prompts = track_run()
+    usage_snapshot = client.usage.snapshot()
+
+    async def run_with_client():
+        # 同一连接池贯穿全部学生的内容/结构/汇总调用；外部传入的客户端由调用方关闭
+        try:
+            await run()
+        finally:
+            if partial_feed is not None:
+                partial_feed.close()
+            if owns_client:
+                await client.aclose()
+        if run_prompts is not None and (line := run_prompts.summary()):
+            print(line)
+        us = client.usage_stats(usage_snapshot)
+        if us["requests"]:
+            print(f"💾 模型前缀缓存：{us['requests']} 次请求，输入 {us['prompt_tokens']} tokens，"
+                  f"命中缓存 {us['cached_tokens']} tokens（{us['cache_hit_rate']:.0%}）")
+        if us["streams"]:
+            print(f"📡 流式输出：{us['streams']} 次，平均首段输出 {us['avg_first_token_s']:.2f} s，"
+                  f"首个完整字段 {us['avg_first_value_s']:.2f} s")
+        if us["hedged"]:
+            print(f"⚡ 对冲请求：{us['hedged']} 次（占请求 {us['hedge_rate']:.1%}），对冲的一份先返回 {us['hedge_wins']} 次")
+        if us["coalesced"]:
+            print(f"🔗 相同提示词的并发请求合并 {us['coalesced']} 次（未重复发送）")
+        if us["truncated"]:
+            print(f"✂️ 输出达到 max_tokens 被截断 {us['truncated']} 次（已加大 max_tokens 重试）")
+        if client.cache is not None:
+            print(f"📦 LLM 缓存：命中 {us['cache_hits']}，未命中 {us['cache_misses']}，命中率 {us['local_cache_hit_rate']:.0%}")
+
+    if loop is None:
+        asyncio.run(run_with_client())
+    else:
+        loop.run_until_complete(run_with_client())
     
     # 最后一步：将outputs文件夹里的output_processed.xlsx拷贝到out文件夹中对应的考试文件夹
     if exam_name:
@@ -0,0 +1,113 @@
+"""
+内存流水线：PDF 提取 → 文本处理（process_excel）→ 互评/教师评价（student_teacher_review），
+阶段之间直接传递行记录与 DataFrame，最后只写一次 output_processed.xlsx 供 Node 端读取。
+
+PIPELINE_MODE=memory 时由 main.py 使用；PIPELINE_MODE=stream 时改用 StudentStream，边解析边批改；
+默认 files 仍沿用 output.xlsx → output_processed.xlsx 的逐步落盘流程。
+"""
+from __future__ import annotations
+import os
+from pathlib import Path
+from typing import Dict, Iterator, List
+
+import pandas as pd
+
+from settings import Workspace
+
+PIPELINE_MODE = os.getenv("PIPELINE_MODE", "files").strip().lower()
+
+
+def _like_read_back(df: pd.DataFrame) -> pd.DataFrame:
+    """
+    与写入 Excel 后再 read_excel 读回的类型保持一致：空串视为缺失，纯数字文本（学号、得分等）转为数值，
+    使下游按学号匹配与逐步落盘流程行为相同。
+    """
+    df = df.replace("", None)
+    for col in df.columns:
+        if pd.api.types.is_numeric_dtype(df[col]):
+            continue
+        num = pd.to_numeric(df[col], errors="coerce")
+        if num.notna().sum() == df[col].notna().sum():
+            df[col] = num
+    return df
+
+
+def build_frames(rows: List[Dict[str, str]], ws: Workspace) -> Dict[str, pd.DataFrame]:
+    """由聚合后的学生记录（已排序）生成 grammar_table / student_ocr / teacher_ocr 三张表"""
+    from extract_to_excel import GRAMMAR_HEADERS, table_rows
+    from process_excel import process_records
+    from student_teacher_review import build_review_sheets
+
+    records = process_records([dict(zip(GRAMMAR_HEADERS, values)) for values in table_rows(rows)])
+    grammar_df = _like_read_back(pd.DataFrame(records, columns=GRAMMAR_HEADERS))
+    frames = {"grammar_table": grammar_df}
+    print("Excel数据处理完成")
+
+    if not ws.review_xlsx.exists():
+        print(f"错误：找不到输入文件 {ws.review_xlsx}")
+        return frames
+    review = build_review_sheets(pd.read_excel(ws.review_xlsx), grammar_df)
+    if review is not None:
+        frames.update(review)
+        print("学生互评和教师评价数据处理完成")
+    return frames
+
+
+def build_sheets(ws: Workspace, workers: int | None = None, backend: str | None = None) -> Dict[str, pd.DataFrame]:
+    """
+    在内存中依次执行三个预处理阶段，返回 {工作表名: DataFrame}，
+    工作表与逐步落盘流程生成的 output_processed.xlsx 一致（grammar_table / student_ocr / teacher_ocr）。
+    PDF 未解析到学生时返回空字典。
+    """
+    from extract_to_excel import extract_rows
+
+    rows = extract_rows(workers, backend, ws=ws)
+    if not rows:
+        return {}
+    print(f"PDF数据提取完成，共 {len(rows)} 位同学")
+    return build_frames(rows, ws)
+
+
+class StudentStream:
+    """
+    流式预处理（PIPELINE_MODE=stream）：迭代时边解析 PDF 边产出，每位学生的页面一结束，
+    即产出其经过文本处理的单行 grammar 表（DataFrame），批改可与 PDF 解析重叠进行。
+    同一学生的页面不连续时会再次产出合并后的完整记录，main.py 的 feed_stream 据此取消该学生尚未完成的旧批改任务。
+    迭代结束后由 sheets() 按与逐步落盘流程相同的排序生成完整工作表。
+    """
+
+    def __init__(self, ws: Workspace, workers: int | None = None, backend: str | None = None):
+        self.ws = ws
+        self.workers = workers
+        self.backend = backend
+        self._rows: Dict[tuple, Dict[str, str]] = {}
+
+    def __iter__(self) -> Iterator[pd.DataFrame]:
+        from extract_to_excel import GRAMMAR_HEADERS, iter_pdf_students, student_key, table_rows
+        from process_excel import process_records
+
+        for seq, row in enumerate(iter_pdf_students(self.workers, self.backend, ws=self.ws), start=1):
+            self._rows[student_key(row)] = row
+            rec = dict(zip(GRAMMAR_HEADERS, next(table_rows([row]))))
+            rec["序号"] = seq
+            yield _like_read_back(pd.DataFrame(process_records([rec]), columns=GRAMMAR_HEADERS))
+
+    def __len__(self) -> int:
+        return len(self._rows)
+
+    def sheets(self) -> Dict[str, pd.DataFrame]:
+        if not self._rows:
+            return {}
+        # 与 aggregate_student_data 相同的排序
+        rows = sorted(self._rows.values(), key=lambda r: (r["class"], r["name"], r["id"]))
+        print(f"PDF数据提取完成，共 {len(rows)} 位同学")
+        return build_frames(rows, self.ws)
+
+
+def write_workbook(frames: Dict[str, pd.DataFrame], path: str | Path) -> None:
+    """一次性写出全部工作表"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with pd.ExcelWriter(path, engine="openpyxl") as writer:
+        for name, df in frames.items():
+            df.to_excel(writer, sheet_name=name, index=False)
@@ -1,36 +1,30 @@
 import os
+import posixpath
+import zipfile
+from copy import copy
 from pathlib import Path
-from typing import List, Tuple, cast
-from openpyxl import load_workbook
+from typing import Dict, List, Tuple, cast
+from xml.etree import ElementTree
+from openpyxl import Workbook, load_workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.cell.cell import Cell, MergedCell
+from openpyxl.utils import get_column_letter
+from openpyxl.worksheet.cell_range import CellRange
+
+from settings import Workspace
 
 ROOT = Path(__file__).resolve().parent.parent
 
-# 获取考试名称和老师账号，设置考试特定的输入输出路径
-exam_name = os.environ.get('EXAM_NAME', '').strip()
-teacher_username = os.environ.get('TEACHER_USERNAME', '').strip()
-
-if exam_name:
-    # 创建安全的文件夹名称（移除非法字符）
-    safe_exam_name = "".join(ch for ch in exam_name if ch not in '\\/:*?"<>|').strip()
-    if not safe_exam_name:
-        safe_exam_name = "未命名考试"
-    
-    # 如果有老师账号，添加到文件夹名称
-    if teacher_username:
-        safe_teacher_name = "".join(ch for ch in teacher_username if ch not in '\\/:*?"<>|').strip()
-        if safe_teacher_name:
-            safe_exam_name = f"{safe_exam_name}_{safe_teacher_name}"
-    
-    INPUT_XLSX = Path("outputs") / safe_exam_name / "output.xlsx"
-    OUTPUT_XLSX = Path("outputs") / safe_exam_name / "output_processed.xlsx"
-else:
-    INPUT_XLSX = Path("outputs") / "output.xlsx"
-    OUTPUT_XLSX = Path("outputs") / "output_processed.xlsx"
+# 默认流式处理（read_only 读取、write_only 写出）；设为 0 时整表加载后改写
+PROCESS_EXCEL_STREAMING = os.environ.get("PROCESS_EXCEL_STREAMING", "1").strip().lower() not in ("0", "false", "no", "off")
 
 HEADER_MINE = "我的原文"
 HEADER_MORE = "更多表达"
 
+# 流式写出时逐单元格复制的样式属性
+CELL_STYLE_ATTRS = ("font", "fill", "border", "alignment", "number_format", "protection")
+REL_NS = "{http://schemas.openxmlformats.org/officeDocument/2006/relationships}"
+
 # 允许识别两种冒号：半角: 与全角：
 COLONS = (":", "：")
 
@@ -155,12 +149,197 @@ def process_row(mine_text: str, more_text: str) -> Tuple[str, str]:
     return ("\n".join(mine_lines).strip(), "\n".join(updated_more).strip())
 
 
-def main():
-    if not INPUT_XLSX.exists():
-        print(f"未找到 Excel 文件：{INPUT_XLSX}")
-        return
+def process_records(records: List[dict]) -> List[dict]:
+    """
+    内存流水线使用：records 为以表头为键的行记录，
+    对每行的“我的原文 / 更多表达”应用 process_row，原地更新并返回。
+    """
+    for rec in records:
+        rec[HEADER_MINE], rec[HEADER_MORE] = process_row(
+            str(rec.get(HEADER_MINE) or ""),
+            str(rec.get(HEADER_MORE) or "")
+        )
+    return records
+
+
+def index_merged_ranges(ranges) -> Dict[Tuple[int, int], Tuple[int, int]]:
+    """
+    合并区域预索引：{(行, 列): (左上角行, 左上角列)}，只包含非左上角的单元格。
+    ranges 可为 CellRange 或 "A1:B2" 形式的字符串。
+    """
+    master_of: Dict[Tuple[int, int], Tuple[int, int]] = {}
+    for rng in ranges:
+        rng = rng if isinstance(rng, CellRange) else CellRange(str(rng))
+        for r in range(rng.min_row, rng.max_row + 1):
+            for c in range(rng.min_col, rng.max_col + 1):
+                if (r, c) != (rng.min_row, rng.min_col):
+                    master_of[(r, c)] = (rng.min_row, rng.min_col)
+    return master_of
+
+
+def _target_columns(header_row) -> Tuple[int, int] | None:
+    """返回“我的原文 / 更多表达”的 1-based 列号；缺列时打印提示并返回 None"""
+    header_to_index = {str(name): idx for idx, name in enumerate(header_row)}  # 0-based
+
+    if HEADER_MINE not in header_to_index or HEADER_MORE not in header_to_index:
+        print("未找到所需列：'我的原文' 或 '更多表达'")
+        return None
+
+    # openpyxl 使用 1-based 列号
+    return header_to_index[HEADER_MINE] + 1, header_to_index[HEADER_MORE] + 1
+
+
+def _cell_text(val) -> str:
+    return str(val) if val is not None else ""
+
+
+def _sheet_part(zf: zipfile.ZipFile) -> str:
+    """工作簿中第一个工作表的 XML 路径（按 workbook.xml 与其关系文件解析）"""
+    book = ElementTree.fromstring(zf.read("xl/workbook.xml"))
+    rid = next(el.get(f"{REL_NS}id") for el in book.iter() if el.tag.rsplit("}", 1)[-1] == "sheet")
+    rels = ElementTree.fromstring(zf.read("xl/_rels/workbook.xml.rels"))
+    target = next(el.get("Target") for el in rels if el.get("Id") == rid)
+    return target.lstrip("/") if target.startswith("/") else posixpath.normpath(posixpath.join("xl", target))
 
-    wb = load_workbook(INPUT_XLSX)
+
+def _scan_sheet_layout(input_xlsx: Path) -> Tuple[List[str], Dict[str, float], bool] | None:
+    """
+    read_only 工作表不提供合并区域与列宽，这里直接从 xlsx 压缩包中流式扫描工作表 XML 取得二者，
+    并记录是否有单元格带样式（逐个清理已解析的行元素，内存不随行数增长）。无法定位工作表时返回 None。
+    """
+    merged: List[str] = []
+    widths: Dict[str, float] = {}
+    styled = False
+    try:
+        with zipfile.ZipFile(input_xlsx) as zf, zf.open(_sheet_part(zf)) as src:
+            for _, el in ElementTree.iterparse(src):
+                tag = el.tag.rsplit("}", 1)[-1]
+                if tag == "mergeCell" and el.get("ref"):
+                    merged.append(el.get("ref"))
+                elif tag == "col" and el.get("width"):
+                    for c in range(int(el.get("min")), int(el.get("max")) + 1):
+                        widths[get_column_letter(c)] = float(el.get("width"))
+                elif tag == "c" and not styled:
+                    styled = el.get("s", "0") != "0"
+                elif tag == "row":
+                    el.clear()
+    except (KeyError, StopIteration, zipfile.BadZipFile, ElementTree.ParseError):
+        return None
+    return merged, widths, styled
+
+
+class _StyleCopier:
+    """把 read_only 单元格的样式复制到 write_only 单元格；相同样式只复制一次"""
+
+    def __init__(self, sheet):
+        self.sheet = sheet
+        self._cache: Dict[tuple, dict] = {}
+
+    def row(self, values: list, cells) -> list:
+        out = list(values)
+        for i, cell in enumerate(cells):
+            if i < len(out) and getattr(cell, "has_style", False):
+                key = tuple(cell.style_array)
+                styles = self._cache.get(key)
+                if styles is None:
+                    styles = self._cache[key] = {a: copy(getattr(cell, a)) for a in CELL_STYLE_ATTRS}
+                wc = WriteOnlyCell(self.sheet, out[i])
+                for a, v in styles.items():
+                    setattr(wc, a, v)
+                out[i] = wc
+        return out
+
+
+def _process_streaming(input_xlsx: Path, output_xlsx: Path) -> bool:
+    """
+    流式处理单工作表的文件：read_only 逐行读取并处理，write_only 逐行写出，耗时 O(行数)、内存平稳。
+    合并区域内非左上角单元格的写入按预索引转到左上角单元格（与整表加载的流程一致：后写覆盖先写），
+    涉及的行会暂存到该合并区域结束后再写出。
+    保留单元格的值与样式（字体/填充/边框/对齐/数字格式/保护）、合并区域与列宽；
+    行高、冻结窗格、条件格式与数据验证等工作表级设置不会保留，需要时设 PROCESS_EXCEL_STREAMING=0。
+    工作簿含多个工作表、无法解析工作表结构，或目标列的合并区域从表头行开始（表头不进入逐行暂存）时返回 False，
+    由调用方改用整表加载的流程。结果先写到临时文件，完整写出后才替换 output_xlsx，中途出错不会留下残缺的文件。
+    """
+    src = load_workbook(input_xlsx, read_only=True)
+    try:
+        if len(src.sheetnames) != 1:
+            return False
+        layout = _scan_sheet_layout(input_xlsx)
+        if layout is None:
+            return False
+        merged, widths, styled_cells = layout
+        ws = src.active
+        # 没有带样式的单元格时只读取值，省去逐个单元格对象
+        rows = ws.iter_rows(values_only=not styled_cells)
+        header_cells = next(rows, None)
+        if header_cells is None:
+            print("工作表为空，缺少表头行")
+            return True
+        header_row = [c.value for c in header_cells] if styled_cells else list(header_cells)
+        cols = _target_columns(header_row)
+        if cols is None:
+            return True
+        mine_col_idx, more_col_idx = cols
+
+        master_of = index_merged_ranges(merged)
+        # 左上角所在行 -> 需暂存到的最后一行（仅考虑覆盖目标列的合并区域）
+        hold_rows: Dict[int, int] = {}
+        for ref in merged:
+            rng = CellRange(ref)
+            if any(rng.min_col <= c <= rng.max_col for c in cols):
+                if rng.min_row < 2:
+                    print(f"合并区域 {ref} 从表头行开始，改用整表加载处理")
+                    return False
+                hold_rows[rng.min_row] = max(hold_rows.get(rng.min_row, 0), rng.max_row)
+
+        out_wb = Workbook(write_only=True)
+        out = out_wb.create_sheet(ws.title)
+        for letter, width in widths.items():
+            out.column_dimensions[letter].width = width
+        for ref in merged:
+            out.merged_cells.add(ref)
+        styled = _StyleCopier(out)
+        out.append(styled.row(header_row, header_cells if styled_cells else ()))
+
+        pending: Dict[int, list] = {}
+        pending_cells: Dict[int, tuple] = {}
+        hold_until = 0
+        width = max(len(header_row), mine_col_idx, more_col_idx)
+        # 遍历数据行（从第2行起）
+        for r_idx, row in enumerate(rows, start=2):
+            values = ([c.value for c in row] if styled_cells else list(row)) + [None] * (width - len(row))
+            new_mine, new_more = process_row(_cell_text(values[mine_col_idx - 1]), _cell_text(values[more_col_idx - 1]))
+            pending[r_idx] = values
+            pending_cells[r_idx] = row if styled_cells else ()
+            hold_until = max(hold_until, hold_rows.get(r_idx, 0))
+            for col_idx, new_val in ((mine_col_idx, new_mine), (more_col_idx, new_more)):
+                target_row, target_col = master_of.get((r_idx, col_idx), (r_idx, col_idx))
+                pending[target_row][target_col - 1] = new_val
+            if r_idx >= hold_until:
+                for i, vals in pending.items():
+                    out.append(styled.row(vals, pending_cells[i]))
+                pending.clear()
+                pending_cells.clear()
+        for i, vals in pending.items():
+            out.append(styled.row(vals, pending_cells[i]))
+
+        # 输出到新文件，避免覆盖原始文件；先写临时文件，完整写出后再替换
+        output_xlsx.parent.mkdir(parents=True, exist_ok=True)
+        tmp = output_xlsx.with_name(output_xlsx.name + ".tmp")
+        try:
+            out_wb.save(tmp)
+            os.replace(tmp, output_xlsx)
+        finally:
+            tmp.unlink(missing_ok=True)
+        print(f"处理完成，已保存：{output_xlsx}")
+        return True
+    finally:
+        src.close()
+
+
+def _process_in_place(input_xlsx: Path, output_xlsx: Path):
+    """整表加载后逐行改写单元格，保留全部工作表与样式。"""
+    wb = load_workbook(input_xlsx)
     # 默认首个工作表，名称在生成脚本中为“数据”
     ws = wb.active
     if ws is None:
@@ -175,36 +354,27 @@ def main():
         print("工作表为空，缺少表头行")
         return
 
-    header_to_index = {str(name): idx for idx, name in enumerate(header_row)}  # 0-based
-
-    if HEADER_MINE not in header_to_index or HEADER_MORE not in header_to_index:
-        print("未找到所需列：'我的原文' 或 '更多表达'")
+    cols = _target_columns(header_row)
+    if cols is None:
         return
+    mine_col_idx, more_col_idx = cols
 
-    mine_col_idx = header_to_index[HEADER_MINE] + 1  # openpyxl 使用 1-based 列号
-    more_col_idx = header_to_index[HEADER_MORE] + 1
+    # 合并单元格预索引：写入合并区域时改写其左上角单元格，无需逐个扫描合并区域
+    master_of = index_merged_ranges(ws.merged_cells.ranges)
 
-    # 辅助：若目标是合并单元格，则返回该合并区域左上角单元格进行写入
     def get_writable_cell(row_idx: int, col_idx: int) -> Cell:
-        c = ws.cell(row=row_idx, column=col_idx)
-        if isinstance(c, MergedCell):
-            coord = c.coordinate
-            for rng in ws.merged_cells.ranges:
-                if coord in rng:
-                    master = ws.cell(row=rng.min_row, column=rng.min_col)
-                    # 类型断言：合并区域左上角应为可写的普通 Cell
-                    return cast(Cell, master)
-        return cast(Cell, c)
+        target = master_of.get((row_idx, col_idx))
+        if target is not None:
+            # 类型断言：合并区域左上角应为可写的普通 Cell
+            return cast(Cell, ws.cell(row=target[0], column=target[1]))
+        return cast(Cell, ws.cell(row=row_idx, column=col_idx))
 
     # 遍历数据行（从第2行起）
     for r_idx, row in enumerate(ws.iter_rows(min_row=2), start=2):
         mine_cell_read = row[mine_col_idx - 1]
         more_cell_read = row[more_col_idx - 1]
 
-        new_mine, new_more = process_row(
-            str(mine_cell_read.value) if mine_cell_read.value is not None else "",
-            str(more_cell_read.value) if more_cell_read.value is not None else ""
-        )
+        new_mine, new_more = process_row(_cell_text(mine_cell_read.value), _cell_text(more_cell_read.value))
 
         mine_cell_write = cast(Cell, get_writable_cell(r_idx, mine_col_idx))
         more_cell_write = cast(Cell, get_writable_cell(r_idx, more_col_idx))
@@ -216,9 +386,23 @@ def main():
             more_cell_write.value = new_more
 
     # 输出到新文件，避免覆盖原始文件
-    OUTPUT_XLSX.parent.mkdir(parents=True, exist_ok=True)
-    wb.save(OUTPUT_XLSX)
-    print(f"处理完成，已保存：{OUTPUT_XLSX}")
+    output_xlsx.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(output_xlsx)
+    print(f"处理完成，已保存：{output_xlsx}")
+
+
+def main(ws: Workspace | None = None, streaming: bool | None = None):
+    # 输入为提取阶段生成的 output.xlsx，输出到同目录的 output_processed.xlsx
+    ws = ws or Workspace.from_env()
+    input_xlsx, output_xlsx = ws.output_xlsx, ws.processed_xlsx
+    if not input_xlsx.exists():
+        print(f"未找到 Excel 文件：{input_xlsx}")
+        return
+
+    streaming = PROCESS_EXCEL_STREAMING if streaming is None else streaming
+    if streaming and _process_streaming(input_xlsx, output_xlsx):
+        return
+    _process_in_place(input_xlsx, output_xlsx)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,175 @@
+"""
+提示词压缩：评分表、语法表与细则配置以紧凑 JSON / 表格（列名只出现一次）写入提示词，去掉空字段；
+渲染后超出单次提示词的 token 预算时，按给定顺序截断可截断的字段。
+压缩前（与原先 repr 写法相同）与压缩后的 token 估算按批改运行累计（见 track_run），运行结束时打印；
+PROMPT_STATS=0 时不统计，也不再额外按原先写法格式化一遍。
+"""
+from __future__ import annotations
+import contextvars, json, math, os, threading
+from typing import Any, Dict, Iterable, Sequence
+
+import pandas as pd
+
+from educhat_client import CHARS_PER_TOKEN, estimate_tokens
+
+PROMPT_COMPACT = os.getenv("PROMPT_COMPACT", "1").strip().lower() not in ("0", "false", "no", "off")
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "6000"))  # 单次提示词（system + user）的上限，0 表示不限
+TRUNCATED_MARK = "…（已截断）"
+PROMPT_STATS = os.getenv("PROMPT_STATS", "1").strip().lower() not in ("0", "false", "no", "off")
+
+
+def _is_empty(v: Any) -> bool:
+    if v is None:
+        return True
+    if isinstance(v, float) and math.isnan(v):
+        return True
+    if isinstance(v, str):
+        return not v.strip()
+    return isinstance(v, (list, tuple, dict)) and len(v) == 0
+
+
+def prune(obj: Any) -> Any:
+    """递归去掉空字段（None/NaN/空串/空列表/空字典）"""
+    if isinstance(obj, dict):
+        out = {k: prune(v) for k, v in obj.items()}
+        return {k: v for k, v in out.items() if not _is_empty(v)}
+    if isinstance(obj, (list, tuple)):
+        out = [prune(v) for v in obj]
+        return [v for v in out if not _is_empty(v)]
+    return obj
+
+
+def compact_json(obj: Any) -> str:
+    return json.dumps(prune(obj), ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def compact_table(rows: Iterable[Dict[str, Any]], columns: Sequence[str] | None = None) -> str:
+    """同构记录写成 {"cols":[...],"rows":[[...],...]}：键名只出现一次，全空的列整列去掉"""
+    rows = [r for r in rows if isinstance(r, dict)]
+    cols = list(columns) if columns is not None else list(dict.fromkeys(k for r in rows for k in r))
+    cols = [c for c in cols if any(not _is_empty(r.get(c)) for r in rows)]
+    data = [[None if _is_empty(r.get(c)) else r.get(c) for c in cols] for r in rows]
+    data = [d for d in data if any(v is not None for v in d)]
+    return json.dumps({"cols": cols, "rows": data}, ensure_ascii=False, separators=(",", ":"), default=str)
+
+
+def _legacy(value: Any) -> Any:
+    """原先的写法：DataFrame 以 to_dict(records) 的 repr 写入"""
+    return value.to_dict(orient="records") if isinstance(value, pd.DataFrame) else value
+
+
+def _is_records(value: Any) -> bool:
+    return isinstance(value, (list, tuple)) and bool(value) and all(isinstance(r, dict) for r in value)
+
+
+def _compact(value: Any, columns: Sequence[str] | None = None) -> str:
+    if isinstance(value, str):
+        return value.strip()
+    if isinstance(value, pd.DataFrame):
+        cols = [c for c in (columns or value.columns) if c in value.columns]
+        return compact_table(value[cols].to_dict(orient="records"), cols)
+    if _is_records(value):
+        return compact_table(value, columns)
+    if isinstance(value, dict):
+        # 评分结果 JSON：其中的记录列表同样写成表格
+        parts = []
+        for k, v in prune(value).items():
+            body = _compact(v) if _is_records(v) else json.dumps(v, ensure_ascii=False, separators=(",", ":"), default=str)
+            parts.append(f"{json.dumps(k, ensure_ascii=False)}:{body}")
+        return "{" + ",".join(parts) + "}"
+    return compact_json(value)
+
+
+class PromptStats:
+    """累计一次批改运行中压缩前后的 token 估算"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.prompts = 0
+        self.before = 0
+        self.after = 0
+        self.truncated = 0
+        # 必需字段（如学生作文）被截断的提示词：标签（学生姓名等）列表
+        self.essential_cut: list = []
+
+    def add(self, before: int, after: int, truncated: bool, essential_cut: str | None = None):
+        with self._lock:
+            self.prompts += 1
+            self.before += before
+            self.after += after
+            self.truncated += int(truncated)
+            if essential_cut is not None:
+                self.essential_cut.append(essential_cut)
+
+    def summary(self) -> str | None:
+        with self._lock:
+            prompts, before, after, truncated = self.prompts, self.before, self.after, self.truncated
+            cut = list(self.essential_cut)
+        if not prompts:
+            return None
+        saved = 1 - after / before if before else 0.0
+        line = f"🗜️ 提示词压缩：{prompts} 次，估算 {before} → {after} tokens（-{saved:.0%}）"
+        line += f"，超出预算截断 {truncated} 次" if truncated else ""
+        if cut:
+            names = "、".join(dict.fromkeys(cut))
+            line += f"；其中 {len(cut)} 次截断了作文等必需内容（{names}），相应评分可能不完整"
+        return line
+
+
+# 当前批改运行的统计：随 asyncio 任务与 to_thread 线程传递，批改服务中并发的任务各自累计
+_run_stats: contextvars.ContextVar = contextvars.ContextVar("prompt_stats", default=None)
+
+
+def track_run() -> PromptStats | None:
+    """在当前上下文开始一次运行的统计，此后（含其中创建的任务）render 的结果计入返回的对象；PROMPT_STATS=0 时返回 None"""
+    stats = PromptStats() if PROMPT_STATS else None
+    _run_stats.set(stats)
+    return stats
+
+
+def fill(tmpl: str, **fields: Any) -> str:
+    """以紧凑形式填充不单独发送的片段（如考试上下文）；不检查预算，也不计入统计"""
+    if not PROMPT_COMPACT:
+        return tmpl.format(**{k: _legacy(v) for k, v in fields.items()})
+    return tmpl.format(**{k: _compact(v) for k, v in fields.items()})
+
+
+def render(tmpl: str, system: str = "", columns: Dict[str, Sequence[str]] | None = None,
+           trim: Sequence[str] = (), essential: Sequence[str] = (), label: str = "",
+           budget: int | None = None, **fields: Any) -> str:
+    """
+    以紧凑形式填充模板。columns 指定 DataFrame / 记录列表字段只保留的列；
+    渲染结果（连同 system）超出 budget 时按 trim 顺序截断对应字段，仍超出时才截断 essential 中的必需字段
+    （如学生作文）：此时打印带 label（学生姓名）的警告并计入统计，便于找出评分依据不完整的学生。
+    PROMPT_COMPACT=0 时按原先的写法填充。
+    """
+    columns = columns or {}
+    budget = PROMPT_TOKEN_BUDGET if budget is None else budget
+    stats = _run_stats.get()
+    if not PROMPT_COMPACT:
+        before = tmpl.format(**{k: _legacy(v) for k, v in fields.items()})
+        if stats is not None:
+            stats.add(estimate_tokens(system, before), estimate_tokens(system, before), False)
+        return before
+
+    values = {k: _compact(v, columns.get(k)) for k, v in fields.items()}
+    prompt = tmpl.format(**values)
+    truncated, essential_cut = False, None
+    for key in (*trim, *essential):
+        over = estimate_tokens(system, prompt) - budget
+        if budget <= 0 or over <= 0:
+            break
+        text = values[key]
+        keep = max(0, len(text) - int(over * CHARS_PER_TOKEN) - len(TRUNCATED_MARK) - 1)
+        if keep < len(text):
+            values[key] = text[:keep] + TRUNCATED_MARK
+            prompt = tmpl.format(**values)
+            truncated = True
+            if key in essential:
+                essential_cut = label or "未命名"
+                print(f"⚠️ {essential_cut}：提示词超出 token 预算，{key} 被截断 {len(text) - keep} 字，评分可能不完整")
+    if stats is not None:
+        # 原先写法的结果只用于估算节省量，不统计时不再格式化
+        before = tmpl.format(**{k: _legacy(v) for k, v in fields.items()})
+        stats.add(estimate_tokens(system, before), estimate_tokens(system, prompt), truncated, essential_cut)
+    return prompt
@@ -1,24 +1,57 @@
-CONTENT_TABLE_SYSTEM = """你是资深高中英语教研员，擅长作文命题与评分。面向【高中三年级】学生，依据提供的“内容评分细则”，严格、客观地产出【内容评分表】。必须输出 JSON。若检测到体裁或格式硬性缺项，请在 format_check 中列出并给予相应扣分。"""
-
-CONTENT_TABLE_USER_TMPL = """【评分场景】
+# 提示词版本：修改任一模板后请递增，已完成的学生会据此重新批改
+PROMPT_VERSION = "2"
+
+# 提示词布局（便于命中服务端的前缀缓存）：
+# 所有请求共用同一 system 提示词；用户消息以同一场考试内逐字节相同的【考试上下文】开头
+# （场景、内容/结构细则、衔接提示、格式要求、锚点、等级与权重），其后是各任务的说明与 JSON 格式，
+# 逐个学生变化的材料（作文、教师评语、评分表）一律放在最后。
+GRADER_SYSTEM = """你是资深高中英语教研员与写作评分专家，面向【高中三年级】学生。请依据用户消息开头的【考试上下文】（评分场景、细则、格式要求与等级标准），按其中【任务】的要求严格、客观地完成评分或汇总，必须输出 JSON。若检测到体裁或格式硬性缺项，请在 format_check 中列出并给予相应扣分。"""
+
+CONTENT_TABLE_SYSTEM = GRADER_SYSTEM
+STRUCTURE_TABLE_SYSTEM = GRADER_SYSTEM
+AGGREGATE_SYSTEM = GRADER_SYSTEM
+AGGREGATE_TEXT_SYSTEM = GRADER_SYSTEM
+COMBINED_SYSTEM = GRADER_SYSTEM
+
+EXAM_CONTEXT_TMPL = """【考试上下文】
+【评分场景】
 - 平台：{platform}
 - 年级：{grade}
 - 体裁：{task_type} {subgenre_hint}
 
 【内容评分细则】
-{rubric_text}
+{content_rubric_text}
+
+【结构评分细则】
+{structure_rubric_text}
+
+【衔接与语篇组织提示】
+- 连接词（建议优先使用）: {connectives}
+- 指代/替代/平行结构等：{cohesion_extra}
 
 【格式必备项（若配置）】
 - 必备字段：{required_fields}
 - 扣分规则：{format_penalties}
+- 版式提示：{format_tips}
 
-【评分锚点与等级】
+【评分锚点、等级与权重】
 - 等级映射：{grade_map}
 - 锚点说明：{anchors}
 - 全局严重问题按规则扣分：{penalties}
+- 权重(语法/内容/结构)：{weights}
+"""
 
-【学生作文（OCR整合）】
-{student_text}
+# 未提供考试上下文时（单独调用汇总），汇总提示词只带权重与等级
+WEIGHTS_CONTEXT_TMPL = """【考试上下文】
+【权重与等级】
+- 权重(语法/内容/结构)：{weights}
+- 等级映射：{grade_map}
+"""
+
+CONTENT_TABLE_USER_TMPL = """{exam_context}
+
+【任务】
+依据“内容评分细则”，对下方学生作文产出【内容评分表】。
 
 【输出要求（JSON）】
 {{
@@ -28,32 +61,15 @@ CONTENT_TABLE_USER_TMPL = """【评分场景】
   "format_check": [{{"缺失项": str, "扣分": int}}],
   "format_deductions": int
 }}
-"""
-
-STRUCTURE_TABLE_SYSTEM = """你是资深高中英语写作教师与篇章结构专家。面向【高中三年级】学生，依据提供的“结构评分细则”和“衔接/组织知识”，产出【结构评分表】（JSON）。如涉及特定子体裁，也需检查格式必备项。"""
 
-STRUCTURE_TABLE_USER_TMPL = """【评分场景】
-- 平台：{platform}
-- 年级：{grade}
-- 体裁：{task_type} {subgenre_hint}
-
-【结构评分细则】
-{rubric_text}
-
-【衔接与语篇组织提示】
-- 连接词（建议优先使用）: {connectives}
-- 指代/替代/平行结构等：{cohesion_extra}
-
-【格式必备项（若配置）】
-- 必备字段：{required_fields}
-- 扣分规则：{format_penalties}
-- 版式提示：{format_tips}
+【学生作文（OCR整合）】
+{student_text}
+"""
 
-【教师评语（OCR整合）】
-{teacher_text}
+STRUCTURE_TABLE_USER_TMPL = """{exam_context}
 
-【学生作文（参考，可为空）】
-{student_text}
+【任务】
+依据“结构评分细则”和“衔接与语篇组织提示”，结合下方教师评语，产出【结构评分表】。如涉及特定子体裁，也需检查格式必备项。
 
 【输出要求（JSON）】
 {{
@@ -63,20 +79,18 @@ STRUCTURE_TABLE_USER_TMPL = """【评分场景】
   "format_check": [{{"缺失项": str, "扣分": int}}],
   "format_deductions": int
 }}
-"""
 
-AGGREGATE_SYSTEM = """你是英语写作教研专家。现有三张评分表：语法、内容、结构。请依据给定权重与等级映射，输出综合评价与学习画像（JSON）。若内容/结构表含 format_deductions，请计入综合分。"""
+【教师评语（OCR整合）】
+{teacher_text}
 
-AGGREGATE_USER_TMPL = """【输入表】
-- 语法评分表：{grammar_table}
-- 内容评分表：{content_table}
-- 结构评分表：{structure_table}
+【学生作文（参考，可为空）】
+{student_text}
+"""
 
-【权重与等级】
-- 权重(语法/内容/结构)：{weights}
-- 等级映射：{grade_map}
+AGGREGATE_USER_TMPL = """{exam_context}
 
 【任务】
+现有三张评分表：语法、内容、结构（见下方输入表）。请依据权重与等级映射，输出综合评价与学习画像。
 1) 生成“本次评价”：总分(100)、等级(A/B+/B/...)、简评(≤120字)。
    - 综合分 = 语法*Wg + (内容-内容格式扣分)*Wc + (结构-结构格式扣分)*Ws （按给定权重归一化）
 2) 输出“易错点”(≥2)、“亮点”(≥2)
@@ -93,4 +107,75 @@ AGGREGATE_USER_TMPL = """【输入表】
   "格式检查": [{{"缺失项": str, "扣分": int}}],
   "前几次作文评价": [{{"日期": str, "主题": str, "等级": str, "变化": str}}]
 }}
+
+【输入表】
+- 语法评分表：{grammar_table}
+- 内容评分表：{content_table}
+- 结构评分表：{structure_table}
+"""
+
+AGGREGATE_TEXT_USER_TMPL = """{exam_context}
+
+【任务】
+总分与等级已由系统计算（见下方本次评价），请只根据评分表与语法问题撰写文字评价，不要改动分数。
+1) “简评”(≤120字)
+2) “易错点”(≥2)、“亮点”(≥2)
+3) “学生画像”：词汇水平(A2/B1/B2/C1)、写作风格(2~4字)、建议方向(2~4条)
+
+【JSON格式】
+{{
+  "简评": str,
+  "易错点": [str, ...],
+  "亮点": [str, ...],
+  "学生画像": {{"词汇水平": str, "写作风格": str, "建议方向": [str, ...]}}
+}}
+
+【本次评价】总分：{total}，等级：{grade}
+
+【输入表】
+- 语法问题：{grammar_issues}
+- 内容评分表：{content_table}
+- 结构评分表：{structure_table}
+"""
+
+COMBINED_USER_TMPL = """{exam_context}
+
+【任务】
+在一次回答中产出内容评分表、结构评分表与综合评价（同一个 JSON 对象）：
+1) content：依据内容评分细则评分（学生作文）
+2) structure：依据结构评分细则评分（教师评语 + 学生作文）
+3) summary：综合评价
+   - 综合分 = 语法*Wg + (内容-内容格式扣分)*Wc + (结构-结构格式扣分)*Ws （按给定权重归一化到100）
+   - “易错点”(≥2)、“亮点”(≥2)、简评(≤120字)
+   - “学生画像”：词汇水平(A2/B1/B2/C1)、写作风格(2~4字)、建议方向(2~4条)
+
+【输出要求（JSON）】
+{{
+  "content": {{
+    "content_table": [{{"维度": str, "满分": int, "得分": int, "扣分原因": str, "建议": str}}, ...],
+    "总分": int, "等级": str,
+    "format_check": [{{"缺失项": str, "扣分": int}}], "format_deductions": int
+  }},
+  "structure": {{
+    "structure_table": [{{"维度": str, "满分": int, "得分": int, "扣分原因": str, "建议": str}}, ...],
+    "总分": int, "等级": str,
+    "format_check": [{{"缺失项": str, "扣分": int}}], "format_deductions": int
+  }},
+  "summary": {{
+    "本次评价": {{"总分": int, "等级": str, "简评": str}},
+    "易错点": [str, ...],
+    "亮点": [str, ...],
+    "学生画像": {{"词汇水平": str, "写作风格": str, "建议方向": [str, ...]}},
+    "格式检查": [{{"缺失项": str, "扣分": int}}]
+  }}
+}}
+
+【语法评分表】
+{grammar_table}
+
+【教师评语（OCR整合）】
+{teacher_text}
+
+【学生作文（OCR整合）】
+{student_text}
 """
@@ -0,0 +1,54 @@
+"""
+对比 pdfplumber 与 pypdfium2 两种提取后端：页/秒，以及逐页 parse_header / split_sections
+结果与最终聚合行是否一致。
+
+用法：python -m scripts.bench_extract_backends --pdf in/1.pdf
+     python -m scripts.bench_extract_backends --students 200   # 需要 reportlab 生成合成 PDF
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract_to_excel
+from scripts.bench_extract_memory import make_synthetic_pdf
+
+
+def _parsed(page_text: str):
+    norm = extract_to_excel.normalize_text(page_text)
+    return extract_to_excel.parse_header(norm), extract_to_excel.split_sections(norm)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", help="已有 PDF；不指定则生成合成 PDF")
+    ap.add_argument("--students", type=int, default=200)
+    ap.add_argument("--pages-per-student", type=int, default=2)
+    args = ap.parse_args()
+
+    pdf_path = args.pdf
+    if not pdf_path:
+        pdf_path = os.path.join(tempfile.mkdtemp(), "synthetic.pdf")
+        make_synthetic_pdf(pdf_path, args.students, args.pages_per_student)
+
+    pages = {}
+    for backend in extract_to_excel.EXTRACTORS:
+        start = time.perf_counter()
+        pages[backend] = list(extract_to_excel.iter_page_texts(pdf_path, backend=backend))
+        elapsed = time.perf_counter() - start
+        print(f"{backend:>10}: {len(pages[backend])} 页，{elapsed:6.2f} s，{len(pages[backend]) / elapsed:8.1f} 页/秒")
+
+    base, fast = pages["pdfplumber"], pages["pypdfium2"]
+    diffs = [i for i, (a, b) in enumerate(zip(base, fast)) if _parsed(a) != _parsed(b)]
+    same_rows = extract_to_excel.aggregate_student_data(base) == extract_to_excel.aggregate_student_data(fast)
+    print(f"页头/分段解析不一致的页数：{len(diffs)}" + (f"（前几页：{diffs[:10]}）" if diffs else ""))
+    print(f"聚合后的学生数据是否一致：{'是' if same_rows else '否'}")
+
+
+if __name__ == "__main__":
+    main()
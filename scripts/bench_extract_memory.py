@@ -0,0 +1,100 @@
+"""
+PDF 提取的峰值内存对比：一次性读取全部页面 vs 分块流式提取。
+
+需要 reportlab 生成合成试卷 PDF（仅本脚本使用）；也可用 --pdf 指定已有文件。
+每种模式在独立子进程中运行，以 ru_maxrss 作为峰值 RSS。
+
+用法：python -m scripts.bench_extract_memory --students 1000 --pages-per-student 2
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_synthetic_pdf(path: str, students: int, pages_per_student: int) -> None:
+    try:
+        from reportlab.pdfgen import canvas
+        from reportlab.pdfbase import pdfmetrics
+        from reportlab.pdfbase.cidfonts import UnicodeCIDFont
+    except ImportError:
+        raise SystemExit("生成合成 PDF 需要 reportlab：pip install reportlab（或使用 --pdf 指定文件）")
+    pdfmetrics.registerFont(UnicodeCIDFont("STSong-Light"))
+    c = canvas.Canvas(path)
+    total = students * pages_per_student
+    pno = 0
+    for i in range(students):
+        for p in range(pages_per_student):
+            pno += 1
+            c.setFont("STSong-Light", 10)
+            lines = [f"学校：实验中学 班级：高三{i % 3 + 1}班 姓名：学生{i:04d} 学号：{20240000 + i} 作答时间：2024-05-01 10:00"]
+            if p == 0:
+                lines += [f"得分：{10 + i % 5}（满分15）", "我的原文"]
+                lines += [f"Sentence {k} of student {i} essay text goes here with some words." for k in range(20)]
+                lines += ["语法错误", f"error detail {i}"]
+            else:
+                lines += ["单句点评", f"comment {i}", "更多表达", f"：more expression {i}"]
+            lines.append(f"第 {pno} 页 / 共 {total} 页")
+            y = 800
+            for ln in lines:
+                c.drawString(40, y, ln)
+                y -= 14
+            c.showPage()
+    c.save()
+
+
+def _child(mode: str, pdf_path: str) -> None:
+    import pdfplumber
+    import extract_to_excel
+
+    start = time.perf_counter()
+    if mode == "list":
+        # 旧实现：单次打开，保留全部页面对象与文本后再聚合
+        pages = []
+        with pdfplumber.open(pdf_path) as pdf:
+            for page in pdf.pages:
+                pages.append(page.extract_text() or "")
+        rows = extract_to_excel.aggregate_student_data(pages)
+    else:
+        rows = extract_to_excel.aggregate_student_data(extract_to_excel.iter_page_texts(pdf_path))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "rows": len(rows), "seconds": round(elapsed, 2), "peak_mb": round(peak_kb / 1024, 1)}))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pdf", help="已有 PDF；不指定则生成合成 PDF")
+    ap.add_argument("--students", type=int, default=500)
+    ap.add_argument("--pages-per-student", type=int, default=2)
+    ap.add_argument("--child", choices=["list", "stream"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child, args.pdf)
+        return
+
+    pdf_path = args.pdf
+    if not pdf_path:
+        pdf_path = os.path.join(tempfile.mkdtemp(), "synthetic.pdf")
+        make_synthetic_pdf(pdf_path, args.students, args.pages_per_student)
+        print(f"已生成合成 PDF：{pdf_path}（{args.students * args.pages_per_student} 页）")
+
+    for mode in ("list", "stream"):
+        out = subprocess.run([sys.executable, "-m", "scripts.bench_extract_memory", "--child", mode, "--pdf", pdf_path],
+                             cwd=ROOT, capture_output=True, text=True, check=True)
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['mode']:>6}: 峰值 RSS {r['peak_mb']:8.1f} MB，耗时 {r['seconds']:6.2f} s，学生 {r['rows']}")
+
+
+if __name__ == "__main__":
+    main()
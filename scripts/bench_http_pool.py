@@ -0,0 +1,96 @@
+"""
+对比「每次请求新建连接」与「EduChatClient 共享连接池」的单次调用耗时。
+
+在本地起一个 OpenAI 兼容的桩服务（/chat/completions），统计服务端新建连接数；
+--handshake-ms 用于模拟公网 TCP+TLS 握手的额外往返耗时（仅在新连接上生效）。
+
+用法：python -m scripts.bench_http_pool --calls 50 --handshake-ms 80
+"""
+from __future__ import annotations
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class _StubHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    handshake_delay = 0.0
+    connections = 0
+    _lock = threading.Lock()
+
+    def setup(self):
+        super().setup()
+        with _StubHandler._lock:
+            _StubHandler.connections += 1
+        if self.handshake_delay:
+            time.sleep(self.handshake_delay)
+
+    def do_POST(self):
+        self.rfile.read(int(self.headers.get("Content-Length", 0)))
+        body = json.dumps({
+            "choices": [{"message": {"content": json.dumps({"ok": True})}}],
+            "usage": {"prompt_tokens": 10, "completion_tokens": 5},
+        }).encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, *args):
+        pass
+
+
+def _start_stub(handshake_ms: float) -> ThreadingHTTPServer:
+    _StubHandler.handshake_delay = handshake_ms / 1000.0
+    server = ThreadingHTTPServer(("127.0.0.1", 0), _StubHandler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+async def _bench(calls: int, pooled: bool) -> tuple[float, int]:
+    import educhat_client
+
+    before = _StubHandler.connections
+    start = time.perf_counter()
+    if pooled:
+        async with educhat_client.EduChatClient() as client:
+            for _ in range(calls):
+                await client.acomplete("sys", "user")
+    else:
+        for _ in range(calls):
+            await educhat_client.http_complete("sys", "user")
+    elapsed = time.perf_counter() - start
+    return elapsed / calls * 1000, _StubHandler.connections - before
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--calls", type=int, default=50)
+    ap.add_argument("--handshake-ms", type=float, default=50.0)
+    args = ap.parse_args()
+
+    server = _start_stub(args.handshake_ms)
+    os.environ["OPENAI_BASE_URL"] = f"http://127.0.0.1:{server.server_address[1]}"
+    os.environ.setdefault("OPENAI_API_KEY", "bench")
+
+    per_call_new, conns_new = asyncio.run(_bench(args.calls, pooled=False))
+    per_call_pool, conns_pool = asyncio.run(_bench(args.calls, pooled=True))
+    server.shutdown()
+
+    print(f"调用次数：{args.calls}，模拟握手：{args.handshake_ms:.0f} ms")
+    print(f"每次新建连接：{per_call_new:8.2f} ms/次，新建连接 {conns_new} 个")
+    print(f"共享连接池：  {per_call_pool:8.2f} ms/次，新建连接 {conns_pool} 个")
+    print(f"单次节省：    {per_call_new - per_call_pool:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,124 @@
+"""
+单页解析的微基准：逐段正则（旧实现）vs scan_page 单次扫描，并逐页核对两者输出一致。
+
+用法：python -m scripts.bench_page_tokenizer --pages 5000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Dict, Tuple
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import extract_to_excel
+from extract_to_excel import HeaderRegex, ScoreRegex, PageMarkerRegex
+
+
+# ---- 旧实现（仅用于对照） ----
+def legacy_split_sections(page_text: str) -> Dict[str, str]:
+    m = PageMarkerRegex.search(page_text)
+    if m:
+        page_text = page_text[:m.start()].strip()
+    titles = {"mine": "我的原文", "errors": "语法错误", "comments": "单句点评", "more": "更多表达"}
+    positions: Dict[str, int] = {}
+    for key, title in titles.items():
+        m = re.search(rf"(^|\n){re.escape(title)}(\s*|\n)", page_text)
+        if m:
+            positions[key] = m.start()
+    ordered = sorted([(key, pos) for key, pos in positions.items()], key=lambda x: x[1])
+    sections = {"mine": "", "errors": "", "comments": "", "more": ""}
+    if not ordered:
+        return sections
+    for i, (key, start_pos) in enumerate(ordered):
+        end_pos = len(page_text) if i == len(ordered) - 1 else ordered[i + 1][1]
+        block = page_text[start_pos:end_pos].strip()
+        block = re.sub(rf"^{re.escape(titles[key])}\s*\n?", "", block)
+        sections[key] += (block.strip() + ("\n" if block.strip() else ""))
+    for k in sections.keys():
+        sections[k] = sections[k].strip()
+    return sections
+
+
+def legacy_parse_header(page_text: str) -> Tuple[Dict[str, str], int]:
+    head_block = "\n".join(page_text.split("\n")[:3])
+    info = {"school": "", "class": "", "name": "", "id": "", "time": ""}
+    score_val = -1
+    m = HeaderRegex.search(head_block)
+    if m:
+        info.update(m.groupdict())
+    m2 = ScoreRegex.search(page_text)
+    if m2:
+        score_val = int(m2.group("score"))
+    return info, score_val
+
+
+# ---- 合成页面 ----
+TITLES = ["我的原文", "语法错误", "单句点评", "更多表达"]
+
+
+def synth_page(rng: random.Random, i: int) -> str:
+    lines = []
+    if rng.random() < 0.9:
+        lines.append(f"学校：实验中学 班级：高三{i % 5}班 姓名：学生{i} 学号：{20240000 + i} 作答时间：2024-05-01 10:00")
+    if rng.random() < 0.6:
+        lines.append(f"得分：{rng.randint(0, 15)}（满分15）")
+    titles = rng.sample(TITLES, rng.randint(0, 4))
+    for t in titles:
+        # 偶尔让标题不在行首，或带冒号后缀，或重复出现
+        prefix = rng.choice(["", "", "", "  ", "说明"])
+        lines.append(prefix + t + rng.choice(["", "", "：", " "]))
+        for k in range(rng.randint(0, 6)):
+            lines.append(rng.choice(["  ", "", ""]) + f"line {k} of {t} for {i} 得分：{k}" * rng.randint(1, 3))
+        if rng.random() < 0.1:
+            lines.append(rng.choice(TITLES))
+    if rng.random() < 0.7:
+        lines.append(f"第 {i} 页 / 共 {i + 10} 页")
+        if rng.random() < 0.3:
+            lines.append(rng.choice(TITLES) + "\n页尾之后的内容")
+    text = "\n".join(lines)
+    if rng.random() < 0.2:
+        text = rng.choice([" ", "\n", " \n ", "\n\n"]) + text + rng.choice([" ", "\n"])
+    return text
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--pages", type=int, default=5000)
+    ap.add_argument("--seed", type=int, default=7)
+    args = ap.parse_args()
+
+    rng = random.Random(args.seed)
+    pages = [synth_page(rng, i) for i in range(args.pages)]
+    normed = [extract_to_excel.normalize_text(p) for p in pages]
+
+    mismatches = 0
+    for variant in (pages, normed):
+        for p in variant:
+            scan = extract_to_excel.scan_page(p)
+            if (scan.info, scan.score) != legacy_parse_header(p) or scan.sections != legacy_split_sections(p):
+                mismatches += 1
+    print(f"核对 {2 * len(pages)} 页（原始 + 规范化），不一致：{mismatches}")
+
+    start = time.perf_counter()
+    for p in normed:
+        legacy_parse_header(p)
+        legacy_split_sections(p)
+    legacy = time.perf_counter() - start
+
+    start = time.perf_counter()
+    for p in normed:
+        extract_to_excel.scan_page(p)
+    scan = time.perf_counter() - start
+
+    n = len(normed)
+    print(f"旧实现：{legacy / n * 1e6:8.1f} µs/页")
+    print(f"单次扫描：{scan / n * 1e6:8.1f} µs/页（{legacy / scan:.1f}x）")
+
+
+if __name__ == "__main__":
+    main()
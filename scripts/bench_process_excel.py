@@ -0,0 +1,100 @@
+"""
+process_excel 的耗时与峰值内存对比：整表加载后改写（旧流程）vs read_only/write_only 流式处理，
+并核对两者输出的单元格与合并区域一致。
+
+每种模式在独立子进程中运行，以 ru_maxrss 作为峰值 RSS。
+
+用法：python -m scripts.bench_process_excel --rows 20000 --merges 200
+"""
+from __future__ import annotations
+
+import argparse
+import json
+import os
+import random
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+
+def make_output_xlsx(path: Path, rows: int, merges: int, seed: int = 7) -> None:
+    """生成与提取阶段相同表头的 output.xlsx，可选在目标列上随机合并若干区域"""
+    from openpyxl import Workbook
+    from extract_to_excel import GRAMMAR_HEADERS
+
+    rng = random.Random(seed)
+    mine_col = GRAMMAR_HEADERS.index("我的原文") + 1
+    more_col = GRAMMAR_HEADERS.index("更多表达") + 1
+    wb = Workbook()
+    ws = wb.active
+    ws.title = "grammar_table"
+    ws.append(GRAMMAR_HEADERS)
+    for i in range(rows):
+        row = [""] * len(GRAMMAR_HEADERS)
+        row[:5] = [i + 1, "实验中学", f"高三{i % 5}班", f"学生{i}", str(20240000 + i)]
+        row[mine_col - 1] = "\n".join(f"  Sentence {k} of student {i}.  " for k in range(rng.randint(3, 12)))
+        row[more_col - 1] = "\n".join(f"{k}. phrase {k} : better {i}" for k in range(rng.randint(1, 6)))
+        ws.append(row)
+    for start in sorted(rng.sample(range(2, rows, 3), min(merges, max(0, rows // 3 - 1)))):
+        col = rng.choice([mine_col, more_col])
+        ws.merge_cells(start_row=start, start_column=col, end_row=start + 1, end_column=col)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    wb.save(path)
+
+
+def _child(mode: str) -> None:
+    import process_excel
+    from settings import Workspace
+
+    ws = Workspace(exam_name="bench", teacher_username=mode)
+    start = time.perf_counter()
+    process_excel.main(ws, streaming=(mode == "stream"))
+    elapsed = time.perf_counter() - start
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    print(json.dumps({"mode": mode, "seconds": round(elapsed, 2), "peak_mb": round(peak_kb / 1024, 1),
+                      "path": str(ws.processed_xlsx.resolve())}))
+
+
+def _dump(path: str):
+    from openpyxl import load_workbook
+
+    sheet = load_workbook(path).active
+    return [list(r) for r in sheet.iter_rows(values_only=True)], sorted(map(str, sheet.merged_cells.ranges))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=20000)
+    ap.add_argument("--merges", type=int, default=0, help="在目标列上随机合并的区域数")
+    ap.add_argument("--child", choices=["load", "stream"], help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.child:
+        _child(args.child)
+        return
+
+    from settings import Workspace
+
+    # 中间文件目录相对于工作目录，子进程在临时目录中运行
+    work = tempfile.mkdtemp()
+    results = {}
+    for mode in ("load", "stream"):
+        make_output_xlsx(Path(work) / Workspace(exam_name="bench", teacher_username=mode).output_xlsx, args.rows, args.merges)
+        out = subprocess.run([sys.executable, "-m", "scripts.bench_process_excel", "--child", mode],
+                             cwd=work, capture_output=True, text=True, check=True, env={**os.environ, "PYTHONPATH": ROOT})
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        results[mode] = r
+        print(f"{r['mode']:>6}: 峰值 RSS {r['peak_mb']:8.1f} MB，耗时 {r['seconds']:6.2f} s，{args.rows} 行")
+
+    same = _dump(results["load"]["path"]) == _dump(results["stream"]["path"])
+    print(f"输出是否一致：{'是' if same else '否'}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,112 @@
+"""
+批改前逐学生准备工作的基准：旧实现（iterrows 建教师评语映射、逐行识别列、每人按姓名过滤全表）
+vs StudentIndex 一次性索引，并核对两者得到的姓名、原文、教师评语与语法子集一致。
+
+用法：python -m scripts.bench_student_index --rows 5000
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import random
+import sys
+import time
+
+import pandas as pd
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from student_index import StudentIndex, students
+
+
+# ---- 旧实现（仅用于对照） ----
+def legacy_student_name(row: pd.Series) -> str:
+    for c in ["姓名", "学生姓名", "name", "Name"]:
+        if c in row.index and pd.notna(row[c]) and str(row[c]).strip():
+            return str(row[c]).strip()
+    for c in row.index:
+        if ("姓名" in str(c)) and pd.notna(row[c]) and str(row[c]).strip():
+            return str(row[c]).strip()
+    return "未命名学生"
+
+
+def legacy_prepare(grammar_df: pd.DataFrame, teacher_df: pd.DataFrame) -> list:
+    teacher_map = {}
+    for _, tr in teacher_df.iterrows():
+        tname = str(tr["姓名"]).strip() if ("姓名" in tr.index and pd.notna(tr["姓名"])) else legacy_student_name(tr)
+        teacher_map.setdefault(tname, [])
+        t_text = ""
+        for c in ["评语", "老师评语", "teacher_text", "text", "内容", "ocr_text"]:
+            if c in tr.index and pd.notna(tr[c]):
+                t_text = str(tr[c]); break
+        if t_text:
+            teacher_map[tname].append(t_text)
+
+    out = []
+    for _, row in grammar_df.iterrows():
+        s_name = str(row["姓名"]).strip() if ("姓名" in row.index and pd.notna(row["姓名"]) and str(row["姓名"]).strip()) else legacy_student_name(row)
+        if ("我的原文" in row.index) and pd.notna(row["我的原文"]) and str(row["我的原文"]).strip():
+            s_text = str(row["我的原文"]).strip()
+        else:
+            s_text = ""
+            for c in row.index:
+                if ("原文" in str(c)) and pd.notna(row[c]) and str(row[c]).strip():
+                    s_text = str(row[c]).strip()
+                    break
+        t_text = "\n".join([t for t in teacher_map.get(s_name, []) if t]) if teacher_map else ""
+        s_id = str(row["学号"]).strip() if ("学号" in row.index and pd.notna(row["学号"])) else ""
+        _filtered = grammar_df[grammar_df["姓名"].astype(str).str.strip() == s_name]
+        gdf = _filtered if not _filtered.empty else grammar_df
+        out.append((s_id, s_name, s_text, t_text, list(gdf.index)))
+    return out
+
+
+def new_prepare(grammar_df: pd.DataFrame, teacher_df: pd.DataFrame) -> list:
+    index = StudentIndex(grammar_df, teacher_df)
+    return [(s.sid, s.name, s.text, index.teacher_text(s), list(index.grammar_rows(s).index))
+            for s in students(grammar_df)]
+
+
+# ---- 合成数据（姓名唯一，两种实现的语法子集应相同） ----
+def make_frames(rows: int, seed: int = 7) -> tuple[pd.DataFrame, pd.DataFrame]:
+    rng = random.Random(seed)
+    grammar_df = pd.DataFrame({
+        "序号": range(1, rows + 1),
+        "学校": "实验中学",
+        "班级": [f"高三{i % 12}班" for i in range(rows)],
+        "姓名": [f"学生{i:05d}" for i in range(rows)],
+        "学号": [20240000 + i for i in range(rows)],
+        "我的原文": [None if rng.random() < 0.05 else f"Essay of student {i}. " * rng.randint(5, 20) for i in range(rows)],
+        "语法错误": "...",
+        "更多表达": "...",
+    })
+    grammar_df["原文与姓名"] = grammar_df["我的原文"].astype(str) + " —— " + grammar_df["姓名"]
+    teacher_df = pd.DataFrame({
+        "姓名": [f"学生{rng.randrange(rows):05d}" for _ in range(rows)],
+        "评语": [None if rng.random() < 0.1 else f"comment {i}" for i in range(rows)],
+    })
+    return grammar_df, teacher_df
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--rows", type=int, default=5000)
+    args = ap.parse_args()
+
+    grammar_df, teacher_df = make_frames(args.rows)
+
+    start = time.perf_counter()
+    legacy = legacy_prepare(grammar_df, teacher_df)
+    legacy_s = time.perf_counter() - start
+
+    start = time.perf_counter()
+    fast = new_prepare(grammar_df, teacher_df)
+    fast_s = time.perf_counter() - start
+
+    print(f"旧实现：{legacy_s:8.2f} s（{args.rows} 名学生）")
+    print(f"学生索引：{fast_s:6.2f} s（{legacy_s / fast_s:.0f}x）")
+    print(f"结果是否一致：{'是' if legacy == fast else '否'}")
+
+
+if __name__ == "__main__":
+    main()
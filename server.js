@@ -5,9 +5,57 @@ const fs = require('fs');
 const path = require('path');
 const cors = require('cors');
 const archiver = require('archiver');
+const http = require('http');
 
 const app = express();
 const PORT = 3000;
+// 常驻Python批改服务（start_server.py）
+const PYTHON_API = process.env.PYTHON_API || 'http://127.0.0.1:5000';
+
+// 调用Python服务的JSON接口
+function pythonApiRequest(method, apiPath, body, timeoutMs = 5000) {
+    return new Promise((resolve, reject) => {
+        const payload = body ? JSON.stringify(body) : null;
+        const headers = payload ? { 'Content-Type': 'application/json', 'Content-Length': Buffer.byteLength(payload) } : {};
+        const req = http.request(new URL(apiPath, PYTHON_API), { method, headers, timeout: timeoutMs }, (res) => {
+            let data = '';
+            res.setEncoding('utf8');
+            res.on('data', (chunk) => { data += chunk; });
+            res.on('end', () => {
+                try {
+                    resolve({ status: res.statusCode, body: JSON.parse(data) });
+                } catch (e) {
+                    reject(new Error(`Python服务返回非JSON内容: ${data.slice(0, 200)}`));
+                }
+            });
+        });
+        req.on('timeout', () => req.destroy(new Error('Python服务请求超时')));
+        req.on('error', reject);
+        if (payload) req.write(payload);
+        req.end();
+    });
+}
+
+// Python只读接口使用相对项目根目录的路径
+function sheetApiPath(endpoint, excelPath, params = {}) {
+    const query = new URLSearchParams({ path: path.relative(path.join(__dirname, '..'), excelPath), ...params });
+    return `${endpoint}?${query.toString()}`;
+}
+
+// 读取工作表全部行，返回 { headers, data, totalRows } 或 { error }
+function readSheetRows(excelPath, sheet) {
+    return pythonApiRequest('GET', sheetApiPath('/api/sheet/rows', excelPath, { sheet })).then(({ body }) => body);
+}
+
+// 读取工作表行数
+function readSheetCount(excelPath) {
+    return pythonApiRequest('GET', sheetApiPath('/api/sheet/count', excelPath)).then(({ body }) => {
+        if (body.error) {
+            throw new Error(body.error);
+        }
+        return body.rows;
+    });
+}
 
 // 启用CORS
 app.use(cors());
@@ -47,6 +95,64 @@ const pdfUpload = multer({
     }
 });
 
+// 多个PDF（如多个班级）上传到 in/pdfs 文件夹，由提取脚本一起处理
+const PDF_DIR = path.join(__dirname, '..', 'in', 'pdfs');
+
+// 清除上一次上传的多PDF文件
+function clearPdfDir() {
+    if (fs.existsSync(PDF_DIR)) {
+        fs.readdirSync(PDF_DIR)
+            .filter(name => name.toLowerCase().endsWith('.pdf'))
+            .forEach(name => fs.unlinkSync(path.join(PDF_DIR, name)));
+    }
+}
+
+// 列出当前待提取的PDF：in/1.pdf 与 in/pdfs/*.pdf
+function listInputPdfs() {
+    const pdfs = [];
+    const singlePdf = path.join(__dirname, '..', 'in', '1.pdf');
+    if (fs.existsSync(singlePdf)) {
+        pdfs.push(singlePdf);
+    }
+    if (fs.existsSync(PDF_DIR)) {
+        fs.readdirSync(PDF_DIR)
+            .filter(name => name.toLowerCase().endsWith('.pdf'))
+            .sort()
+            .forEach(name => pdfs.push(path.join(PDF_DIR, name)));
+    }
+    return pdfs;
+}
+
+const multiPdfStorage = multer.diskStorage({
+    destination: function (req, file, cb) {
+        if (!fs.existsSync(PDF_DIR)) {
+            fs.mkdirSync(PDF_DIR, { recursive: true });
+        }
+        cb(null, PDF_DIR);
+    },
+    filename: function (req, file, cb) {
+        // multer 按 latin1 解码文件名，转回 UTF-8 以保留中文；加序号避免同名覆盖
+        const original = Buffer.from(file.originalname, 'latin1').toString('utf8');
+        const safeName = path.basename(original).replace(/[\\/:*?"<>|]/g, '_');
+        req.pdfIndex = (req.pdfIndex || 0) + 1;
+        cb(null, `${String(req.pdfIndex).padStart(2, '0')}_${safeName}`);
+    }
+});
+
+const multiPdfUpload = multer({
+    storage: multiPdfStorage,
+    fileFilter: function (req, file, cb) {
+        if (file.mimetype === 'application/pdf') {
+            cb(null, true);
+        } else {
+            cb(new Error('只允许上传PDF文件'), false);
+        }
+    },
+    limits: {
+        fileSize: 100 * 1024 * 1024 // 单个文件100MB限制
+    }
+});
+
 // 配置multer用于Excel文件上传到in文件夹
 const excelStorage = multer.diskStorage({
     destination: function (req, file, cb) {
@@ -86,6 +192,8 @@ app.post('/upload', pdfUpload.single('pdfFile'), (req, res) => {
     }
 
     try {
+        // 单个PDF替换本次考试的全部输入，清除之前上传的多PDF
+        clearPdfDir();
         console.log(`PDF文件已上传到: ${req.file.path}`);
         res.json({ 
             success: true, 
@@ -99,6 +207,32 @@ app.post('/upload', pdfUpload.single('pdfFile'), (req, res) => {
     }
 });
 
+// 多PDF上传接口：一次上传多个班级的PDF，替换之前的全部PDF输入
+app.post('/upload-pdfs', (req, res, next) => {
+    try {
+        clearPdfDir();
+        const singlePdf = path.join(__dirname, '..', 'in', '1.pdf');
+        if (fs.existsSync(singlePdf)) {
+            fs.unlinkSync(singlePdf);
+        }
+        next();
+    } catch (error) {
+        console.error('清除旧PDF失败:', error);
+        res.status(500).json({ error: '清除旧PDF失败' });
+    }
+}, multiPdfUpload.array('pdfFiles', 50), (req, res) => {
+    if (!req.files || req.files.length === 0) {
+        return res.status(400).json({ error: '没有接收到文件' });
+    }
+
+    console.log(`已上传 ${req.files.length} 个PDF文件到: ${PDF_DIR}`);
+    res.json({
+        success: true,
+        message: `已成功保存 ${req.files.length} 个PDF文件到in/pdfs文件夹`,
+        files: req.files.map(f => ({ savedName: f.filename, savedPath: f.path }))
+    });
+});
+
 // Excel文件上传接口
 app.post('/upload-excel', excelUpload.single('excelFile'), (req, res) => {
     if (!req.file) {
@@ -121,32 +255,44 @@ app.post('/upload-excel', excelUpload.single('excelFile'), (req, res) => {
 
 // 检查文件是否存在接口
 app.get('/api/check-file', (req, res) => {
-    const filePath = path.join(__dirname, '..', 'in', '1.pdf');
-    const fileExists = fs.existsSync(filePath);
+    const pdfs = listInputPdfs();
+    const fileExists = pdfs.length > 0;
     
     res.json({
         exists: fileExists,
-        path: filePath,
-        timestamp: fileExists ? fs.statSync(filePath).mtime : null
+        path: fileExists ? pdfs[0] : path.join(__dirname, '..', 'in', '1.pdf'),
+        paths: pdfs,
+        timestamp: fileExists ? fs.statSync(pdfs[0]).mtime : null
     });
 });
 
 // 检查PDF和Excel文件是否同时存在的接口
 app.get('/api/check-files', (req, res) => {
-    const pdfPath = path.join(__dirname, '..', 'in', '1.pdf');
+    const pdfs = listInputPdfs();
     const excelPath = path.join(__dirname, '..', 'in', '1.xlsx');
-    const pdfExists = fs.existsSync(pdfPath);
+    const pdfExists = pdfs.length > 0;
     const excelExists = fs.existsSync(excelPath);
     
     res.json({
         pdfExists: pdfExists,
         excelExists: excelExists,
-        pdfPath: pdfPath,
+        pdfPath: pdfExists ? pdfs[0] : path.join(__dirname, '..', 'in', '1.pdf'),
+        pdfPaths: pdfs,
         excelPath: excelPath,
-        timestamp: pdfExists ? fs.statSync(pdfPath).mtime : null
+        timestamp: pdfExists ? fs.statSync(pdfs[0]).mtime : null
     });
 });
 
+// 流式批改时已生成的评分表行（main.py 写入考试输出目录下的 .partial_rows.json，运行结束时删除）
+function readPartialRows(dir) {
+    try {
+        const rows = JSON.parse(fs.readFileSync(path.join(dir, '.partial_rows.json'), 'utf8'));
+        return Array.isArray(rows) ? rows : [];
+    } catch (e) {
+        return [];
+    }
+}
+
 // 获取学生总数和当前进度
 app.get('/api/progress', (req, res) => {
     try {
@@ -160,6 +306,7 @@ app.get('/api/progress', (req, res) => {
         let totalStudents = 0;
         let currentProgress = 0;
         let tablesFileExists = false;
+        let partialRows = [];
         
         // 检查out文件夹是否存在
         const outDir = path.join(__dirname, '..', 'out');
@@ -183,6 +330,7 @@ app.get('/api/progress', (req, res) => {
                     currentProgress = files.filter(file => file.endsWith('.md')).length;
                     // 检查考试文件夹中的output_processed.xlsx文件
                     tablesFileExists = fs.existsSync(path.join(examDir, 'output_processed.xlsx'));
+                    partialRows = readPartialRows(examDir);
                 }
             } else {
                 // 如果没有考试名称，检查out根目录
@@ -190,6 +338,7 @@ app.get('/api/progress', (req, res) => {
                 currentProgress = files.filter(file => file.endsWith('.md')).length;
                 // 检查out根目录中的output_processed.xlsx文件
                 tablesFileExists = fs.existsSync(path.join(outDir, 'output_processed.xlsx'));
+                partialRows = readPartialRows(outDir);
             }
         }
         
@@ -217,238 +366,51 @@ app.get('/api/progress', (req, res) => {
         
         console.log('检查Excel文件路径:', processedExcelPath);
         
-        // 检查Excel文件是否存在并准确读取学生总数
-        if (fs.existsSync(processedExcelPath)) {
-            // 使用虚拟环境中的Python来读取Excel文件
-            const pythonScript = `
-import pandas as pd
-import sys
+        // 学生总数依次取自：处理后的Excel、上传的Excel、out目录下的output.xlsx
+        const uploadedExcelPath = path.join(__dirname, '..', 'in', '1.xlsx');
+        let outputXlsxPath;
+        if (examName) {
+            let safeExamName = examName.replace(/[\\/:*?"<>|]/g, '').trim() || '未命名考试';
+            if (teacherUsername) {
+                const safeTeacherName = teacherUsername.replace(/[\\/:*?"<>|]/g, '').trim();
+                if (safeTeacherName) {
+                    safeExamName = `${safeExamName}_${safeTeacherName}`;
+                }
+            }
+            outputXlsxPath = path.join(__dirname, '..', 'out', safeExamName, 'output.xlsx');
+        } else {
+            outputXlsxPath = path.join(__dirname, '..', 'out', 'output.xlsx');
+        }
+        const countSource = [processedExcelPath, uploadedExcelPath, outputXlsxPath].find((p) => fs.existsSync(p));
 
-try:
-    excel_file = "${processedExcelPath}"
-    df = pd.read_excel(excel_file)
-    # 学生总人数（不用减一）
-    row_count = len(df)
-    print(row_count)
-except Exception as e:
-    # 如果读取失败，使用默认值
-    print(9)
-`;
-            
-            const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-                cwd: path.join(__dirname, '..')
-            });
-            
-            let output = '';
-            let errorOutput = '';
-            
-            pythonProcess.stdout.on('data', (data) => {
-                output += data.toString().trim();
-                console.log('Python stdout:', data.toString().trim());
-            });
-            
-            pythonProcess.stderr.on('data', (data) => {
-                errorOutput += data.toString().trim();
-                console.log('Python stderr:', data.toString().trim());
+        const sendProgress = (extra = {}) => {
+            // 确保总学生数至少等于当前进度
+            totalStudents = Math.max(totalStudents, currentProgress, 1);
+            res.json({
+                totalStudents: totalStudents,
+                currentProgress: currentProgress,
+                percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
+                tablesFileExists: tablesFileExists,
+                partialRows: partialRows,
+                ...extra
             });
-            
-            pythonProcess.on('close', (code) => {
-                console.log('Python process closed with code:', code);
-                console.log('Python output:', output);
-                console.log('Python error:', errorOutput);
-                
-                if (code === 0 && output) {
-                    totalStudents = parseInt(output) || 9;
-                } else {
+        };
+
+        if (countSource) {
+            // 通过常驻Python服务读取行数（带缓存）
+            readSheetCount(countSource)
+                .then((rows) => {
+                    totalStudents = parseInt(rows) || 9;
+                    sendProgress();
+                })
+                .catch((error) => {
+                    console.error('读取学生总数失败:', error.message);
                     totalStudents = 9; // 默认值
-                }
-                
-                // 确保总学生数至少等于当前进度
-                totalStudents = Math.max(totalStudents, currentProgress, 1);
-                
-                res.json({
-                    totalStudents: totalStudents,
-                    currentProgress: currentProgress,
-                    percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                    tablesFileExists: tablesFileExists
-                });
-            });
-            
-            pythonProcess.on('error', (error) => {
-                console.error('执行Python脚本失败:', error);
-                totalStudents = Math.max(currentProgress, 9);
-                res.json({
-                    totalStudents: totalStudents,
-                    currentProgress: currentProgress,
-                    percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                    tablesFileExists: tablesFileExists,
-                    error: error.message
+                    sendProgress({ error: error.message });
                 });
-            });
         } else {
-            // 如果Excel文件不存在，尝试从Excel上传文件读取学生总数
-            const uploadedExcelPath = path.join(__dirname, '..', 'in', '1.xlsx');
-            if (fs.existsSync(uploadedExcelPath)) {
-                // 使用虚拟环境中的Python来读取上传的Excel文件
-                const pythonScript = `
-import pandas as pd
-import sys
-
-try:
-    excel_file = "${uploadedExcelPath}"
-    df = pd.read_excel(excel_file)
-    # 学生总人数（不用减一）
-    row_count = len(df)
-    print(row_count)
-except Exception as e:
-    # 如果读取失败，使用默认值
-    print(9)
-`;
-                
-                const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-                    cwd: path.join(__dirname, '..')
-                });
-                
-                let output = '';
-                let errorOutput = '';
-                
-                pythonProcess.stdout.on('data', (data) => {
-                    output += data.toString().trim();
-                    console.log('Python stdout:', data.toString().trim());
-                });
-                
-                pythonProcess.stderr.on('data', (data) => {
-                    errorOutput += data.toString().trim();
-                    console.log('Python stderr:', data.toString().trim());
-                });
-                
-                pythonProcess.on('close', (code) => {
-                    console.log('Python process closed with code:', code);
-                    console.log('Python output:', output);
-                    console.log('Python error:', errorOutput);
-                    
-                    if (code === 0 && output) {
-                        totalStudents = parseInt(output) || 9;
-                    } else {
-                        totalStudents = 9; // 默认值
-                    }
-                    
-                    // 确保总学生数至少等于当前进度
-                    totalStudents = Math.max(totalStudents, currentProgress, 1);
-                    
-                    res.json({
-                        totalStudents: totalStudents,
-                        currentProgress: currentProgress,
-                        percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                        tablesFileExists: tablesFileExists
-                    });
-                });
-                
-                pythonProcess.on('error', (error) => {
-                    console.error('执行Python脚本失败:', error);
-                    totalStudents = Math.max(currentProgress, 9);
-                    res.json({
-                        totalStudents: totalStudents,
-                        currentProgress: currentProgress,
-                        percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                        tablesFileExists: tablesFileExists,
-                        error: error.message
-                    });
-                });
-            } else {
-                // 如果连上传的Excel文件都不存在，尝试从out目录下的output.xlsx读取
-                let outputXlsxPath;
-                if (examName) {
-                    let safeExamName = examName.replace(/[\\/:*?"<>|]/g, '').trim() || '未命名考试';
-                    if (teacherUsername) {
-                        const safeTeacherName = teacherUsername.replace(/[\\/:*?"<>|]/g, '').trim();
-                        if (safeTeacherName) {
-                            safeExamName = `${safeExamName}_${safeTeacherName}`;
-                        }
-                    }
-                    outputXlsxPath = path.join(__dirname, '..', 'out', safeExamName, 'output.xlsx');
-                } else {
-                    outputXlsxPath = path.join(__dirname, '..', 'out', 'output.xlsx');
-                }
-                
-                if (fs.existsSync(outputXlsxPath)) {
-                    // 使用虚拟环境中的Python来读取output.xlsx文件
-                    const pythonScript = `
-import pandas as pd
-import sys
-
-try:
-    excel_file = "${outputXlsxPath}"
-    df = pd.read_excel(excel_file)
-    # 学生总人数（不用减一）
-    row_count = len(df)
-    print(row_count)
-except Exception as e:
-    # 如果读取失败，使用默认值
-    print(9)
-`;
-                    
-                    const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-                        cwd: path.join(__dirname, '..')
-                    });
-                    
-                    let output = '';
-                    let errorOutput = '';
-                    
-                    pythonProcess.stdout.on('data', (data) => {
-                        output += data.toString().trim();
-                        console.log('Python stdout:', data.toString().trim());
-                    });
-                    
-                    pythonProcess.stderr.on('data', (data) => {
-                        errorOutput += data.toString().trim();
-                        console.log('Python stderr:', data.toString().trim());
-                    });
-                    
-                    pythonProcess.on('close', (code) => {
-                        console.log('Python process closed with code:', code);
-                        console.log('Python output:', output);
-                        console.log('Python error:', errorOutput);
-                        
-                        if (code === 0 && output) {
-                            totalStudents = parseInt(output) || 9;
-                        } else {
-                            totalStudents = 9; // 默认值
-                        }
-                        
-                        // 确保总学生数至少等于当前进度
-                        totalStudents = Math.max(totalStudents, currentProgress, 1);
-                        
-                        res.json({
-                            totalStudents: totalStudents,
-                            currentProgress: currentProgress,
-                            percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                            tablesFileExists: tablesFileExists
-                        });
-                    });
-                    
-                    pythonProcess.on('error', (error) => {
-                        console.error('执行Python脚本失败:', error);
-                        totalStudents = Math.max(currentProgress, 9);
-                        res.json({
-                            totalStudents: totalStudents,
-                            currentProgress: currentProgress,
-                            percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                            tablesFileExists: tablesFileExists,
-                            error: error.message
-                        });
-                    });
-                } else {
-                    // 如果所有Excel文件都不存在，使用默认值
-                    totalStudents = Math.max(currentProgress, 1);
-                    res.json({
-                        totalStudents: totalStudents,
-                        currentProgress: currentProgress,
-                        percentage: totalStudents > 0 ? Math.round((currentProgress / totalStudents) * 100) : 0,
-                        tablesFileExists: tablesFileExists
-                    });
-                }
-            }
+            // 如果所有Excel文件都不存在，使用默认值
+            sendProgress();
         }
     } catch (error) {
         console.error('获取进度失败:', error);
@@ -475,99 +437,57 @@ app.get('/api/report', (req, res) => {
         
         console.log('开始读取Excel文件:', processedExcelPath);
         
-        // 使用虚拟环境中的Python读取Excel文件
-        const pythonScript = `
-import pandas as pd
-import json
-
-try:
-    df = pd.read_excel("${processedExcelPath}", sheet_name="grammar_table")
-    
-    # 转换为JSON格式
-    result = {
-        "headers": df.columns.tolist(),
-        "data": df.astype(str).values.tolist(),
-        "totalRows": len(df)
-    }
-    print(json.dumps(result, ensure_ascii=False))
-except Exception as e:
-    print(json.dumps({"error": str(e)}))
-`;
-        
-        const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-            cwd: path.join(__dirname, '..')
-        });
-        
-        let output = '';
-        let errorOutput = '';
-        
-        pythonProcess.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-        
-        pythonProcess.stderr.on('data', (data) => {
-            errorOutput += data.toString();
-        });
-        
-        pythonProcess.on('close', (code) => {
-            if (code === 0 && output) {
-                try {
-                    const result = JSON.parse(output);
-                    if (result.error) {
-                        return res.json({
-                            success: false,
-                            error: '读取Excel文件失败: ' + result.error
-                        });
-                    }
-                    
-                    const headers = result.headers || [];
-                    const rows = result.data || [];
-                    
-                    console.log('表头:', headers);
-                    console.log('数据行数:', rows.length);
-                    
-                    if (rows.length === 0) {
-                        return res.json({
-                            success: false,
-                            error: 'Excel文件为空'
-                        });
-                    }
-                    
-                    // 转换为对象数组
-                    const reportData = rows.map((row, index) => {
-                        const obj = {};
-                        headers.forEach((header, colIndex) => {
-                            obj[header] = row[colIndex] || '';
-                        });
-                        return obj;
-                    }).filter(row => {
-                        return Object.values(row).some(value => value.trim() !== '');
-                    });
-                    
-                    console.log('处理后的数据行数:', reportData.length);
-                    
-                    res.json({
-                        success: true,
-                        report: reportData,
-                        headers: headers,
-                        totalStudents: reportData.length
+        // 通过常驻Python服务读取（带缓存）
+        readSheetRows(processedExcelPath, 'grammar_table')
+            .then((result) => {
+                if (result.error) {
+                    return res.json({
+                        success: false,
+                        error: '读取Excel文件失败: ' + result.error
                     });
-                    
-                } catch (parseError) {
-                    console.error('解析Python输出失败:', parseError);
-                    res.json({
+                }
+                
+                const headers = result.headers || [];
+                const rows = result.data || [];
+                
+                console.log('表头:', headers);
+                console.log('数据行数:', rows.length);
+                
+                if (rows.length === 0) {
+                    return res.json({
                         success: false,
-                        error: '解析数据失败: ' + parseError.message
+                        error: 'Excel文件为空'
                     });
                 }
-            } else {
-                console.error('Python脚本执行失败:', errorOutput);
+                
+                // 转换为对象数组
+                const reportData = rows.map((row, index) => {
+                    const obj = {};
+                    headers.forEach((header, colIndex) => {
+                        obj[header] = row[colIndex] || '';
+                    });
+                    return obj;
+                }).filter(row => {
+                    return Object.values(row).some(value => value.trim() !== '');
+                });
+                
+                console.log('处理后的数据行数:', reportData.length);
+                
+                res.json({
+                    success: true,
+                    report: reportData,
+                    headers: headers,
+                    totalStudents: reportData.length
+                });
+                
+            })
+            .catch((error) => {
+                console.error('读取Excel文件失败:', error);
                 res.json({
                     success: false,
-                    error: '执行Python脚本失败: ' + errorOutput
+                    error: '读取Excel文件失败: ' + error.message
                 });
-            }
-        });
+            });
         
     } catch (error) {
         console.error('获取报告失败:', error);
@@ -745,121 +665,79 @@ app.get('/api/grammar-report/:studentId', (req, res) => {
             });
         }
         
-        // 使用虚拟环境中的Python读取Excel文件
-        const pythonScript = `
-import pandas as pd
-import json
-
-try:
-    df = pd.read_excel("${processedExcelPath}", sheet_name="grammar_table")
-    
-    # 转换为JSON格式
-    result = {
-        "headers": df.columns.tolist(),
-        "data": df.astype(str).values.tolist(),
-        "totalRows": len(df)
-    }
-    print(json.dumps(result, ensure_ascii=False))
-except Exception as e:
-    print(json.dumps({"error": str(e)}))
-`;
-        
-        const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-            cwd: path.join(__dirname, '..')
-        });
-        
-        let output = '';
-        let errorOutput = '';
-        
-        pythonProcess.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-        
-        pythonProcess.stderr.on('data', (data) => {
-            errorOutput += data.toString();
-        });
-        
-        pythonProcess.on('close', (code) => {
-            if (code === 0 && output) {
-                try {
-                    const result = JSON.parse(output);
-                    if (result.error) {
-                        return res.json({
-                            success: false,
-                            error: '读取Excel文件失败: ' + result.error
-                        });
-                    }
-                    
-                    const headers = result.headers || [];
-                    const rows = result.data || [];
-                    
-                    if (rows.length === 0) {
-                        return res.json({
-                            success: false,
-                            error: '语法报告数据为空'
-                        });
-                    }
-                    
-                    // 根据学生ID或姓名查找对应的数据行
-                    let studentRow = null;
-                    const studentIndex = parseInt(studentId) - 1;
-                    
-                    if (!isNaN(studentIndex) && studentIndex >= 0 && studentIndex < rows.length) {
-                        studentRow = rows[studentIndex];
-                    } else {
-                        // 尝试通过姓名查找
-                        const studentName = studentId;
-                        const nameIndex = rows.findIndex(row => {
-                            const nameColIndex = headers.findIndex(h => 
-                                h.includes('姓名') || h.includes('name')
-                            );
-                            if (nameColIndex >= 0 && nameColIndex < row.length) {
-                                return row[nameColIndex] && row[nameColIndex].includes(studentName);
-                            }
-                            return false;
-                        });
-                        if (nameIndex >= 0) {
-                            studentRow = rows[nameIndex];
-                        }
-                    }
-                    
-                    if (!studentRow) {
-                        return res.json({
-                            success: false,
-                            error: '找不到该学生的语法报告'
-                        });
-                    }
-                    
-                    // 将单行数据转换为表格格式
-                    const reportData = headers.map((header, index) => ({
-                        项目: header,
-                        内容: studentRow[index] || ''
-                    }));
-                    
-                    res.json({
-                        success: true,
-                        report: reportData,
-                        student: {
-                            name: studentRow[headers.findIndex(h => h.includes('姓名'))] || studentId,
-                            studentId: studentRow[headers.findIndex(h => h.includes('学号'))] || studentId
+        // 通过常驻Python服务读取（带缓存）
+        readSheetRows(processedExcelPath, 'grammar_table')
+            .then((result) => {
+                if (result.error) {
+                    return res.json({
+                        success: false,
+                        error: '读取Excel文件失败: ' + result.error
+                    });
+                }
+                
+                const headers = result.headers || [];
+                const rows = result.data || [];
+                
+                if (rows.length === 0) {
+                    return res.json({
+                        success: false,
+                        error: '语法报告数据为空'
+                    });
+                }
+                
+                // 根据学生ID或姓名查找对应的数据行
+                let studentRow = null;
+                const studentIndex = parseInt(studentId) - 1;
+                
+                if (!isNaN(studentIndex) && studentIndex >= 0 && studentIndex < rows.length) {
+                    studentRow = rows[studentIndex];
+                } else {
+                    // 尝试通过姓名查找
+                    const studentName = studentId;
+                    const nameIndex = rows.findIndex(row => {
+                        const nameColIndex = headers.findIndex(h => 
+                            h.includes('姓名') || h.includes('name')
+                        );
+                        if (nameColIndex >= 0 && nameColIndex < row.length) {
+                            return row[nameColIndex] && row[nameColIndex].includes(studentName);
                         }
+                        return false;
                     });
-                    
-                } catch (parseError) {
-                    console.error('解析Python输出失败:', parseError);
-                    res.json({
+                    if (nameIndex >= 0) {
+                        studentRow = rows[nameIndex];
+                    }
+                }
+                
+                if (!studentRow) {
+                    return res.json({
                         success: false,
-                        error: '解析数据失败: ' + parseError.message
+                        error: '找不到该学生的语法报告'
                     });
                 }
-            } else {
-                console.error('Python脚本执行失败:', errorOutput);
+                
+                // 将单行数据转换为表格格式
+                const reportData = headers.map((header, index) => ({
+                    项目: header,
+                    内容: studentRow[index] || ''
+                }));
+                
+                res.json({
+                    success: true,
+                    report: reportData,
+                    student: {
+                        name: studentRow[headers.findIndex(h => h.includes('姓名'))] || studentId,
+                        studentId: studentRow[headers.findIndex(h => h.includes('学号'))] || studentId
+                    }
+                });
+                
+            })
+            .catch((error) => {
+                console.error('读取Excel文件失败:', error);
                 res.json({
                     success: false,
-                    error: '执行Python脚本失败: ' + errorOutput
+                    error: '读取Excel文件失败: ' + error.message
                 });
-            }
-        });
+            });
         
     } catch (error) {
         console.error('获取语法报告失败:', error);
@@ -1261,96 +1139,54 @@ app.get('/api/history-report-data', (req, res) => {
             });
         }
         
-        // 使用虚拟环境中的Python读取Excel文件
-        const pythonScript = `
-import pandas as pd
-import json
-
-try:
-    df = pd.read_excel("${excelPath}", sheet_name="grammar_table")
-    
-    # 转换为JSON格式
-    result = {
-        "headers": df.columns.tolist(),
-        "data": df.astype(str).values.tolist(),
-        "totalRows": len(df)
-    }
-    print(json.dumps(result, ensure_ascii=False))
-except Exception as e:
-    print(json.dumps({"error": str(e)}))
-`;
-        
-        const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-            cwd: path.join(__dirname, '..')
-        });
-        
-        let output = '';
-        let errorOutput = '';
-        
-        pythonProcess.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-        
-        pythonProcess.stderr.on('data', (data) => {
-            errorOutput += data.toString();
-        });
-        
-        pythonProcess.on('close', (code) => {
-            if (code === 0 && output) {
-                try {
-                    const result = JSON.parse(output);
-                    if (result.error) {
-                        return res.json({
-                            success: false,
-                            error: '读取Excel文件失败: ' + result.error
-                        });
-                    }
-                    
-                    const headers = result.headers || [];
-                    const rows = result.data || [];
-                    
-                    if (rows.length === 0) {
-                        return res.json({
-                            success: false,
-                            error: 'Excel文件为空'
-                        });
-                    }
-                    
-                    // 转换为对象数组
-                    const reportData = rows.map((row, index) => {
-                        const obj = {};
-                        headers.forEach((header, colIndex) => {
-                            obj[header] = row[colIndex] || '';
-                        });
-                        return obj;
-                    }).filter(row => {
-                        return Object.values(row).some(value => value.trim() !== '');
-                    });
-                    
-                    res.json({
-                        success: true,
-                        report: reportData,
-                        headers: headers,
-                        totalStudents: reportData.length,
-                        examName: examName,
-                        folderName: folderName
+        // 通过常驻Python服务读取（带缓存）
+        readSheetRows(excelPath, 'grammar_table')
+            .then((result) => {
+                if (result.error) {
+                    return res.json({
+                        success: false,
+                        error: '读取Excel文件失败: ' + result.error
                     });
-                    
-                } catch (parseError) {
-                    console.error('解析Python输出失败:', parseError);
-                    res.json({
+                }
+                
+                const headers = result.headers || [];
+                const rows = result.data || [];
+                
+                if (rows.length === 0) {
+                    return res.json({
                         success: false,
-                        error: '解析数据失败: ' + parseError.message
+                        error: 'Excel文件为空'
                     });
                 }
-            } else {
-                console.error('Python脚本执行失败:', errorOutput);
+                
+                // 转换为对象数组
+                const reportData = rows.map((row, index) => {
+                    const obj = {};
+                    headers.forEach((header, colIndex) => {
+                        obj[header] = row[colIndex] || '';
+                    });
+                    return obj;
+                }).filter(row => {
+                    return Object.values(row).some(value => value.trim() !== '');
+                });
+                
+                res.json({
+                    success: true,
+                    report: reportData,
+                    headers: headers,
+                    totalStudents: reportData.length,
+                    examName: examName,
+                    folderName: folderName
+                });
+                
+            })
+            .catch((error) => {
+                console.error('读取Excel文件失败:', error);
                 res.json({
                     success: false,
-                    error: '执行Python脚本失败: ' + errorOutput
+                    error: '读取Excel文件失败: ' + error.message
                 });
-            }
-        });
+            });
         
     } catch (error) {
         console.error('获取历史报告数据失败:', error);
@@ -1362,11 +1198,52 @@ except Exception as e:
 });
 
 // 执行main.py的API接口
+// 优先提交到常驻Python批改服务的任务队列，服务不可用时回退为启动新的main.py进程
 app.post('/api/run-main', (req, res) => {
     const examName = req.body.examName || '';
     const teacherUsername = req.body.teacherUsername || '';
     console.log('开始执行main.py...', examName ? `考试名称: ${examName}` : '', teacherUsername ? `老师账号: ${teacherUsername}` : '');
-    
+
+    pythonApiRequest('POST', '/api/jobs', { examName, teacherUsername })
+        .then(({ status, body }) => {
+            if (status === 409) {
+                // 同一考试已有进行中的任务：不再另起main.py，返回该任务ID供前端继续轮询
+                console.warn(`考试已有进行中的批改任务: ${body.jobId}`);
+                res.status(409).json({ success: false, error: body.error, jobId: body.jobId });
+                return;
+            }
+            if (status !== 202 || !body.jobId) {
+                throw new Error(`提交任务失败，状态码: ${status}`);
+            }
+            console.log(`批改任务已提交到Python服务，任务ID: ${body.jobId}`);
+            res.json({
+                success: true,
+                message: '批改任务已提交',
+                jobId: body.jobId
+            });
+        })
+        .catch((error) => {
+            console.warn('Python批改服务不可用，改为启动main.py:', error.message);
+            runMainBySpawn(res, examName, teacherUsername);
+        });
+});
+
+// 批改任务状态（转发到Python服务）
+app.get('/api/jobs/:jobId', (req, res) => {
+    const tail = parseInt(req.query.tail, 10) || 20;
+    pythonApiRequest('GET', `/api/jobs/${encodeURIComponent(req.params.jobId)}?tail=${tail}`)
+        .then(({ status, body }) => res.status(status).json(body))
+        .catch((error) => res.status(502).json({ error: error.message }));
+});
+
+// 批改任务完整输出（转发到Python服务）
+app.get('/api/jobs/:jobId/result', (req, res) => {
+    pythonApiRequest('GET', `/api/jobs/${encodeURIComponent(req.params.jobId)}/result`)
+        .then(({ status, body }) => res.status(status).json(body))
+        .catch((error) => res.status(502).json({ error: error.message }));
+});
+
+function runMainBySpawn(res, examName, teacherUsername) {
     // 设置环境变量，传递考试名称和老师账号
     const envVars = { ...process.env, PYTHONPATH: path.join(__dirname, '..') };
     if (examName) {
@@ -1449,7 +1326,7 @@ app.post('/api/run-main', (req, res) => {
             });
         }
     }, 1800000);
-});
+}
 
 // 学生端API接口 - 获取学生参与的考试列表
 app.get('/api/student-exams', (req, res) => {
@@ -1547,57 +1424,9 @@ app.get('/api/student-grammar-report', (req, res) => {
             });
         }
         
-        // 使用虚拟环境中的Python读取Excel文件
-        const pythonScript = `
-import pandas as pd
-import json
-
-try:
-    df = pd.read_excel("${excelPath}", sheet_name="grammar_table")
-    
-    # 查找该学生的数据
-    student_data = df[df['姓名'].str.contains("${studentName}", na=False)]
-    
-    if len(student_data) == 0:
-        result = {"error": "未找到该学生的语法报告数据"}
-    else:
-        # 转换为字典格式
-        report_data = []
-        for index, row in student_data.iterrows():
-            for col_name, value in row.items():
-                if pd.notna(value) and str(value).strip() != '':
-                    report_data.append({
-                        "项目": str(col_name),
-                        "内容": str(value)
-                    })
-        
-        result = {"report": report_data}
-    
-    print(json.dumps(result, ensure_ascii=False))
-    
-except Exception as e:
-    print(json.dumps({"error": str(e)}))
-`;
-        
-        const pythonProcess = spawn(path.join(__dirname, '..', 'venv', 'bin', 'python3'), ['-c', pythonScript], {
-            cwd: path.join(__dirname, '..')
-        });
-        
-        let output = '';
-        let errorOutput = '';
-        
-        pythonProcess.stdout.on('data', (data) => {
-            output += data.toString();
-        });
-        
-        pythonProcess.stderr.on('data', (data) => {
-            errorOutput += data.toString();
-        });
-        
-        pythonProcess.on('close', (code) => {
-            try {
-                const result = JSON.parse(output);
-                
+        // 通过常驻Python服务读取（带缓存）
+        pythonApiRequest('GET', sheetApiPath('/api/sheet/student', excelPath, { sheet: 'grammar_table', name: studentName }))
+            .then(({ body: result }) => {
                 if (result.error) {
                     res.json({
                         success: false,
@@ -1609,13 +1438,13 @@ except Exception as e:
                         report: result.report
                     });
                 }
-            } catch (parseError) {
+            })
+            .catch((error) => {
                 res.json({
                     success: false,
-                    error: '解析语法报告数据失败: ' + parseError.message
+                    error: '解析语法报告数据失败: ' + error.message
                 });
-            }
-        });
+            });
         
     } catch (error) {
         console.error('获取学生语法报告失败:', error);
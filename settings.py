@@ -1,29 +1,130 @@
 import os
-from dataclasses import dataclass
+import shutil
+from dataclasses import dataclass, field, replace
+from pathlib import Path
+
+
+def safe_folder_name(exam_name: str, teacher_username: str = "") -> str:
+    """考试（及老师账号）对应的文件夹名称；未指定考试名称时返回空串"""
+    exam_name = (exam_name or "").strip()
+    if not exam_name:
+        return ""
+    # 创建安全的文件夹名称（移除非法字符）
+    safe_exam_name = "".join(ch for ch in exam_name if ch not in '\\/:*?"<>|').strip()
+    if not safe_exam_name:
+        safe_exam_name = "未命名考试"
+    # 添加老师账号到文件夹名称
+    teacher_username = (teacher_username or "").strip()
+    if teacher_username:
+        safe_teacher_name = "".join(ch for ch in teacher_username if ch not in '\\/:*?"<>|').strip()
+        if safe_teacher_name:
+            safe_exam_name = f"{safe_exam_name}_{safe_teacher_name}"
+    return safe_exam_name
+
+
+@dataclass(frozen=True)
+class Workspace:
+    """
+    单次批改任务的工作区：考试与老师账号、输入目录、各阶段的输出路径，以及任务级配置（体裁、是否重批等）。
+    各处理阶段显式接收该对象，不再在导入时读取 EXAM_NAME 等环境变量，因此多个考试可以同时处理。
+    """
+    exam_name: str = ""
+    teacher_username: str = ""
+    input_dir: Path = Path("in")
+    # 逗号分隔的 PDF 文件或目录；为空时取 input_dir 下的 1.pdf 与 pdfs/
+    pdf_input: str = ""
+    # 任务级配置（TASK_TYPE / SUBGENRE / FORCE_REGRADE 等），未设置的项回退到环境变量
+    options: dict = field(default_factory=dict)
+
+    @classmethod
+    def from_env(cls) -> "Workspace":
+        """命令行运行时沿用原有环境变量"""
+        return cls(
+            exam_name=os.environ.get('EXAM_NAME', '').strip(),
+            teacher_username=os.environ.get('TEACHER_USERNAME', '').strip(),
+            input_dir=Path(os.environ.get("INPUT_DIR", "in")),
+            pdf_input=os.environ.get("PDF_INPUT", "").strip(),
+        )
+
+    def option(self, key: str, default: str = "") -> str:
+        # options 中显式为 None 的项表示该任务未指定，使用默认值而不读取环境变量
+        if key in self.options:
+            value = self.options[key]
+            return default if value is None else str(value)
+        return os.environ.get(key, default)
+
+    @property
+    def folder(self) -> str:
+        return safe_folder_name(self.exam_name, self.teacher_username)
+
+    @property
+    def out_dir(self) -> Path:
+        """报告输出目录：out/<考试>"""
+        return Path("out") / self.folder if self.folder else Path("out")
+
+    @property
+    def outputs_dir(self) -> Path:
+        """中间文件目录：outputs/<考试>"""
+        return Path("outputs") / self.folder if self.folder else Path("outputs")
+
+    @property
+    def pdf_path(self) -> Path:
+        return self.input_dir / "1.pdf"
+
+    @property
+    def pdf_dir(self) -> Path:
+        return self.input_dir / "pdfs"
+
+    @property
+    def review_xlsx(self) -> Path:
+        """学生分数表（第2、3题得分），用于生成互评与教师评价"""
+        return self.input_dir / "1.xlsx"
+
+    @property
+    def output_xlsx(self) -> Path:
+        return self.outputs_dir / "output.xlsx"
+
+    @property
+    def processed_xlsx(self) -> Path:
+        return self.outputs_dir / "output_processed.xlsx"
+
+    def snapshot_inputs(self, tag: str) -> "Workspace":
+        """
+        把当前上传的输入文件复制到 outputs/<考试>/inputs/<tag>/（tag 通常为任务ID），返回指向该副本的工作区。
+        每个任务各自一份副本：任务排队或运行期间其他老师重新上传，不会影响本任务的输入。
+        """
+        target = self.outputs_dir / "inputs" / tag
+        if target.exists():
+            shutil.rmtree(target)
+        target.mkdir(parents=True)
+        try:
+            for src in (self.pdf_path, self.review_xlsx):
+                if src.is_file():
+                    shutil.copy2(src, target / src.name)
+            if self.pdf_dir.is_dir():
+                shutil.copytree(self.pdf_dir, target / "pdfs")
+        except BaseException:
+            shutil.rmtree(target, ignore_errors=True)
+            raise
+        return replace(self, input_dir=target)
+
+    def drop_snapshot(self) -> None:
+        """删除 snapshot_inputs() 生成的输入副本；未使用副本的工作区不做任何处理"""
+        if self.input_dir.parent == self.outputs_dir / "inputs":
+            shutil.rmtree(self.input_dir, ignore_errors=True)
 
 @dataclass
 class Paths:
+    workspace: Workspace | None = None
+
     def __post_init__(self):
-        # 获取考试名称和老师账号
-        exam_name = os.environ.get('EXAM_NAME', '').strip()
-        teacher_username = os.environ.get('TEACHER_USERNAME', '').strip()
+        ws = self.workspace if self.workspace is not None else Workspace.from_env()
         
         # 如果指定了考试名称，创建对应的输出目录结构
-        if exam_name:
-            # 创建安全的文件夹名称（移除非法字符）
-            safe_exam_name = "".join(ch for ch in exam_name if ch not in '\\/:*?"<>|').strip()
-            if not safe_exam_name:
-                safe_exam_name = "未命名考试"
-            
-            # 添加老师账号到文件夹名称
-            if teacher_username:
-                safe_teacher_name = "".join(ch for ch in teacher_username if ch not in '\\/:*?"<>|').strip()
-                if safe_teacher_name:
-                    safe_exam_name = f"{safe_exam_name}_{safe_teacher_name}"
-            
+        if ws.folder:
             # 设置考试特定的输出目录
-            self.OUTPUT_DIR = os.path.join("./out", safe_exam_name)
-            self.INPUT_EXCEL = os.path.join("./outputs", safe_exam_name, "output_processed.xlsx")
+            self.OUTPUT_DIR = os.path.join("./out", ws.folder)
+            self.INPUT_EXCEL = os.path.join("./outputs", ws.folder, "output_processed.xlsx")
         else:
             self.OUTPUT_DIR = os.environ.get("OUTPUT_DIR", "./out")
             self.INPUT_EXCEL = os.environ.get("INPUT_EXCEL", "./outputs/output_processed.xlsx")
@@ -69,6 +170,7 @@ class ModelConf:
     RETRY_BACKOFF: float = float(os.environ.get("HTTP_RETRY_BACKOFF", "1.5"))
     TASK_TYPE: str = os.environ.get("TASK_TYPE", "议论文")  # ★ 体裁
     SUBGENRE: str = os.environ.get("SUBGENRE", "").strip()
+    GRADING_CONCURRENCY: int = int(os.environ.get("GRADING_CONCURRENCY", "8"))  # 同时批改的学生数
 
 paths = Paths()
 sheets = Sheets()
@@ -0,0 +1,73 @@
+"""
+Excel 工作表的内存缓存：按 (文件, 工作表) 保存解析结果，文件修改时间或大小变化后自动失效。
+供 start_server.py 的只读接口使用，替代 Node 端每次请求都启动 Python 读取 Excel。
+"""
+from __future__ import annotations
+import os, threading
+from collections import OrderedDict
+
+import pandas as pd
+
+SHEET_CACHE_SIZE = int(os.getenv("SHEET_CACHE_SIZE", "64"))
+
+
+class SheetCache:
+    def __init__(self, capacity: int = SHEET_CACHE_SIZE):
+        self.capacity = max(1, capacity)
+        self._entries: "OrderedDict[tuple, dict]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def _load(self, path: str, sheet: str | None) -> dict:
+        st = os.stat(path)
+        key = (os.path.realpath(path), sheet)
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry["stamp"] == stamp:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry
+        # 解析放在锁外，避免大文件阻塞其他请求
+        df = pd.read_excel(path, sheet_name=sheet if sheet else 0)
+        entry = {
+            "stamp": stamp,
+            "df": df,
+            "headers": [str(c) for c in df.columns],
+            "data": df.astype(str).values.tolist(),
+        }
+        with self._lock:
+            self.misses += 1
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.capacity:
+                self._entries.popitem(last=False)
+        return entry
+
+    def rows(self, path: str, sheet: str | None = None) -> dict:
+        e = self._load(path, sheet)
+        return {"headers": e["headers"], "data": e["data"], "totalRows": len(e["data"])}
+
+    def count(self, path: str, sheet: str | None = None) -> int:
+        return len(self._load(path, sheet)["data"])
+
+    def student_rows(self, path: str, name: str, sheet: str | None = None, name_col: str = "姓名") -> list:
+        """按姓名（包含匹配）取该学生的非空字段，格式为 [{"项目":..., "内容":...}]"""
+        df = self._load(path, sheet)["df"]
+        if name_col not in df.columns:
+            return []
+        matched = df[df[name_col].fillna("").astype(str).str.contains(name, na=False, regex=False)]
+        report = []
+        for _, row in matched.iterrows():
+            for col_name, value in row.items():
+                if pd.notna(value) and str(value).strip() != '':
+                    report.append({"项目": str(col_name), "内容": str(value)})
+        return report
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {"entries": len(self._entries), "hits": self.hits, "misses": self.misses}
+
+
+sheet_cache = SheetCache()
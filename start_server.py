@@ -19,6 +19,8 @@ from pydantic import BaseModel
 import asyncio
 import json
 from pydantic import ValidationError
+from grading_service import JobConflict, service as grading_service
+from sheet_cache import sheet_cache
 
 app = Flask(__name__)
 app.config['UPLOAD_FOLDER'] = 'uploads'
@@ -107,6 +109,100 @@ def process_files():
     except Exception as e:
         return jsonify({"error": str(e)}), 500
 
+@app.route('/api/jobs', methods=['POST'])
+def submit_job():
+    """提交批改任务到常驻队列，立即返回任务ID"""
+    data = request.get_json(silent=True) or {}
+    exam_name = str(data.get('examName', '')).strip()
+    teacher_username = str(data.get('teacherUsername', '')).strip()
+    env = {
+        'TASK_TYPE': data.get('taskType'),
+        'SUBGENRE': data.get('subgenre'),
+        'FORCE_REGRADE': '1' if data.get('forceRegrade') else None,
+    }
+    try:
+        job = grading_service.submit(exam_name, teacher_username, {k: v for k, v in env.items() if v})
+    except JobConflict as e:
+        return jsonify({"success": False, "error": str(e), "jobId": e.job.id, "status": e.job.status}), 409
+    return jsonify({"success": True, "jobId": job.id, "status": job.status}), 202
+
+@app.route('/api/jobs', methods=['GET'])
+def list_jobs():
+    return jsonify({"jobs": [j.to_dict(log_tail=1) for j in grading_service.list()]})
+
+@app.route('/api/jobs/<job_id>', methods=['GET'])
+def job_status(job_id):
+    """任务状态与进度（轮询用，只返回日志末尾若干行）"""
+    job = grading_service.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+    tail = request.args.get('tail', default=20, type=int)
+    return jsonify(job.to_dict(log_tail=max(1, tail)))
+
+@app.route('/api/jobs/<job_id>/result', methods=['GET'])
+def job_result(job_id):
+    """任务完整输出；任务未结束时返回 202"""
+    job = grading_service.get(job_id)
+    if job is None:
+        return jsonify({"error": "任务不存在"}), 404
+    body = job.to_dict(log_tail=0)
+    body["output"] = "\n".join(body.pop("log"))
+    return jsonify(body), (200 if job.finished else 202)
+
+# 只读接口允许访问的目录（相对项目根目录）
+READABLE_DIRS = ('out', 'outputs', 'in')
+
+def _resolve_readable(rel_path):
+    """把 Node 传来的相对路径解析到项目根目录下，拒绝越出允许目录的路径"""
+    root = os.path.dirname(os.path.abspath(__file__))
+    full = os.path.realpath(os.path.join(root, rel_path or ''))
+    for d in READABLE_DIRS:
+        base = os.path.realpath(os.path.join(root, d))
+        if full.startswith(base + os.sep):
+            return full
+    return None
+
+def _sheet_request():
+    path = _resolve_readable(request.args.get('path', ''))
+    if path is None:
+        return None, (jsonify({"error": "不允许访问该路径"}), 403)
+    if not os.path.exists(path):
+        return None, (jsonify({"error": "文件不存在"}), 404)
+    return path, None
+
+@app.route('/api/sheet/rows', methods=['GET'])
+def sheet_rows():
+    """工作表全部行（字符串形式），结构与原 Node 内嵌脚本一致"""
+    path, err = _sheet_request()
+    if err: return err
+    try:
+        return jsonify(sheet_cache.rows(path, request.args.get('sheet') or None))
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/sheet/count', methods=['GET'])
+def sheet_count():
+    path, err = _sheet_request()
+    if err: return err
+    try:
+        return jsonify({"rows": sheet_cache.count(path, request.args.get('sheet') or None)})
+    except Exception as e:
+        return jsonify({"error": str(e)})
+
+@app.route('/api/sheet/student', methods=['GET'])
+def sheet_student():
+    """按姓名取某个学生的非空字段"""
+    path, err = _sheet_request()
+    if err: return err
+    name = request.args.get('name', '')
+    try:
+        report = sheet_cache.student_rows(path, name, request.args.get('sheet') or None)
+    except Exception as e:
+        return jsonify({"error": str(e)})
+    if not report:
+        return jsonify({"error": "未找到该学生的语法报告数据"})
+    return jsonify({"report": report})
+
 def process_file(filepath):
     """处理文件的核心逻辑"""
     # 这里实现文件处理逻辑
@@ -115,6 +211,9 @@ def process_file(filepath):
 if __name__ == '__main__':
     # 确保上传目录存在
     os.makedirs(app.config['UPLOAD_FOLDER'], exist_ok=True)
+
+    # 启动常驻批改线程
+    grading_service.start()
     
     # 启动Flask服务器
     host = os.getenv('SERVER_HOST', '0.0.0.0')
@@ -0,0 +1,97 @@
+"""
+批改前一次性建立的学生索引：列名只识别一次，姓名/原文/学号按列整体取值；
+语法表按学号分组（学号缺失时按姓名），教师评语按同样的键预先合并，
+每名学生的批改任务按键直接取用自己的切片，不再逐人扫描全表。
+"""
+from __future__ import annotations
+from typing import Dict, List, NamedTuple
+
+import numpy as np
+import pandas as pd
+
+NAME_COLS = ("姓名", "学生姓名", "name", "Name")
+TEXT_COLS = ("text", "内容", "ocr_text", "作文原文")
+TEACHER_TEXT_COLS = ("评语", "老师评语", "teacher_text", "text", "内容", "ocr_text")
+UNNAMED = "未命名学生"
+
+
+class Student(NamedTuple):
+    key: str     # 分组键：有学号时为 "学号:<学号>"，否则为 "姓名:<姓名>"
+    sid: str
+    name: str
+    text: str
+
+
+def _clean(s: pd.Series) -> pd.Series:
+    """逐个取 str().strip()，缺失值记为空串"""
+    return s.map(lambda v: str(v).strip() if pd.notna(v) else "")
+
+
+def first_filled(df: pd.DataFrame, cols: List[str]) -> pd.Series:
+    """按列的优先顺序取每行第一个非空（去除空白后）的值，全部为空时为空串"""
+    out = pd.Series("", index=df.index, dtype=object)
+    for c in reversed(cols):
+        v = _clean(df[c])
+        out = v.where(v != "", out)
+    return out
+
+
+def name_columns(df: pd.DataFrame) -> List[str]:
+    """姓名列：精确列名优先，其次任何包含“姓名”的列"""
+    exact = [c for c in NAME_COLS if c in df.columns]
+    return exact + [c for c in df.columns if "姓名" in str(c) and c not in exact]
+
+
+def text_columns(df: pd.DataFrame) -> List[str]:
+    """原文列：精确“我的原文”优先，其次任何包含“原文”的列，最后是常见文本列名"""
+    cols = [c for c in df.columns if c == "我的原文"]
+    cols += [c for c in df.columns if "原文" in str(c) and c not in cols]
+    return cols + [c for c in TEXT_COLS if c in df.columns and c not in cols]
+
+
+def student_keys(df: pd.DataFrame) -> tuple[pd.Series, pd.Series, pd.Series]:
+    """返回 (分组键, 学号, 姓名) 三列"""
+    names = first_filled(df, name_columns(df)).replace("", UNNAMED)
+    sids = _clean(df["学号"]) if "学号" in df.columns else pd.Series("", index=df.index, dtype=object)
+    keys = ("学号:" + sids).where(sids != "", "姓名:" + names)
+    return keys, sids, names
+
+
+def students(df: pd.DataFrame) -> List[Student]:
+    """按行顺序返回每名学生的键、学号、姓名与原文"""
+    if df is None or df.empty:
+        return []
+    keys, sids, names = student_keys(df)
+    texts = first_filled(df, text_columns(df))
+    return [Student(*r) for r in zip(keys.tolist(), sids.tolist(), names.tolist(), texts.tolist())]
+
+
+class StudentIndex:
+    def __init__(self, grammar_df: pd.DataFrame | None, teacher_df: pd.DataFrame | None = None):
+        self.grammar_df = grammar_df if grammar_df is not None else pd.DataFrame()
+        self._groups: Dict[str, slice | np.ndarray] = {}
+        if not self.grammar_df.empty:
+            keys, _, _ = student_keys(self.grammar_df)
+            groups = self.grammar_df.groupby(keys.to_numpy(), sort=False).indices
+            # 连续的行（通常每名学生一行）用切片取值，比按位置数组取值快数倍
+            self._groups = {k: slice(int(v[0]), int(v[-1]) + 1) if v[-1] - v[0] + 1 == len(v) else v
+                            for k, v in groups.items()}
+
+        # 教师评语：有学号列时按分组键合并，否则按姓名合并
+        self._teacher: Dict[str, str] = {}
+        self._teacher_by_key = False
+        if teacher_df is not None and not teacher_df.empty:
+            keys, _, names = student_keys(teacher_df)
+            self._teacher_by_key = "学号" in teacher_df.columns
+            texts = first_filled(teacher_df, [c for c in TEACHER_TEXT_COLS if c in teacher_df.columns])
+            by = keys if self._teacher_by_key else names
+            filled = texts != ""
+            self._teacher = texts[filled].groupby(by[filled].to_numpy(), sort=False).agg("\n".join).to_dict()
+
+    def grammar_rows(self, student: Student) -> pd.DataFrame:
+        """该学生的语法表行；无法匹配时使用全表"""
+        idx = self._groups.get(student.key)
+        return self.grammar_df.iloc[idx] if idx is not None else self.grammar_df
+
+    def teacher_text(self, student: Student) -> str:
+        return self._teacher.get(student.key if self._teacher_by_key else student.name, "")
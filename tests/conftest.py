@@ -0,0 +1,8 @@
+import os
+import sys
+
+# educhat_client 在导入时要求配置 API Key；测试不发出真实请求，也不写磁盘缓存
+os.environ.setdefault("OPENAI_API_KEY", "test")
+os.environ.setdefault("LLM_CACHE", "0")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,65 @@
+"""本地/混合汇总：模型返回的文字字段逐项校验，类型不符时保留本地生成"""
+import asyncio
+import json
+
+import pandas as pd
+
+from aggregator import SummaryOut, aggregate_local, with_text_fields
+
+CONTENT = {"总分": 40, "content_table": [{"维度": "内容", "得分": 40, "满分": 50, "扣分原因": "论据单薄", "建议": "补充例证"}]}
+STRUCTURE = {"总分": 25, "structure_table": [{"维度": "结构", "得分": 25, "满分": 30}]}
+WEIGHTS = {"grammar": 20, "content": 50, "structure": 30}
+GRAMMAR = pd.DataFrame([{"得分": 12, "语法错误": "时态错误"}])
+
+
+class FakeClient:
+    def __init__(self, reply):
+        self.reply = reply
+
+    async def acomplete(self, system, user, **kw):
+        return self.reply
+
+
+def run_hybrid(reply) -> SummaryOut:
+    return asyncio.run(aggregate_local(FakeClient(reply), GRAMMAR, CONTENT, STRUCTURE, WEIGHTS, None, use_llm_text=True))
+
+
+def test_hybrid_takes_valid_text_fields():
+    local = run_hybrid("not json")
+    summary = run_hybrid(json.dumps({"简评": "整体不错", "易错点": ["时态"], "亮点": ["结构清晰"],
+                                     "学生画像": {"词汇水平": "中等"}}, ensure_ascii=False))
+    assert summary.本次评价 == {**local.本次评价, "简评": "整体不错"}
+    assert summary.易错点 == ["时态"] and summary.亮点 == ["结构清晰"]
+    assert summary.学生画像 == {"词汇水平": "中等"}
+
+
+def test_hybrid_keeps_local_fields_with_wrong_types():
+    local = run_hybrid("not json")
+    summary = run_hybrid(json.dumps({"简评": {"text": "x"}, "易错点": "时态", "亮点": [{"a": 1}],
+                                     "学生画像": ["中等"]}, ensure_ascii=False))
+    assert summary == local
+    assert run_hybrid("[1, 2]") == local
+
+
+def test_with_text_fields_validates_each_field():
+    base = SummaryOut(本次评价={"总分": 80, "等级": "B", "简评": "本地"}, 易错点=["a"], 亮点=["b"], 学生画像={})
+    out = with_text_fields(base, {"简评": "模型", "易错点": [1, 2], "亮点": ["c"]})
+    assert out.本次评价["简评"] == "模型" and out.本次评价["总分"] == 80
+    assert out.易错点 == ["a"] and out.亮点 == ["c"]
+
+
+def test_combined_validates_model_summary(monkeypatch):
+    import aggregator
+
+    local = run_hybrid("not json")
+    bad = {"本次评价": {"简评": ["x"]}, "易错点": "时态", "亮点": ["结构清晰"]}
+    monkeypatch.setattr(aggregator, "AGGREGATE_MODE", "local")
+    summary = asyncio.run(aggregator.aggregate_combined(None, GRAMMAR, CONTENT, STRUCTURE, WEIGHTS, None, bad))
+    assert summary == local.model_copy(update={"亮点": ["结构清晰"]})
+
+    # llm 模式下校验失败的汇总按缺失处理，单独补问
+    monkeypatch.setattr(aggregator, "AGGREGATE_MODE", "llm")
+    good = {"本次评价": {"总分": 80, "等级": "B", "简评": "好"}, "易错点": [], "亮点": [], "学生画像": {}}
+    client = FakeClient(json.dumps(good, ensure_ascii=False))
+    summary = asyncio.run(aggregator.aggregate_combined(client, GRAMMAR, CONTENT, STRUCTURE, WEIGHTS, None, bad))
+    assert summary == SummaryOut.model_validate(good)
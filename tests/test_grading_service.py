@@ -0,0 +1,42 @@
+"""批改服务：每个任务一份输入副本，同一考试不可重复提交"""
+import pytest
+
+from grading_service import GradingService, JobConflict
+from settings import Workspace
+
+
+@pytest.fixture
+def service(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    (tmp_path / "in" / "pdfs").mkdir(parents=True)
+    (tmp_path / "in" / "1.pdf").write_bytes(b"v1")
+    (tmp_path / "in" / "pdfs" / "a.pdf").write_bytes(b"a")
+    return GradingService()  # 未 start()：任务只入队不执行
+
+
+def test_snapshot_is_per_job_and_survives_reupload(service, tmp_path):
+    job = service.submit("期中", "t1")
+    snap = job.workspace.input_dir
+    assert snap == tmp_path.joinpath("outputs", "期中_t1", "inputs", job.id).relative_to(tmp_path)
+    (tmp_path / "in" / "1.pdf").write_bytes(b"v2")
+    other = service.submit("期中", "t2")
+    assert (snap / "1.pdf").read_bytes() == b"v1"
+    assert (snap / "pdfs" / "a.pdf").is_file()
+    assert (other.workspace.input_dir / "1.pdf").read_bytes() == b"v2"
+
+
+def test_resubmit_blocked_while_active(service):
+    job = service.submit("期中")
+    with pytest.raises(JobConflict) as e:
+        service.submit("期中")
+    assert e.value.job is job
+    job.status = "succeeded"
+    job.workspace.drop_snapshot()
+    assert not job.workspace.input_dir.exists()
+    assert service.submit("期中").id != job.id
+
+
+def test_drop_snapshot_ignores_live_inputs(service):
+    live = Workspace(exam_name="期中")
+    live.drop_snapshot()
+    assert live.pdf_path.is_file()
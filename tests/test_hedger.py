@@ -0,0 +1,101 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import educhat_client
+from educhat_client import Hedger, UsageStats, http_complete
+
+
+def warmed(n=10, seconds=0.05, **kw):
+    h = Hedger(percentile=95, min_samples=n, min_delay=0, **kw)
+    for _ in range(n):
+        h.observe(seconds)
+    return h
+
+
+def test_no_hedge_until_enough_samples():
+    h = Hedger(min_samples=3, min_delay=0)
+    h.observe(0.1)
+    h.observe(0.2)
+    assert h.delay() is None
+    h.observe(0.3)
+    assert h.delay() == 0.3
+
+
+def test_budget_is_per_completed_http_request():
+    h = warmed(10, budget=0.2)
+    assert h.requests == 10
+    assert [h._take_budget() for _ in range(3)] == [True, True, False]
+
+
+def test_slow_primary_is_hedged_and_backup_wins():
+    h, usage, cancelled = warmed(budget=1.0), UsageStats(), []
+
+    async def attempt(primary, on_send):
+        on_send()
+        try:
+            await asyncio.sleep(1.0 if primary else 0.01)
+        except asyncio.CancelledError:
+            cancelled.append(primary)
+            raise
+        return "primary" if primary else "backup"
+
+    assert asyncio.run(h.run(attempt, usage)) == "backup"
+    assert cancelled == [True]
+    stats = usage.stats()
+    assert (h.hedged, h.wins, stats["hedged"], stats["hedge_wins"]) == (1, 1, 1, 1)
+
+
+def test_fast_primary_is_not_hedged():
+    h = warmed(budget=1.0)
+
+    async def attempt(primary, on_send):
+        on_send()
+        return primary
+
+    assert asyncio.run(h.run(attempt)) is True
+    assert h.hedged == 0
+
+
+def test_rate_limit_wait_does_not_trigger_hedge():
+    h = warmed(budget=1.0)
+
+    async def attempt(primary, on_send):
+        await asyncio.sleep(0.3)  # 限流等待，远超 0.05 秒的对冲延迟
+        on_send()
+        await asyncio.sleep(0.01)
+        return primary
+
+    assert asyncio.run(h.run(attempt)) is True
+    assert h.hedged == 0
+
+
+def test_both_failing_raises_primary_error():
+    h = warmed(budget=1.0)
+
+    async def attempt(primary, on_send):
+        on_send()
+        await asyncio.sleep(0.2 if primary else 0.01)
+        raise ValueError("primary" if primary else "backup")
+
+    with pytest.raises(ValueError, match="primary"):
+        asyncio.run(h.run(attempt))
+
+
+def test_latency_excludes_rate_limit_wait(monkeypatch):
+    async def slow_acquire(tokens):
+        await asyncio.sleep(0.3)
+
+    monkeypatch.setattr(educhat_client.rate_limiter, "acquire", slow_acquire)
+
+    def handler(request):
+        assert json.loads(request.content)["messages"]
+        return httpx.Response(200, json={"choices": [{"message": {"content": '{"ok": 1}'}, "finish_reason": "stop"}],
+                                         "usage": {"total_tokens": 10}})
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    samples = []
+    asyncio.run(http_complete("s", "u", client=client, stream=False, on_latency=samples.append))
+    assert len(samples) == 1 and samples[0] < 0.2
@@ -0,0 +1,44 @@
+import asyncio
+import json
+
+import httpx
+import pytest
+
+import educhat_client
+from educhat_client import EduChatOutputLimit, http_complete
+
+
+def mock_client(answer):
+    """按请求的 max_tokens 应答：answer(max_tokens) -> (content, finish_reason)"""
+    sent = []
+
+    def handler(request):
+        max_tokens = json.loads(request.content)["max_tokens"]
+        sent.append(max_tokens)
+        content, finish = answer(max_tokens)
+        return httpx.Response(200, json={"choices": [{"message": {"content": content}, "finish_reason": finish}],
+                                         "usage": {"prompt_tokens": 10, "completion_tokens": 5, "total_tokens": 15}})
+
+    return httpx.AsyncClient(transport=httpx.MockTransport(handler)), sent
+
+
+@pytest.fixture(autouse=True)
+def fast_retries(monkeypatch):
+    monkeypatch.setattr(educhat_client, "RETRY_BACKOFF", 0)
+    monkeypatch.setattr(educhat_client, "RETRIES", 5)
+    monkeypatch.setattr(educhat_client, "MAX_TOKENS", 1000)
+    monkeypatch.setattr(educhat_client, "MAX_TOKENS_LIMIT", 3000)
+
+
+def test_truncation_retries_with_larger_max_tokens():
+    client, sent = mock_client(lambda n: ('{"ok": 1}', "stop") if n >= 2000 else ('{"ok"', "length"))
+    assert asyncio.run(http_complete("s", "u", client=client, stream=False)) == '{"ok": 1}'
+    assert sent == [1000, 2000]
+
+
+def test_truncation_at_limit_is_not_retried():
+    client, sent = mock_client(lambda n: ('{"ok"', "length"))
+    with pytest.raises(EduChatOutputLimit):
+        asyncio.run(http_complete("s", "u", client=client, stream=False))
+    # 达到 MAX_TOKENS_LIMIT 后不再重复发送相同的请求
+    assert sent == [1000, 2000, 3000]
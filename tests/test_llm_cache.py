@@ -0,0 +1,97 @@
+import asyncio
+import threading
+import time
+
+import llm_cache
+from llm_cache import ResponseCache, cache_key
+
+
+def test_hit_and_miss(tmp_path):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"))
+    key = cache_key("m", 0.2, 100, "sys", "user")
+    assert key != cache_key("m", 0.2, 100, "sys", "user2")
+    assert cache.get(key) is None
+    cache.put(key, '{"a": 1}')
+    assert cache.get(key) == '{"a": 1}'
+    assert cache.stats() == {"hits": 1, "misses": 1, "hit_rate": 0.5}
+
+
+def test_persists_across_instances(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    first = ResponseCache(path)
+    first.put("k", "v")
+    first.close()
+    assert ResponseCache(path).get("k") == "v"
+
+
+def test_expired_entries_miss_and_are_evicted(tmp_path, monkeypatch):
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_age_days=1)
+    cache.put("old", "v")
+    later = time.time() + 2 * 86400
+    monkeypatch.setattr(llm_cache.time, "time", lambda: later)
+    assert cache.get("old") is None
+    cache.evict()
+    assert cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0] == 0
+
+
+def test_size_eviction_runs_every_64_writes_lru_first(tmp_path):
+    # 容量约 10 条 1KB 的记录
+    cache = ResponseCache(str(tmp_path / "c.sqlite"), max_mb=10 * 1024 / (1024 * 1024), max_age_days=0)
+    value = "x" * 1024
+    for i in range(63):
+        cache.put(f"k{i}", value)
+    count = lambda: cache._db.execute("SELECT COUNT(*) FROM responses").fetchone()[0]
+    assert count() == 63  # 第 64 次写入前不淘汰
+    cache.get("k0")  # 最近访问过的记录保留
+    cache.put("k63", value)
+    assert count() == 10
+    assert cache.get("k0") == value and cache.get("k1") is None
+
+
+def test_concurrent_threads_and_connections(tmp_path):
+    path = str(tmp_path / "c.sqlite")
+    caches = [ResponseCache(path), ResponseCache(path)]  # 两个连接共用 WAL 模式的同一文件
+    errors = []
+
+    def work(n):
+        cache = caches[n % 2]
+        try:
+            for i in range(50):
+                cache.put(f"{n}-{i}", str(i))
+                assert cache.get(f"{n}-{i}") == str(i)
+        except Exception as e:  # noqa: BLE001
+            errors.append(e)
+
+    threads = [threading.Thread(target=work, args=(n,)) for n in range(6)]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert not errors
+    assert caches[0]._db.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert caches[1].get("5-49") == "49"
+
+
+def test_client_cache_io_runs_off_the_event_loop(tmp_path, monkeypatch):
+    import educhat_client
+
+    loop_thread = []
+
+    class SpyCache(ResponseCache):
+        def get(self, key):
+            loop_thread.append(threading.current_thread() is threading.main_thread())
+            return super().get(key)
+
+        def put(self, key, value):
+            loop_thread.append(threading.current_thread() is threading.main_thread())
+            super().put(key, value)
+
+    async def fake_http(*a, **kw):
+        return '{"ok": 1}'
+
+    monkeypatch.setattr(educhat_client, "http_complete", fake_http)
+    monkeypatch.setattr(educhat_client, "LLM_HEDGE", False)
+    client = educhat_client.EduChatClient(cache=SpyCache(str(tmp_path / "c.sqlite")), use_cache=True)
+    assert asyncio.run(client.acomplete("s", "u")) == '{"ok": 1}'
+    assert asyncio.run(client.acomplete("s", "u")) == '{"ok": 1}'
+    assert loop_thread == [False, False, False]  # get（未命中）、put、get（命中）
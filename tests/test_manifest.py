@@ -0,0 +1,38 @@
+import main
+from main import MANIFEST_NAME, already_graded, load_manifest, save_manifest, student_fingerprint
+
+
+def test_manifest_roundtrip(tmp_path):
+    manifest = {"学号:1|张三": {"fingerprint": "abc", "report": "张三.md"}}
+    save_manifest(str(tmp_path), manifest)
+    assert load_manifest(str(tmp_path)) == manifest
+    assert not (tmp_path / (MANIFEST_NAME + ".tmp")).exists()
+
+
+def test_missing_or_corrupt_manifest_is_empty(tmp_path):
+    assert load_manifest(str(tmp_path)) == {}
+    (tmp_path / MANIFEST_NAME).write_text("{half", encoding="utf-8")
+    assert load_manifest(str(tmp_path)) == {}
+    (tmp_path / MANIFEST_NAME).write_text("[1, 2]", encoding="utf-8")
+    assert load_manifest(str(tmp_path)) == {}
+
+
+def test_fingerprint_tracks_every_input(monkeypatch):
+    base = student_fingerprint("static", "essay", "comment")
+    assert base == student_fingerprint("static", "essay", "comment")
+    assert base != student_fingerprint("static", "essay!", "comment")
+    assert base != student_fingerprint("static", "essay", "comment!")
+    assert base != student_fingerprint("static2", "essay", "comment")
+    monkeypatch.setattr(main, "PROMPT_VERSION", "changed")
+    assert base != student_fingerprint("static", "essay", "comment")
+
+
+def test_skip_requires_matching_fingerprint_and_report(tmp_path):
+    md = tmp_path / "张三.md"
+    manifest = {"k": {"fingerprint": "fp1", "report": md.name}}
+    assert not already_graded(manifest, "k", "fp1", str(md))  # 报告已被删除
+    md.write_text("report", encoding="utf-8")
+    assert already_graded(manifest, "k", "fp1", str(md))
+    assert not already_graded(manifest, "k", "fp2", str(md))   # 输入变化
+    assert not already_graded(manifest, "other", "fp1", str(md))
+    assert not already_graded({}, "k", "fp1", str(md))          # FORCE_REGRADE 时清单为空
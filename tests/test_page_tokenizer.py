@@ -0,0 +1,40 @@
+import random
+
+import pytest
+
+from extract_to_excel import normalize_text, parse_header, scan_page, split_sections
+from scripts.bench_page_tokenizer import legacy_parse_header, legacy_split_sections, synth_page
+
+PAGE = """学校：实验中学 班级：高三1班 姓名：张三 学号：20240001 作答时间：2024-05-01 10:00
+得分：12（满分15）
+我的原文
+I like reading.
+语法错误
+none
+说明更多表达 不在行首
+单句点评
+good
+第 1 页 / 共 3 页
+更多表达
+页尾之后的内容"""
+
+
+def test_sections_and_header():
+    scan = scan_page(PAGE)
+    assert scan.info["name"] == "张三" and scan.info["id"] == "20240001"
+    assert scan.score == 12
+    assert scan.sections == {
+        "mine": "I like reading.",
+        "errors": "none\n说明更多表达 不在行首",
+        "comments": "good",
+        "more": "",  # 页尾标记之后的标题不计
+    }
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_matches_legacy_implementation(seed):
+    rng = random.Random(seed)
+    for i in range(400):
+        page = synth_page(rng, i)
+        for text in (page, normalize_text(page)):
+            assert (parse_header(text), split_sections(text)) == (legacy_parse_header(text), legacy_split_sections(text))
@@ -0,0 +1,26 @@
+import json
+
+import main
+from main import PARTIAL_ROWS_NAME, PartialRowFeed, partial_rows
+
+
+def test_rows_reach_progress_file_and_are_cleared(tmp_path, monkeypatch):
+    monkeypatch.setattr(main, "PARTIAL_ROWS_KEEP", 2)
+    (tmp_path / PARTIAL_ROWS_NAME).write_text("[stale]", encoding="utf-8")
+    feed = PartialRowFeed(str(tmp_path))
+    assert not (tmp_path / PARTIAL_ROWS_NAME).exists()  # 上次运行残留的内容不再展示
+
+    on_partial = partial_rows("张三", feed)
+    on_partial(("content_table", 0), {"维度": "内容", "得分": 8, "满分": 10})
+    on_partial(("content_table",), [])                       # 整张表：不是单行
+    on_partial(("总分",), 15)
+    on_partial(("structure_table", 0), {"维度": "结构", "得分": 7, "满分": 10})
+    on_partial(("structure_table", 1), {"维度": "衔接", "得分": 5, "满分": 5})
+
+    rows = json.loads((tmp_path / PARTIAL_ROWS_NAME).read_text(encoding="utf-8"))
+    assert rows == [
+        {"student": "张三", "table": "结构评分表", "维度": "结构", "得分": 7, "满分": 10},
+        {"student": "张三", "table": "结构评分表", "维度": "衔接", "得分": 5, "满分": 5},
+    ]
+    feed.close()
+    assert not list(tmp_path.iterdir())
@@ -0,0 +1,100 @@
+import zipfile
+
+from openpyxl import Workbook, load_workbook
+from openpyxl.styles import Font, PatternFill
+
+import process_excel
+from scripts.bench_process_excel import make_output_xlsx
+
+
+def _dump(path):
+    sheet = load_workbook(path).active
+    values = [list(r) for r in sheet.iter_rows(values_only=True)]
+    merges = sorted(map(str, sheet.merged_cells.ranges))
+    widths = {k: d.width for k, d in sheet.column_dimensions.items() if d.width}
+    styles = {c.coordinate: (c.font.b, c.fill.fgColor.rgb, c.number_format)
+              for row in sheet.iter_rows() for c in row if c.has_style}
+    return values, merges, widths, styles
+
+
+def _both(tmp_path, src):
+    stream_out, load_out = tmp_path / "stream.xlsx", tmp_path / "load.xlsx"
+    assert process_excel._process_streaming(src, stream_out)
+    process_excel._process_in_place(src, load_out)
+    return _dump(stream_out), _dump(load_out)
+
+
+def test_streaming_matches_full_load_with_merges(tmp_path):
+    src = tmp_path / "output.xlsx"
+    make_output_xlsx(src, rows=300, merges=40)
+    stream, load = _both(tmp_path, src)
+    assert stream == load
+    assert stream[1]  # 确实包含合并区域
+
+
+def test_streaming_keeps_cell_styles(tmp_path):
+    src = tmp_path / "output.xlsx"
+    make_output_xlsx(src, rows=20, merges=3)
+    wb = load_workbook(src)
+    sheet = wb.active
+    for cell in sheet[1]:
+        cell.font = Font(bold=True)
+        cell.fill = PatternFill("solid", fgColor="FFFFFF00")
+    sheet["A5"].number_format = "0.00"
+    wb.save(src)
+
+    stream, load = _both(tmp_path, src)
+    assert stream == load
+    assert stream[3]["A1"][0] is True and stream[3]["A5"][2] == "0.00"
+
+
+def test_multi_sheet_workbook_falls_back(tmp_path):
+    src = tmp_path / "output.xlsx"
+    wb = Workbook()
+    wb.active.append(["我的原文", "更多表达"])
+    wb.create_sheet("other")
+    wb.save(src)
+    assert process_excel._process_streaming(src, tmp_path / "out.xlsx") is False
+
+
+def test_scan_sheet_layout_reads_merges_and_widths(tmp_path):
+    src = tmp_path / "output.xlsx"
+    wb = Workbook()
+    sheet = wb.active
+    sheet.append(["我的原文", "更多表达"])
+    sheet.merge_cells("A2:A3")
+    sheet.column_dimensions["B"].width = 42
+    wb.save(src)
+    merged, widths, styled = process_excel._scan_sheet_layout(src)
+    assert merged == ["A2:A3"] and widths["B"] == 42 and styled is False
+
+
+def test_unrecognised_package_layout_returns_none(tmp_path):
+    src = tmp_path / "odd.xlsx"
+    with zipfile.ZipFile(src, "w") as zf:
+        zf.writestr("xl/workbook.xml", "<workbook/>")
+    assert process_excel._scan_sheet_layout(src) is None
+
+
+def test_header_row_merge_falls_back_to_full_load(tmp_path, monkeypatch):
+    src = tmp_path / "output.xlsx"
+    wb = Workbook()
+    sheet = wb.active
+    sheet.append(["序号", "我的原文", "更多表达"])
+    sheet.append([1, "I goes to school .", "more"])
+    sheet.append([2, "He like apples .", "more"])
+    sheet.merge_cells("B1:B2")
+    wb.save(src)
+
+    out = tmp_path / "out.xlsx"
+    assert process_excel._process_streaming(src, out) is False
+    assert not out.exists() and not (tmp_path / "out.xlsx.tmp").exists()
+
+    # 默认入口（流式）回退后与整表加载的结果一致
+    monkeypatch.chdir(tmp_path)
+    ws = process_excel.Workspace(exam_name="t")
+    ws.outputs_dir.mkdir(parents=True)
+    ws.output_xlsx.write_bytes(src.read_bytes())
+    process_excel.main(ws, streaming=True)
+    process_excel._process_in_place(src, tmp_path / "load.xlsx")
+    assert _dump(ws.processed_xlsx) == _dump(tmp_path / "load.xlsx")
@@ -0,0 +1,59 @@
+"""提示词统计按批改运行累计，不统计时不再按原先写法格式化"""
+import asyncio
+import threading
+
+import prompt_compact
+from prompt_compact import render, track_run
+
+TMPL = "表格：{table}"
+ROWS = [{"维度": "内容", "得分": 8, "备注": ""}]
+
+
+def test_stats_are_scoped_per_run():
+    results = {}
+
+    def run(name, n):
+        stats = track_run()
+
+        async def grade():
+            await asyncio.gather(*(asyncio.to_thread(render, TMPL, table=ROWS) for _ in range(n)))
+
+        asyncio.run(grade())
+        results[name] = stats.prompts
+
+    threads = [threading.Thread(target=run, args=(name, n)) for name, n in (("a", 3), ("b", 5))]
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+    assert results == {"a": 3, "b": 5}
+
+
+def test_no_legacy_format_without_stats(monkeypatch):
+    def legacy(value):
+        raise AssertionError("不统计时不应按原先写法格式化")
+
+    monkeypatch.setattr(prompt_compact, "_legacy", legacy)
+    monkeypatch.setattr(prompt_compact, "PROMPT_STATS", False)
+    assert track_run() is None
+    assert render(TMPL, table=ROWS) == '表格：{"cols":["维度","得分"],"rows":[["内容",8]]}'
+
+
+def test_auxiliary_fields_are_trimmed_before_essential(capsys):
+    stats = track_run()
+    tmpl = "{exam_context}\n作文：{student_text}"
+    essay = "essay " * 40
+    prompt = render(tmpl, trim=("exam_context",), essential=("student_text",), label="张三",
+                    budget=160, exam_context="rubric " * 100, student_text=essay)
+    assert essay.strip() in prompt and prompt.startswith("rubric")
+    assert capsys.readouterr().out == ""
+    assert stats.truncated == 1 and stats.essential_cut == []
+
+
+def test_essential_cut_is_warned_and_counted(capsys):
+    stats = track_run()
+    render("{exam_context}\n作文：{student_text}", trim=("exam_context",), essential=("student_text",), label="张三",
+           budget=20, exam_context="rubric " * 100, student_text="essay " * 40)
+    assert "⚠️ 张三" in capsys.readouterr().out
+    assert stats.essential_cut == ["张三"]
+    assert "张三" in stats.summary()
@@ -0,0 +1,45 @@
+import asyncio
+import time
+
+from educhat_client import RateLimiter
+
+
+def test_cold_start_burst_is_capped():
+    rl = RateLimiter(rpm=60, tpm=0, burst_s=5)
+    assert [rl._try_take(1) for _ in range(5)] == [0.0] * 5
+    # 桶容量只有 5 秒的配额：第 6 个请求需等待约 1 秒，而不是整分钟的请求一次放出
+    assert 0.9 < rl._try_take(1) <= 1.0
+
+
+def test_oversized_request_runs_into_debt():
+    rl = RateLimiter(rpm=0, tpm=600, burst_s=5)  # 容量 50 tokens
+    assert rl._try_take(500) == 0.0
+    wait = rl._try_take(10)
+    # 欠账 450 tokens，补足到 10 tokens 需要 (460 / 600) 分钟
+    assert abs(wait - 46) < 0.5
+
+
+def test_acquire_counts_throttled_waits():
+    rl = RateLimiter(rpm=600, tpm=0, burst_s=0.1)  # 容量 1 个请求，每 0.1 秒补充 1 个
+
+    async def run():
+        for _ in range(3):
+            await rl.acquire(1)
+
+    start = time.monotonic()
+    asyncio.run(run())
+    assert time.monotonic() - start >= 0.15
+    assert rl.throttled >= 2
+
+
+def test_settle_returns_overestimate():
+    rl = RateLimiter(rpm=0, tpm=6000, burst_s=1)  # 容量 100 tokens
+    assert rl._try_take(100) == 0.0
+    rl.settle(estimated=100, actual=40)
+    assert rl._try_take(60) == 0.0
+
+
+def test_retry_after_pauses_everyone():
+    rl = RateLimiter(rpm=60, tpm=0)
+    rl.update_from_headers({"retry-after": "2"}, 429)
+    assert 1.5 < rl._try_take(1) <= 2.0
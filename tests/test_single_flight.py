@@ -0,0 +1,98 @@
+import asyncio
+import threading
+
+import pytest
+
+from educhat_client import SingleFlight
+
+
+class Boom(BaseException):
+    pass
+
+
+def gather(flight, key, fn, n, counted):
+    async def run():
+        return await asyncio.gather(*(flight.do(key, fn, lambda: counted.append(1)) for _ in range(n)),
+                                    return_exceptions=True)
+    return asyncio.run(run())
+
+
+def test_concurrent_calls_share_one_execution():
+    flight, counted, calls = SingleFlight(), [], []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        return "ok"
+
+    assert gather(flight, "k", fn, 5, counted) == ["ok"] * 5
+    assert len(calls) == 1
+    assert flight.coalesced == len(counted) == 4
+    assert not flight._inflight
+
+
+def test_leader_exception_reaches_waiters_once():
+    flight, counted = SingleFlight(), []
+
+    async def fn():
+        await asyncio.sleep(0.05)
+        raise ValueError("bad")
+
+    results = gather(flight, "k", fn, 3, counted)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert flight.coalesced == len(counted) == 2
+
+
+def test_non_cancellation_base_exception_is_not_retried():
+    flight, counted, calls = SingleFlight(), [], []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.05)
+        raise Boom()
+
+    results = gather(flight, "k", fn, 3, counted)
+    assert all(isinstance(r, Boom) for r in results)
+    assert len(calls) == 1  # 等待者没有重新发起
+
+
+def test_cancelled_leader_hands_over_and_counts_each_waiter_once():
+    flight, counted, calls = SingleFlight(), [], []
+
+    async def fn():
+        calls.append(1)
+        await asyncio.sleep(0.1)
+        return len(calls)
+
+    async def run():
+        leader = asyncio.create_task(flight.do("k", fn, lambda: counted.append(1)))
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.create_task(flight.do("k", fn, lambda: counted.append(1))) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        leader.cancel()
+        return await asyncio.gather(*waiters)
+
+    # 原发起者被取消后由一名等待者重新发出请求，其余两名等待它的结果
+    assert asyncio.run(run()) == [2, 2, 2]
+    assert len(calls) == 2
+    assert flight.coalesced == len(counted) == 2
+
+
+def test_coalesces_across_threads():
+    flight, counted, calls = SingleFlight(), [], []
+    started = threading.Event()
+
+    async def fn():
+        calls.append(1)
+        started.set()
+        await asyncio.sleep(0.1)
+        return "ok"
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(asyncio.run(flight.do("k", fn, lambda: counted.append(1)))))
+    leader.start()
+    started.wait()
+    results.append(asyncio.run(flight.do("k", fn, lambda: counted.append(1))))
+    leader.join()
+    assert results == ["ok", "ok"] and len(calls) == 1
+    assert flight.coalesced == len(counted) == 1
@@ -0,0 +1,59 @@
+import json
+
+from educhat_client import JsonStreamParser
+
+DOC = {
+    "content_table": [
+        {"维度": "内容", "得分": 8, "满分": 10, "扣分原因": "引号\"与括号{]不影响"},
+        {"维度": "语言", "得分": 7, "满分": 10},
+    ],
+    "总分": 15,
+    "format_check": [],
+}
+
+
+def parse(chunks):
+    seen = []
+    parser = JsonStreamParser(lambda path, value: seen.append((path, value)))
+    for chunk in chunks:
+        parser.feed(chunk)
+    return parser, seen
+
+
+def test_emits_rows_and_top_level_fields():
+    text = json.dumps(DOC, ensure_ascii=False)
+    parser, seen = parse([text])
+    assert seen == [
+        (("content_table", 0), DOC["content_table"][0]),
+        (("content_table", 1), DOC["content_table"][1]),
+        (("content_table",), DOC["content_table"]),
+        (("总分",), 15),
+        (("format_check",), []),
+    ]
+    assert parser.complete and parser.values == 5 and parser.text == text
+
+
+def test_chunking_does_not_change_results():
+    text = "好的，以下是评分：\n```json\n" + json.dumps(DOC, ensure_ascii=False, indent=2) + "\n```"
+    _, whole = parse([text])
+    _, by_char = parse(list(text))
+    _, by_7 = parse([text[i:i + 7] for i in range(0, len(text), 7)])
+    assert whole == by_char == by_7
+    assert len(whole) == 5
+
+
+def test_truncated_output_keeps_completed_values():
+    text = json.dumps(DOC, ensure_ascii=False)
+    cut = text.index('"语言"') + 10
+    parser, seen = parse([text[:cut]])
+    assert seen == [(("content_table", 0), DOC["content_table"][0])]
+    assert not parser.complete
+
+
+def test_feed_returns_new_value_count():
+    # 值在其后的分隔符（, ] }）到达时才算完整
+    parser = JsonStreamParser()
+    assert parser.feed('{"a": [{"x": 1}') == 0
+    assert parser.feed(', {"x": 2}], "b": 2') == 3
+    assert parser.feed("}") == 1
+    assert parser.complete
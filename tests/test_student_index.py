@@ -0,0 +1,29 @@
+import pandas as pd
+
+from scripts.bench_student_index import legacy_prepare, make_frames, new_prepare
+from student_index import StudentIndex, students
+
+
+def test_matches_legacy_lookup():
+    grammar_df, teacher_df = make_frames(500)
+    assert new_prepare(grammar_df, teacher_df) == legacy_prepare(grammar_df, teacher_df)
+
+
+def test_groups_by_student_id_and_falls_back_to_whole_table():
+    grammar_df = pd.DataFrame({
+        "姓名": ["张三", "李四", "张三", "王五"],
+        "学号": ["1", "2", "1", None],
+        "我的原文": ["a", "b", "c", "d"],
+    })
+    teacher_df = pd.DataFrame({"姓名": ["张三", "张三", "李四"], "评语": ["好", "再接再厉", None]})
+    index = StudentIndex(grammar_df, teacher_df)
+    zhang, li, _, wang = students(grammar_df)
+
+    assert list(index.grammar_rows(zhang).index) == [0, 2]   # 不连续的行
+    assert list(index.grammar_rows(li).index) == [1]          # 连续的行（切片）
+    assert list(index.grammar_rows(wang).index) == [3]        # 无学号时按姓名
+    assert index.teacher_text(zhang) == "好\n再接再厉"
+    assert index.teacher_text(li) == ""
+
+    stranger = zhang._replace(key="学号:999")
+    assert index.grammar_rows(stranger).equals(grammar_df)